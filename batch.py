@@ -0,0 +1,217 @@
+"""Advances many tournaments (pods) by one round from a single process.
+
+An event is one tournament workbook plus its field. Events come from a
+directory or a JSON manifest:
+
+- directory: every *.xlsx in it is an event, and every *.txt (one player
+  per line) without a workbook of the same name starts a new one;
+- manifest: {"events": [{"name": "pod-3", "file": "pod-3.xlsx",
+  "participants": [...] or "participants_file": "pod-3.txt",
+  "results": "pod-3.csv", "pairings": "...", "standings": "..."}]},
+  with relative paths taken from the manifest's directory. Only "file" is
+  required.
+
+Each event does what `python dynamic.py` does: write round 1 if there is no
+workbook yet, otherwise apply the latest results and pair the next round.
+Events run in a pool of worker processes (at most `workers` at a time); each
+worker imports pandas, NumPy and openpyxl once and then takes event after
+event, and player names are interned so pods sharing players share the
+strings. A failing event (bad result rows, a broken workbook) is reported
+with its error and does not stop the others. The output of each event is
+captured and returned with its result instead of being interleaved.
+"""
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from instrument import traced
+from workbook import read_sheet_names, read_sheet_rows
+
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class Event:
+    """One tournament to advance: its workbook, field and optional stream files."""
+
+    def __init__(self, name, filename, participants=None, results=None, pairings=None, standings=None):
+        self.name = name
+        self.filename = filename
+        self.participants = participants
+        self.results = results
+        self.pairings = pairings
+        self.standings = standings
+
+    def __repr__(self):
+        return f"Event({self.name!r}, {self.filename!r})"
+
+
+def read_participants(filename):
+    """One player per line; blank lines and lines starting with # are skipped."""
+    with open(filename, encoding='utf-8') as handle:
+        return [line.strip() for line in handle if line.strip() and not line.lstrip().startswith('#')]
+
+
+def workbook_participants(filename):
+    """The field of an existing tournament, in order of appearance on its first sheet."""
+    from standings import BYE
+
+    rows = read_sheet_rows(filename, read_sheet_names(filename)[0])
+    headers = rows[0] if rows else []
+    columns = [headers.index(header) for header in ('Participant', 'Opponent') if header in headers]
+    seen = {}
+    for row in rows[1:]:
+        for column in columns:
+            value = row[column] if column < len(row) else None
+            if isinstance(value, str) and value.lower() != BYE.lower():
+                seen.setdefault(value, None)
+    return list(seen)
+
+
+def events_from_directory(directory):
+    """Every workbook in directory, plus a new event for every participant list without one."""
+    events = []
+    entries = sorted(os.listdir(directory))
+    for entry in entries:
+        stem, extension = os.path.splitext(entry)
+        path = os.path.join(directory, entry)
+        if extension == '.xlsx' and not entry.startswith('~$'):
+            participants = os.path.join(directory, stem + '.txt')
+            events.append(Event(stem, path, participants if os.path.exists(participants) else None))
+        elif extension == '.txt' and stem + '.xlsx' not in entries:
+            events.append(Event(stem, os.path.join(directory, stem + '.xlsx'), path))
+    return events
+
+
+def events_from_manifest(filename):
+    """The events listed in a JSON manifest (see the module docstring)."""
+    with open(filename, encoding='utf-8') as handle:
+        manifest = json.load(handle)
+    base = os.path.dirname(os.path.abspath(filename))
+
+    def resolve(path):
+        return None if path is None else os.path.join(base, path)
+
+    events = []
+    for number, entry in enumerate(manifest.get('events', []), start=1):
+        if 'file' not in entry:
+            raise ValueError(f"{filename}: event {number} has no 'file'")
+        workbook_filename = resolve(entry['file'])
+        participants = entry.get('participants') or resolve(entry.get('participants_file'))
+        name = entry.get('name') or os.path.splitext(os.path.basename(workbook_filename))[0]
+        events.append(Event(name, workbook_filename, participants, resolve(entry.get('results')),
+                            resolve(entry.get('pairings')), resolve(entry.get('standings'))))
+    return events
+
+
+def load_events(path):
+    """Events from a directory or a manifest; raises ValueError if two events share a workbook."""
+    events = events_from_directory(path) if os.path.isdir(path) else events_from_manifest(path)
+    seen = {}
+    for event in events:
+        key = os.path.abspath(event.filename)
+        if key in seen:
+            raise ValueError(f"events {seen[key]!r} and {event.name!r} use the same workbook {event.filename!r}")
+        seen[key] = event.name
+    return events
+
+
+def _warm_up():
+    # Runs once per worker: the heavy imports are paid here, not by every event
+    import numpy  # noqa: F401
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+
+    import dynamic  # noqa: F401
+    import results  # noqa: F401
+    import state  # noqa: F401
+    import streams  # noqa: F401
+
+
+def _intern(names):
+    return [sys.intern(name) for name in names]
+
+
+def advance_event(event):
+    """Advances one event by a round; never raises.
+
+    Returns {'name', 'status' ('ok' or 'failed'), 'sheet', 'seconds',
+    'output', 'error'}; 'sheet' is the sheet written (None on failure).
+    """
+    import dynamic
+    from results import ResultSheetError
+
+    start = time.perf_counter()
+    output = io.StringIO()
+    outcome = {'name': event.name, 'status': 'ok', 'sheet': None, 'error': None}
+    try:
+        with redirect_stdout(output):
+            participants = event.participants
+            if isinstance(participants, str):
+                participants = read_participants(participants)
+            elif participants is None and os.path.exists(event.filename):
+                participants = workbook_participants(event.filename)
+            if not participants:
+                raise ValueError("no participants (add a .txt list or a 'participants' entry)")
+            participants = _intern(participants)
+
+            if not os.path.exists(event.filename):
+                outcome['sheet'] = dynamic.init(event.filename, participants, pairings_file=event.pairings)
+            else:
+                outcome['sheet'] = dynamic.next_round(event.filename, participants, results_file=event.results,
+                                                      pairings_file=event.pairings,
+                                                      standings_file=event.standings)
+    except ResultSheetError as error:
+        outcome.update(status='failed', error=f"Fix the result sheet and run again.\n{error}")
+    except (Exception, SystemExit) as error:
+        outcome.update(status='failed', error=''.join(traceback.format_exception_only(type(error), error)).strip())
+    outcome['seconds'] = time.perf_counter() - start
+    outcome['output'] = output.getvalue()
+    return outcome
+
+
+@traced()
+def run_batch(events, workers=DEFAULT_WORKERS):
+    """Advances every event, at most `workers` at a time; returns the outcomes in event order.
+
+    With workers=1 the events run one after the other in this process.
+    """
+    if workers <= 1 or len(events) <= 1:
+        return [advance_event(event) for event in events]
+    with ProcessPoolExecutor(max_workers=min(workers, len(events)), initializer=_warm_up) as pool:
+        return list(pool.map(advance_event, events))
+
+
+def print_outcomes(outcomes, verbose=False):
+    """One line per event, the captured output with verbose, and the errors of failed events."""
+    width = max([len(outcome['name']) for outcome in outcomes] + [5])
+    print(f"{'event':<{width}}  {'status':<6}  {'sheet written':<16} {'seconds':>8}")
+    for outcome in outcomes:
+        print(f"{outcome['name']:<{width}}  {outcome['status']:<6}  {outcome['sheet'] or '-':<16} "
+              f"{outcome['seconds']:>8.3f}")
+    for outcome in outcomes:
+        if verbose and outcome['output'].strip():
+            print(f"\n[{outcome['name']}]\n{outcome['output'].strip()}")
+        if outcome['error']:
+            print(f"\n[{outcome['name']}] failed:\n{outcome['error']}")
+    failed = sum(outcome['status'] != 'ok' for outcome in outcomes)
+    print(f"\n{len(outcomes) - failed} of {len(outcomes)} event(s) advanced.")
+    return failed
+
+
+def main(path, workers=DEFAULT_WORKERS, verbose=False):
+    """Loads the events at path, advances them and prints the outcomes; exits with 1 if any failed."""
+    try:
+        events = load_events(path)
+    except (OSError, ValueError) as error:
+        raise SystemExit(f"Can't read events from '{path}': {error}")
+    if not events:
+        raise SystemExit(f"No events found in '{path}'.")
+    outcomes = run_batch(events, workers)
+    if print_outcomes(outcomes, verbose):
+        raise SystemExit(1)
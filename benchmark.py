@@ -0,0 +1,303 @@
+"""Benchmarks for simulation, pairing, ranking and the Excel round cycle.
+
+Every case runs on a synthetic field (16 up to 10k players) and reports
+the best wall time over a few repeats, the peak Python memory of one
+separate traced run (tracemalloc), and a per-phase breakdown where the
+case has phases. Results are written as JSON, so two runs can be compared:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json       # exits 1 on a regression
+
+The Excel cases generate a workbook in the format dynamic.py writes, with
+1-15 completed Swiss rounds. They then time one full
+read_last_round_and_update_standings -> export_next_round_to_excel cycle on
+a fresh copy of it.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import dynamic
+import simulate
+from pairing import pair_round, pair_standings
+from ranking import RankingIndex
+from standings import BYE, BYE_ID, LOSS, WIN, Standings
+from tiebreak import TiebreakIndex
+from workbook import append_sheets, load_tournament
+
+
+DEFAULT_SIZES = [16, 128, 1024, 10000]
+DEFAULT_ROUNDS = [1, 5, 15]
+QUICK_SIZES = [16, 128, 1024]
+QUICK_ROUNDS = [1, 5]
+DEFAULT_TOLERANCE = 1.25
+
+
+class Phases:
+    """Collects named phase timings for one run of a case."""
+
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+
+def measure(case, repeat=3, setup=None):
+    """Runs case(phases) repeat times plus once under tracemalloc.
+
+    setup, if given, runs untimed before every run. Returns
+    {'wall', 'peak_kib', 'phases'} with the timings of the fastest run.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        phases = Phases()
+        start = time.perf_counter()
+        case(phases)
+        wall = time.perf_counter() - start
+        if best is None or wall < best[0]:
+            best = (wall, phases.times)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        case(Phases())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'wall': round(best[0], 6), 'peak_kib': round(peak / 1024, 1),
+            'phases': {name: round(seconds, 6) for name, seconds in best[1].items()}}
+
+
+def field(size):
+    return [f'Player {i:05d}' for i in range(size)]
+
+
+def played_standings(size, rounds, seed=0):
+    """Standings after `rounds` Swiss rounds of random results (with points left)."""
+    rng = random.Random(seed)
+    standings = Standings(field(size))
+    for round_number in range(1, rounds + 1):
+        pairs = pair_standings(standings)
+        p1 = [pair[0] for pair in pairs]
+        p2 = [pair[1] for pair in pairs]
+        results = [BYE if opponent == BYE_ID else rng.choice((WIN, LOSS)) for opponent in p2]
+        points = [0 if opponent == BYE_ID else rng.randint(0, 5) for opponent in p2]
+        standings.record_matches(round_number, p1, p2, results, points)
+        standings.end_round(round_number)
+    return standings
+
+
+def write_workbook(filename, size, rounds, seed=0):
+    """A tournament_results.xlsx as dynamic.py leaves it after `rounds` rounds, results of the last one filled in."""
+    standings = played_standings(size, rounds, seed)
+    sheets = {}
+    for round_number in range(1, rounds + 1):
+        rows = [[standings.name(match['p1']), standings.name(match['p2']),
+                 'Win' if match['result'] != LOSS else 'Loss', int(match['points'])]
+                for match in standings.round_matches(round_number)]
+        df_round = pd.DataFrame(rows, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
+        if round_number < rounds:
+            wins, losses, points_left = standings.totals_at(round_number)
+            order = standings.ranking_order(wins, losses, points_left)
+            df_rankings = pd.DataFrame({'Standings': [standings.names[i] for i in order], 'Wins': wins[order],
+                                        'Losses': losses[order], 'Points Left Standings': points_left[order]})
+            df_round = pd.concat([df_round, df_rankings], axis=1)
+        sheets[f'Swiss Round {round_number}'] = df_round
+
+    # pandas creates the package, append_sheets fills in every round
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        pd.DataFrame(columns=['Participant']).to_excel(writer, sheet_name='Swiss Round 1', index=False)
+    append_sheets(filename, sheets)
+
+
+def bench_simulation(sizes, rounds, repeat):
+    results = {}
+    for size in sizes:
+        participants = field(size)
+        for count in rounds:
+            random.seed(0)
+            results[f'simulate_swiss_rounds/n={size}/r={count}'] = measure(
+                lambda phases: simulate.simulate_swiss_rounds(participants, rounds=count), repeat)
+        random.seed(0)
+        results[f'simulate_de/n={size}'] = measure(lambda phases: simulate.simulate_de(list(participants)), repeat)
+    return results
+
+
+def bench_pairing(sizes, rounds, repeat):
+    results = {}
+    for size in sizes:
+        for count in rounds:
+            standings = played_standings(size, count)
+            # Player IDs, as dynamic.next_round_pairings passes them
+            score_groups = [list(group) for _, _, group in standings.ranking().score_groups()]
+            played = standings.opponent_sets()
+            byes_received = {player_id: int(byes) for player_id, byes in enumerate(standings.bye_counts()) if byes}
+            results[f'pair_standings/n={size}/r={count}'] = measure(lambda phases: pair_standings(standings), repeat)
+            results[f'pair_round/n={size}/r={count}'] = measure(
+                lambda phases: pair_round(score_groups, played, byes_received), repeat)
+    return results
+
+
+def bench_ranking(sizes, rounds, repeat):
+    results = {}
+    for size in sizes:
+        for count in rounds:
+            standings = played_standings(size, count)
+
+            def sort_from_scratch(phases):
+                standings.ranking_order(standings.wins, standings.losses, standings.points_left)
+
+            def rebuild_index(phases):
+                # What Standings.ranking_order() reads, built from scratch
+                np.fromiter(RankingIndex(standings), dtype=np.int64, count=len(standings))
+
+            def tiebreak_order(phases):
+                with phases('build'):
+                    tiebreaks = TiebreakIndex(standings)
+                with phases('order'):
+                    tiebreaks.ranking_order()
+
+            results[f'ranking/lexsort/n={size}/r={count}'] = measure(sort_from_scratch, repeat)
+            results[f'ranking/index/n={size}/r={count}'] = measure(rebuild_index, repeat)
+            results[f'ranking/tiebreaks/n={size}/r={count}'] = measure(tiebreak_order, repeat)
+    return results
+
+
+def bench_excel_cycle(sizes, rounds, repeat, directory):
+    results = {}
+    for size in sizes:
+        for count in rounds:
+            source = os.path.join(directory, f'source_{size}_{count}.xlsx')
+            write_workbook(source, size, count)
+            target = os.path.join(directory, 'tournament_results.xlsx')
+
+            def cycle(phases):
+                with phases('load_tournament'):
+                    tournament = load_tournament(target)
+                with phases('read_last_round'):
+                    standings, last_round = dynamic.read_last_round_and_update_standings(
+                        tournament, Standings(field(size)))
+                with phases('export'), open(os.devnull, 'w') as quiet, redirect_stdout(quiet):
+                    # Pairing plus writing the new sheets, as dynamic.py runs them
+                    dynamic.export_next_round_to_excel(target, standings, last_round + 1, tournament,
+                                                       de_threshold=last_round + 1)
+
+            # Every run starts from an untouched copy of the generated workbook
+            results[f'excel_cycle/n={size}/r={count}'] = measure(
+                cycle, repeat, setup=lambda: shutil.copyfile(source, target))
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, rounds=DEFAULT_ROUNDS, repeat=3, groups=None):
+    """Runs the selected benchmark groups and returns the JSON-ready report."""
+    groups = groups or ['simulation', 'pairing', 'ranking', 'excel']
+    cases = {}
+    if 'simulation' in groups:
+        cases.update(bench_simulation(sizes, rounds, repeat))
+    if 'pairing' in groups:
+        cases.update(bench_pairing(sizes, rounds, repeat))
+    if 'ranking' in groups:
+        cases.update(bench_ranking(sizes, rounds, repeat))
+    if 'excel' in groups:
+        directory = tempfile.mkdtemp(prefix='tournament-bench-')
+        try:
+            cases.update(bench_excel_cycle(sizes, rounds, repeat, directory))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'sizes': list(sizes),
+            'rounds': list(rounds),
+            'repeat': repeat,
+        },
+        'cases': cases,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns (case, baseline wall, current wall, ratio) for every case slower than tolerance x baseline."""
+    regressions = []
+    for case, current in report['cases'].items():
+        previous = baseline['cases'].get(case)
+        if previous is None or previous['wall'] <= 0:
+            continue
+        ratio = current['wall'] / previous['wall']
+        if ratio > tolerance:
+            regressions.append((case, previous['wall'], current['wall'], ratio))
+    return regressions
+
+
+def print_report(report, baseline=None):
+    print(f"{'case':<42} {'wall (s)':>10} {'peak (KiB)':>11} {'vs base':>8}  phases")
+    for case, measured in report['cases'].items():
+        ratio = ''
+        if baseline is not None and case in baseline['cases'] and baseline['cases'][case]['wall'] > 0:
+            ratio = f"{measured['wall'] / baseline['cases'][case]['wall']:.2f}x"
+        phases = ', '.join(f'{name} {seconds:.4f}' for name, seconds in measured['phases'].items())
+        print(f"{case:<42} {measured['wall']:>10.4f} {measured['peak_kib']:>11.1f} {ratio:>8}  {phases}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tournament engine.")
+    parser.add_argument('--sizes', type=int, nargs='+', help=f"field sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument('--rounds', type=int, nargs='+', help=f"completed rounds (default: {DEFAULT_ROUNDS})")
+    parser.add_argument('--repeat', type=int, default=3, help="timed repeats per case, best is kept (default: 3)")
+    parser.add_argument('--only', nargs='+', choices=['simulation', 'pairing', 'ranking', 'excel'],
+                        help="run only these groups")
+    parser.add_argument('--quick', action='store_true', help=f"sizes {QUICK_SIZES} and rounds {QUICK_ROUNDS}")
+    parser.add_argument('--output', help="write the results as JSON (e.g. a new baseline)")
+    parser.add_argument('--compare', help="baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"slowdown ratio counted as a regression (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    rounds = args.rounds or (QUICK_ROUNDS if args.quick else DEFAULT_ROUNDS)
+    report = run(sizes, rounds, args.repeat, args.only)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nResults written to '{args.output}'.")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for case, before, after, ratio in regressions:
+            print(f"REGRESSION {case}: {before:.4f}s -> {after:.4f}s ({ratio:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
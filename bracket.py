@@ -0,0 +1,96 @@
+"""Exact probabilities for a single-elimination (DE) bracket.
+
+Instead of sampling bracket paths, the standard dynamic program over bracket
+subtrees gives every player's exact chance of reaching each round. A bracket
+is a list of players in slot order: slots 0 and 1 meet in the first round,
+their winner meets the winner of slots 2 and 3, and so on (the way
+simulate_de plays it). Each round is one batched matrix-vector product over
+all sub-brackets, and the whole bracket costs O(n^2) for n players.
+
+dynamic.py re-pairs its DE rounds first-vs-last instead; fold_seed_order
+turns that into slot order, and first_vs_last_odds answers `python
+dynamic.py whatif` during the DE stage.
+"""
+import numpy as np
+
+
+def fold_seed_order(seeds):
+    """Slot order for brackets paired first-vs-last each round.
+
+    de_generate_pairings_based_on_rankings in dynamic.py pairs the i-th and
+    (n-1-i)-th entries, and latest_winners lists the winners in pairing order, so seeds [1..8] play 1v8, 2v7, 3v6, 4v5, then 1/8 v 4/5 and
+    2/7 v 3/6. This returns the fixed slot order of that bracket:
+    [1, 8, 4, 5, 2, 7, 3, 6].
+    """
+    seeds = list(seeds)
+    if len(seeds) <= 2:
+        return seeds
+    pairs = [[seeds[i], seeds[len(seeds) - 1 - i]] for i in range(len(seeds) // 2)]
+    # The pairs themselves are folded the same way in the next round
+    return [player for pair in fold_seed_order(pairs) for player in pair]
+
+
+def bracket_probabilities(slots, win_prob):
+    """Exact round-by-round probabilities for a bracket.
+
+    slots lists player indices (rows of win_prob) in bracket slot order and
+    must have a power-of-two length. win_prob[i, j] is P(i beats j).
+    Returns an array of shape (len(slots), rounds + 1) in slot order, where
+    column r is the probability of winning r matches: column 0 is all ones
+    and the last column is the chance of winning the bracket.
+    """
+    slots = np.asarray(slots)
+    size = len(slots)
+    if size == 0 or size & (size - 1):
+        raise ValueError(f"Bracket size must be a power of two, got {size}")
+    win_prob = np.asarray(win_prob, dtype=float)
+    rounds = size.bit_length() - 1
+
+    reach = np.ones((size, rounds + 1))
+    current = np.ones(size)
+    block = 1
+    for r in range(1, rounds + 1):
+        groups = size // (2 * block)
+        players = slots.reshape(groups, 2, block)
+        alive = current.reshape(groups, 2, block)
+        left, right = players[:, 0], players[:, 1]
+        # Every left player against every right player of the same sub-bracket
+        left_vs_right = win_prob[left[:, :, None], right[:, None, :]]
+        right_vs_left = win_prob[right[:, :, None], left[:, None, :]]
+        left_wins = alive[:, 0] * np.einsum('gij,gj->gi', left_vs_right, alive[:, 1])
+        right_wins = alive[:, 1] * np.einsum('gij,gj->gi', right_vs_left, alive[:, 0])
+        current = np.stack([left_wins, right_wins], axis=1).reshape(size)
+        reach[:, r] = current
+        block *= 2
+    return reach
+
+
+def title_probabilities(slots, win_prob):
+    """P(winning the bracket) for each slot."""
+    return bracket_probabilities(slots, win_prob)[:, -1]
+
+
+def first_vs_last_odds(entrants, win_prob=None, decided=None):
+    """Exact round-by-round probabilities for the rest of dynamic.py's DE bracket.
+
+    entrants are player IDs in the order the pending DE round pairs them:
+    table i is the i-th against the (n-1-i)-th. decided maps a table to True
+    if its first player won. Matches are coin flips unless win_prob (indexed
+    by player ID) is given. Returns bracket_probabilities' array in entrants
+    order.
+    """
+    size = len(entrants)
+    if size == 0 or size & (size - 1):
+        raise ValueError(f"Bracket size must be a power of two, got {size}")
+    if win_prob is None:
+        win_prob = np.full((size, size), 0.5)
+    else:
+        win_prob = np.asarray(win_prob, dtype=float)[np.ix_(entrants, entrants)]
+    for table, first_won in (decided or {}).items():
+        winner, loser = (table, size - 1 - table) if first_won else (size - 1 - table, table)
+        win_prob[winner, loser], win_prob[loser, winner] = 1.0, 0.0
+    slots = fold_seed_order(range(size))
+    reach = bracket_probabilities(slots, win_prob)
+    odds = np.empty_like(reach)
+    odds[slots] = reach
+    return odds
@@ -1,26 +1,33 @@
-import pandas as pd
+import argparse
 import random
-import copy
 import os
-from openpyxl import load_workbook
-import pdb;
 
-def generate_initial_pairings(participants):
-    """Generates pairings for a round in a Swiss-system tournament."""
-    # Shuffle only for the first round, subsequent rounds should be based on rankings
-    # random.shuffle(participants)  # No longer needed as sorting is done in simulate_swiss_round
-    # Pair participants, ensuring each is only paired once
-    return [participants[i:i + 2] for i in range(0, len(participants), 2)]
+# Only standard-library modules are imported up front, so `init`, `report` and --help start
+# instantly; NumPy, pandas and openpyxl are imported by the functions that need them.
+from instrument import add_arguments as add_instrument_arguments, run_instrumented, traced
+from pairing import BYE as PAIRING_BYE, pair_round, pair_standings
+from workbook import RESULT_COLUMNS, new_workbook, read_sheet_names, read_sheet_rows
 
+EXCEL_FILENAME = "tournament_results.xlsx"
 
-def simulate_swiss_round(participants, round_number, previous_rounds_results):
-    """Simulates a single Swiss round and updates standings"""
-    pairings = generate_initial_pairings(participants)
+PARTICIPANTS = ["Чом", "Жеко", "Рени", "Алекс", "Марто С.", "Миро", "Цвети", "Диди", "Нати З.",
+                "Роско", "Сандо", "Явката", "Стоян", "Нели", "Пламен", "Петьо", "Алекси", "Стан",
+                "Калата К.", "Нати Т.", "Александър К.", "Теодор Й.", "Габи"]
+
+# Number of Swiss rounds before the DE stage starts
+DE_THRESHOLD = 4
+
+def simulate_swiss_round(round_number, previous_rounds_results):
+    """Simulates a single Swiss round and returns (winner, loser, 'Win') tuples of player IDs"""
+    from standings import BYE_ID
+
+    # Score-group pairing without rematches; previous_rounds_results is the Standings store
+    pairings = pair_standings(previous_rounds_results)
 
     round_results = []
     for pair in pairings:
-        if len(pair) == 1:  # Handle bye if an odd number of participants
-            round_results.append((pair[0], 'Bye', 'Win'))
+        if pair[1] == BYE_ID:  # Handle bye if an odd number of participants
+            round_results.append((pair[0], BYE_ID, 'Win'))
         else:
             winner = random.choice(pair)
             loser = pair[1] if pair[0] == winner else pair[0]
@@ -29,56 +36,54 @@ def simulate_swiss_round(participants, round_number, previous_rounds_results):
 
 
 def simulate_swiss_rounds(participants, num_rounds=1, start_round=1, initial_standings=None):
+    from standings import Standings, BYE, BYE_ID, WIN
+
     if initial_standings is None:
-        standings = {participant: {'wins': 0, 'losses': 0, 'matches': [], 'Points Left': 0} for participant in participants}
+        standings = Standings(participants)
     else:
         standings = initial_standings
 
     detailed_rounds_results = []
 
     for participant in participants:
-        if participant not in standings:
-            standings[participant] = {'wins': 0, 'losses': 0, 'matches': [], 'Points Left': 0}
+        standings.add_player(participant)
 
     for round_number in range(start_round, start_round + num_rounds):
-        sorted_participants = sorted(standings.keys(), key=lambda x: (-standings[x]['wins'], standings[x]['losses'], x))
-        round_results = simulate_swiss_round(sorted_participants, round_number, standings)
-
-        for result in round_results:
-            if result[1] == 'Bye':
-                participant = result[0]
-                standings[participant]['wins'] += 1
-                standings[participant]['matches'].append((round_number, 'Bye', 'Win'))
-            else:
-                winner, loser, _ = result
-                standings[winner]['wins'] += 1
-                standings[loser]['losses'] += 1
-                standings[winner]['matches'].append((round_number, loser, 'Win'))
-                standings[loser]['matches'].append((round_number, winner, 'Loss'))
+        round_results = simulate_swiss_round(round_number, standings)
+
+        winners = [result[0] for result in round_results]
+        losers = [result[1] for result in round_results]
+        results = [BYE if loser == BYE_ID else WIN for loser in losers]
+        standings.record_matches(round_number, winners, losers, results, [0] * len(winners))
 
-        detailed_rounds_results.append((round_number, copy.deepcopy(standings)))
+        # Snapshot by offset into the match history instead of a deep copy
+        detailed_rounds_results.append((round_number, standings.end_round(round_number)))
 
     return standings, detailed_rounds_results
 
-def generate_pairings_based_on_rankings(participants):
+@traced()
+def generate_pairings_based_on_rankings(score_groups, played=None, byes_received=None):
     """
     Generates pairings for the next round based on current rankings.
-    Assumes 'participants' is a list sorted by rankings, highest first.
+    Assumes 'score_groups' is a list of participant lists (same wins and losses), highest first.
+    'played' maps a participant to the opponents they already faced and 'byes_received'
+    to how many byes they had, so rematches and repeated byes are avoided.
     """
     pairings = []
-    # Generate pairings by taking two at a time from the sorted list
-    for i in range(0, len(participants), 2):
-        # Check if there's an odd participant out for a bye
-        if i + 1 < len(participants):
-            pair = (participants[i], participants[i+1], "", "")
-            pairings.append(pair)
+    for participant, opponent in pair_round(score_groups, played, byes_received):
+        if opponent == PAIRING_BYE:
+            # Assign a bye (win) to the participant picked by the pairing engine
+            pairings.append((participant, 'Bye', 'Win'))
         else:
-            # Assign a bye (win) if odd number of participants
-            pair = (participants[i], 'Bye', 'Win')
-            pairings.append(pair)
+            pairings.append((participant, opponent, "", ""))
     return pairings
 
 
+def read_match_history(tournament, players):
+    """Collects who played whom and who had a bye, by player ID (from the workbook model or a storage backend)."""
+    return tournament.match_history(players)
+
+
 def de_generate_pairings_based_on_rankings(participants):
     pairings = []
     num_participants = len(participants)
@@ -87,167 +92,147 @@ def de_generate_pairings_based_on_rankings(participants):
     return pairings
     
 
-def export_next_round_to_excel(filename, standings, round_number):
-    # Load the existing workbook
-    book = load_workbook(filename)
+def rankings_rows(standings):
+    """Yields the rows of the rankings block, best first: totals, then the tiebreaks (streams.STANDINGS_COLUMNS)."""
+    # Opponent-based tiebreaks next to the rankings, for the TO to break ties by hand
+    tiebreaks = standings.tiebreaks().table()
+    tiebreaks['OMW%'] = (tiebreaks['OMW%'] * 100).round(2)
+    tiebreak_columns = [values.tolist() for values in tiebreaks.values()]
+    # Sorted by wins, then losses, then points left
+    for row in standings.rows():
+        player_id = standings.ids[row[0]]
+        yield list(row) + [values[player_id] for values in tiebreak_columns]
 
-    # Ensure there's at least one visible sheet
-    if all(ws.sheet_state == 'hidden' for ws in book.worksheets):
-        book.worksheets[0].sheet_state = 'visible'
 
-    # Calculate rankings based on standings
-    rankings_data = []
-    for participant, info in standings.items():
-        rankings_data.append([participant, info['wins'], info['losses'], info['Points Left Standings']])
+def rankings_frame(standings):
+    """The rankings block written next to a round's results: totals plus tiebreaks, best first."""
+    import pandas as pd
+    from streams import STANDINGS_COLUMNS
+
+    return pd.DataFrame(list(rankings_rows(standings)), columns=STANDINGS_COLUMNS) #this should go to the first sheet only
 
-    # Sort rankings data based on wins, then losses
-    rankings_data.sort(key=lambda x: (-x[1], x[2], x[3]))  # Sort by wins, then losses
-    df_rankings = pd.DataFrame(rankings_data, columns=['Standings', 'Wins', 'Losses', 'Points Left Standings']) #this should go to the first sheet only
-    
-    # Define the threshold for the start of the DE stage
-    DE_THRESHOLD = 4
-    
-    # From here we need to check if the round_number is bigger than 4 and if so we need to start the DE stage
-    if round_number > DE_THRESHOLD: #this tells us that we are into the DE stage
-        sorted_standings = sorted(standings.items(), key=lambda x: (-x[1]['wins'], x[1]['losses'], x[1]['Points Left Standings']))
-    
 
+@traced()
+def next_round_pairings(standings, round_number, tournament, de_threshold=DE_THRESHOLD):
+    """The next round's sheet name and pairing rows (Participant, Opponent, Result, Points Left), without pandas.
+
+    'tournament' is anything with the workbook read interface (match_history,
+    latest_winners). Pairing runs on player IDs; names are filled in for the
+    rows. A bye row has only three values.
+    """
+    # From here we need to check if the round_number is bigger than de_threshold and if so we need to start the DE stage
+    if round_number > de_threshold: #this tells us that we are into the DE stage
         #TODO this part for DE is far from ready
         # Get the participants from the previous DE stage and if this is the first DE stage than take the top 8 participants
-        if round_number == DE_THRESHOLD+1:
-            top_n_participants = qualify_for_de(sorted_standings, top_n=8)
+        if round_number == de_threshold+1:
+            top_n_participants = qualify_for_de(standings.ranking_order().tolist(), top_n=8)
         else:
-            top_n_participants = de_read_last_round_and_update_standings(filename)
-            
-        # Export DE results to Excel
-        with pd.ExcelWriter(filename, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            if(round_number <= DE_THRESHOLD+1):
-                existing_data = pd.read_excel(filename, sheet_name=f'Swiss Round {round_number-1}', usecols=[0, 1, 2, 3])
-                combined_data = pd.concat([existing_data, df_rankings], axis=1)
-                combined_data.to_excel(writer, sheet_name=f'Swiss Round {round_number-1}', index=False, startcol=0)
-            
-            # Generate pairings for the next round based on current rankings
-            de_pairings = de_generate_pairings_based_on_rankings(top_n_participants)
-
-            # Convert pairings to DataFrame for easier manipulation and export
-            df_de_round = pd.DataFrame(de_pairings, columns=['Participant', 'Opponent', "Result", 'Points Left'])
-
-            # Export DE round results to Excel
-            df_de_round.to_excel(writer, sheet_name=f'DE Round {round_number}', index=False)
-            
-            #This code just sets the width of the columns to 25
-            worksheet = writer.sheets[f'DE Round {round_number}']
-            for col in worksheet.columns:
-                worksheet.column_dimensions[col[0].column_letter].width = 25
-                
-            if(round_number <= DE_THRESHOLD+1):
-                worksheet = writer.sheets[f'Swiss Round {round_number-1}']
-                for col in worksheet.columns:
-                    worksheet.column_dimensions[col[0].column_letter].width = 25
-            
-    else:
-        # Since you want to prepare for the next round without results, we'll use the rankings to generate pairings
-        # Assuming you have a function to generate pairings from rankings or standings
-        participants_sorted_by_rankings = [participant for participant, _ in
-                           sorted(standings.items(), key=lambda x: (-x[1]['wins'], x[1]['losses'], x[1]['Points Left Standings']))]
-        round_data = generate_pairings_based_on_rankings(participants_sorted_by_rankings)
-        # Convert round_data to DataFrame for easier manipulation and export
-        df_next_round = pd.DataFrame(round_data, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
-        next_round_sheet_name = f'Swiss Round {round_number}'
-            
-        print(f"{next_round_sheet_name} has been added to 'tournament_results.xlsx'.")
-        # Use pandas to write DataFrame to the Excel sheet in the workbook
-        with pd.ExcelWriter(filename, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            df_next_round.to_excel(writer, sheet_name=next_round_sheet_name, index=False)
-            
-            # Get the existing data in columns 1 and 2
-            existing_data = pd.read_excel(filename, sheet_name=f'Swiss Round {round_number-1}', usecols=[0, 1, 2, 3])
-            combined_data = pd.concat([existing_data, df_rankings], axis=1)
-            combined_data.to_excel(writer, sheet_name=f'Swiss Round {round_number-1}', index=False, startcol=0)
-            
-            #This code just sets the width of the columns to 25
-            worksheet = writer.sheets[next_round_sheet_name]
-            for col in worksheet.columns:
-                worksheet.column_dimensions[col[0].column_letter].width = 25
-                
-            worksheet = writer.sheets[f'Swiss Round {round_number-1}']
-            for col in worksheet.columns:
-                worksheet.column_dimensions[col[0].column_letter].width = 25
-
-
-def read_last_round_and_update_standings(filename, initial_standings):
-    xls = pd.ExcelFile(filename)
-    
-    if(xls.sheet_names.__len__ == 1):
-        latest_round_sheet_name = xls.sheet_names[xls.sheet_names[0]]
-        previous_round_sheet_name = xls.sheet_names[xls.sheet_names[0]]
-    else:
-        latest_round_sheet_name = xls.sheet_names[xls.sheet_names.__len__() - 1]
-        previous_round_sheet_name = xls.sheet_names[xls.sheet_names.__len__() - 2]
-    df_latest_round = pd.read_excel(filename, sheet_name=latest_round_sheet_name)
-    df_previous_round = pd.read_excel(filename, sheet_name=previous_round_sheet_name)
+            top_n_participants = de_read_last_round_and_update_standings(tournament, standings.players)
+        # Generate pairings for the next round based on current rankings
+        pairings = de_generate_pairings_based_on_rankings(top_n_participants)
+        return f'DE Round {round_number}', _named_pairings(standings, pairings)
 
-    try:
-        last_round_played = int(latest_round_sheet_name.split()[-1])
-    except ValueError:
-        print(f"Error extracting round number from sheet name: {latest_round_sheet_name}")
-        last_round_played = 0
+    # Since you want to prepare for the next round without results, we'll use the rankings to generate pairings
+    score_groups = [list(group) for _, _, group in standings.ranking().score_groups()]
+    played, byes_received = read_match_history(tournament, standings.players)
+    pairings = generate_pairings_based_on_rankings(score_groups, played, byes_received)
+    return f'Swiss Round {round_number}', _named_pairings(standings, pairings)
+
+
+def _named_pairings(standings, pairings):
+    """Pairing rows of player IDs with the names filled in ('Bye' stays as it is)."""
+    names = standings.names
+    return [(names[row[0]], row[1] if row[1] == 'Bye' else names[row[1]]) + tuple(row[2:]) for row in pairings]
+
+
+@traced()
+def next_round_sheets(standings, round_number, tournament, de_threshold=DE_THRESHOLD):
+    """Builds the next round's pairings and the sheets that go with them.
+
+    'tournament' is anything with the workbook read interface (round_results,
+    match_history, latest_winners). Returns (sheet_name, df_next_round,
+    new_sheets) where new_sheets maps every sheet to write to its DataFrame.
+    """
+    import pandas as pd
+
+    df_rankings = rankings_frame(standings)
+    next_round_sheet_name, round_data = next_round_pairings(standings, round_number, tournament, de_threshold)
+    # Convert round_data to DataFrame for easier manipulation and export
+    df_next_round = pd.DataFrame(round_data, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
+
+    # Only the new sheet and the last Swiss sheet (results in columns 1 to 4, rankings next to them) are written;
+    # once the DE stage is under way the Swiss sheets stay as they are
+    new_sheets = {next_round_sheet_name: df_next_round}
+    if round_number <= de_threshold + 1:
+        existing_data = tournament.round_results(f'Swiss Round {round_number-1}')
+        new_sheets[f'Swiss Round {round_number-1}'] = pd.concat([existing_data, df_rankings], axis=1)
+    return next_round_sheet_name, df_next_round, new_sheets
+
+
+@traced()
+def export_next_round_to_excel(filename, standings, round_number, tournament=None, de_threshold=DE_THRESHOLD):
+    from workbook import append_sheets, load_tournament
+
+    # Reuse the already parsed workbook when the caller has one
+    if tournament is None:
+        tournament = load_tournament(filename)
+
+    next_round_sheet_name, df_next_round, new_sheets = next_round_sheets(standings, round_number, tournament,
+                                                                         de_threshold)
+    if next_round_sheet_name.startswith('Swiss'):
+        print(f"{next_round_sheet_name} has been added to '{filename}'.")
+
+    # Only these sheets are serialized; the rest of the workbook is copied as-is (column width 25 as before)
+    append_sheets(filename, new_sheets, column_width=25)
+    return next_round_sheet_name, df_next_round
+
+
+@traced()
+def read_last_round_and_update_standings(tournament, initial_standings):
+    from registry import UNKNOWN, PlayerRegistry
+    from results import apply_round_results
+    from standings import Standings
+
+    # 'tournament' is the workbook parsed once by load_tournament
+    latest_round = tournament.latest
+    previous_round = tournament.previous
+
+    last_round_played = latest_round.round_number
+    if last_round_played == 0:
+        print(f"Error extracting round number from sheet name: {latest_round.name}")
         
-  # Check if standings exist in the previous file
-    if 'Wins' in df_previous_round.columns:
-        standings = {row['Standings']: {'wins': row['Wins'], 'losses': row['Losses'], 'matches': [], 
-                                        'Points Left Standings': row['Points Left Standings']} for index, row in df_previous_round.iterrows()}
+  # Check if standings exist in the previous file. Never in the latest sheet: a rankings block
+    # there (apply-results --write-rankings) already counts the round replayed below.
+    if previous_round is not None and 'Wins' in previous_round:
+        ranked = list(previous_round.rows('Standings', 'Wins', 'Losses', 'Points Left Standings'))
+        # IDs follow the participant list, as in the saved state, rather than the order of the rankings block
+        ranked_names = [row[0] for row in ranked]
+        known = initial_standings.players.lookup(ranked_names)
+        if sorted(known) == list(range(len(initial_standings))):
+            players = initial_standings.players
+        else:
+            # Players missing from the rankings are left out, players missing from the list come last
+            field = [initial_standings.names[player_id] for player_id in sorted(set(known) - {UNKNOWN})]
+            players = PlayerRegistry(field + ranked_names)
+            players.add_aliases({alias: name for alias, name in initial_standings.players.aliases.items()
+                                 if name in players})
+        ids = players.lookup(ranked_names)
+        standings = Standings(players)
+        standings.wins[ids], standings.losses[ids], standings.points_left[ids] = zip(*[row[1:] for row in ranked])
     else:
         standings = initial_standings
 
-    for index, row in df_latest_round.iterrows():
-        participant = row['Participant']
-        opponent = row['Opponent']
-        result = row['Result']  # Assumes 'Win', 'Loss', or 'Bye'
-        points_left = row['Points Left']
-           
-        if opponent.lower() == 'bye':
-            standings[participant]['wins'] += 1
-            standings[participant]['Points Left Standings'] += 0
-            standings[participant]['matches'].append((last_round_played, opponent, result, 0))
-        elif result.lower() == 'win':
-            standings[participant]['wins'] += 1
-            standings[participant]['Points Left Standings'] += 0
-            standings[opponent]['losses'] += 1
-            standings[opponent]['Points Left Standings'] += points_left
-            standings[participant]['matches'].append((last_round_played, opponent, result, 0))
-            standings[opponent]['matches'].append((last_round_played, participant, 'Loss', points_left))
-        elif result.lower() == 'loss':
-            standings[participant]['losses'] += 1
-            standings[participant]['Points Left Standings'] += points_left
-            standings[opponent]['wins'] += 1
-            standings[opponent]['Points Left Standings'] += 0
-            standings[participant]['matches'].append((last_round_played, opponent, result, points_left))
-            standings[opponent]['matches'].append((last_round_played, participant, 'Win', 0))
+    # All rows are validated and applied in one batch; bad rows raise ResultSheetError
+    apply_round_results(standings, last_round_played, latest_round.column('Participant'),
+                        latest_round.column('Opponent'), latest_round.column('Result'),
+                        latest_round.column('Points Left'))
 
     return standings, last_round_played
 
 
-def de_read_last_round_and_update_standings(filename):
-    xls = pd.ExcelFile(filename)
-    if(xls.sheet_names.__len__ == 1):
-        latest_round_sheet_name = xls.sheet_names[xls.sheet_names[0]]
-    else:
-        latest_round_sheet_name = xls.sheet_names[xls.sheet_names.__len__() - 1]
-    df_latest_round = pd.read_excel(filename, sheet_name=latest_round_sheet_name)
-
-    winners = []
-    for index, row in df_latest_round.iterrows():
-        participant = row['Participant']
-        opponent = row['Opponent']
-        result = row['Result']  # Assumes 'Win', 'Loss', or 'Bye'
-           
-        if result.lower() == 'win':
-            winners.append(participant)
-        elif result.lower() == 'loss':
-            winners.append(opponent)
-
-    return winners
+def de_read_last_round_and_update_standings(tournament, players):
+    # IDs of the winners of the latest round: 'Win' keeps the participant, 'Loss' the opponent
+    return tournament.latest_winners(players)
 
 
 # Ensure the rest of your functions are defined here, particularly those for the DE stage.
@@ -257,9 +242,7 @@ def qualify_for_de(sorted_standings, top_n=8):
     """Selects the top_n participants based on Swiss stage performance for the DE stage."""
     # No need to sort here since it's already sorted before passing
     
-    sorted_standings_names = [participant for participant, _ in sorted_standings]
-    return sorted_standings_names[:top_n]
-    # return sorted_standings[:top_n]
+    return sorted_standings[:top_n]
 
 
 def simulate_de(participants):
@@ -299,44 +282,473 @@ def create_initial_pairings(participants):
 
     return pairings
 
-def export_to_excel(pairings):
-    # Prepare data for export
-        round_data = [[pair[0], pair[1], '', ''] for pair in pairings]
-        df_round = pd.DataFrame(round_data, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
+def export_to_excel(pairings, filename=EXCEL_FILENAME):
+    # Prepare data for export; empty Result/Points Left cells are left for the TO
+    round_data = [[pair[0], pair[1], None, None] for pair in pairings]
+
+    # Export to Excel with the standard library only, column width 25 as before
+    new_workbook(filename, {'Swiss Round 1': (['Participant', 'Opponent', 'Result', 'Points Left'], round_data)},
+                 column_width=25)
+    print(f"Initial round has been exported to '{filename}'.")
 
-        # Export to Excel
-        with pd.ExcelWriter("tournament_results.xlsx", engine='openpyxl') as writer:
-            df_round.to_excel(writer, sheet_name='Swiss Round 1', index=False)
+@traced()
+def run_with_database(database, excel_filename, participants):
+    """One round of the tournament with SQLite as the source of truth and Excel as the report.
 
-            worksheet = writer.sheets[f'Swiss Round 1']
-            for col in worksheet.columns:
-                worksheet.column_dimensions[col[0].column_letter].width = 25
-        print("Initial round has been exported to 'tournament_results.xlsx'.")
+    The TO still types results into the latest sheet of the workbook; only that
+    sheet is read, the results are applied to the database in one transaction,
+    and the next round's pairings are stored and exported.
+    """
+    from results import ResultSheetError
+    from storage import SQLiteStorage, parse_sheet_name, sheet_name
+    from workbook import load_sheet
+
+    with SQLiteStorage(database) as store:
+        if store.is_new():
+            print("\nGenerating Initial Swiss Stage...")
+            store.add_players(participants)
+            pairings = create_initial_pairings(list(participants))
+            store.save_pairings(1, 'Swiss', pairings)
+            export_to_excel(pairings, excel_filename)
+            return
+
+        round_number, kind, completed = store.current_round()
+        if not completed:
+            latest_round = load_sheet(excel_filename, sheet_name(kind, round_number))
+            try:
+                store.apply_results(round_number, latest_round.column('Participant'), latest_round.column('Opponent'),
+                                    latest_round.column('Result'), latest_round.column('Points Left'))
+            except ResultSheetError as error:
+                print(f"Fix the result sheet and run again.\n{error}")
+                return
+
+        standings, _ = store.load_standings()
+        next_sheet_name, df_next_round = export_next_round_to_excel(excel_filename, standings, round_number + 1, store)
+        next_kind, next_round = parse_sheet_name(next_sheet_name)
+        store.save_pairings(next_round, next_kind, zip(df_next_round['Participant'], df_next_round['Opponent']))
+        print(f"Round {round_number}'s results are stored in '{database}'.")
+
+
+def _stream_rows(rows):
+    """Pairing rows as streams write them: empty cells ('' or NaN from a DataFrame) become None."""
+    for row in rows:
+        yield [None if value == '' or value != value else value for value in row]
+
+
+def init(excel_filename=EXCEL_FILENAME, participants=PARTICIPANTS, pairings_file=None, excel=True):
+    """Shuffles the field and writes Swiss Round 1 (standard library only unless excel is False).
+
+    pairings_file also writes the pairings as CSV/JSON Lines. Without excel
+    the tournament lives in the saved state alone and results come in as
+    streams (apply_results(results_file=...)). Returns the sheet name.
+    """
+    from registry import PlayerRegistry
+
+    print("\nGenerating Initial Swiss Stage...")
+    # One entry per player, however the list spells them
+    participants = PlayerRegistry(participants).names
+    # Create initial pairings
+    pairings = create_initial_pairings(list(participants))
+    if excel:
+        export_to_excel(pairings, excel_filename)
+        # No snapshot yet: the first apply-results (or serve) builds it from this one-sheet workbook
+    else:
+        from standings import Standings
+        from state import EngineState, state_filename
+
+        state = EngineState(Standings(participants), sheet_names=['Swiss Round 1'])
+        state.capture_rng()
+        state.save(state_filename(excel_filename))
+    if pairings_file is not None:
+        from streams import write_pairings
 
-def main():
-    excel_filename = "tournament_results.xlsx"
-    participants = ["Чом", "Жеко", "Рени", "Алекс", "Марто С.", "Миро", "Цвети", "Диди", "Нати З.",
-                    "Роско", "Сандо", "Явката", "Стоян", "Нели", "Пламен", "Петьо", "Алекси", "Стан", 
-                    "Калата К.", "Нати Т.", "Александър К.", "Теодор Й.", "Габи"]
+        write_pairings(pairings_file, _stream_rows(pairings))
+        print(f"Round 1's pairings have been written to '{pairings_file}'.")
+    return 'Swiss Round 1'
 
-    # Initialize standings
-    standings = {participant: {'wins': 0, 'losses': 0, 'matches': [], 'Points Left Standings': 0} for participant in participants}
 
-    if os.path.exists(excel_filename):
+def _add_aliases(players, aliases):
+    """Registers SPELLING -> name aliases (see registry.py); a bad one stops the run."""
+    try:
+        players.add_aliases(aliases or {})
+    except ValueError as error:
+        raise SystemExit(f"Bad alias: {error}")
+
+
+@traced()
+def apply_results(excel_filename=EXCEL_FILENAME, participants=PARTICIPANTS, write_rankings=False,
+                  results_file=None, excel=True, aliases=None):
+    """Applies the latest round's results and saves the state.
+
+    The results are the ones typed into the latest sheet, or those in
+    results_file (CSV/JSON Lines, see streams.py) if given. Uses the saved
+    snapshot when it still matches the workbook and parses the whole
+    workbook otherwise; without excel there is no workbook and the snapshot
+    is required. With write_rankings the updated rankings are also written
+    next to a Swiss round's results (next_round does that anyway). aliases
+    maps other spellings to players' names; they are kept in the state for
+    later rounds. Returns (state, last_round_played); raises
+    results.ResultSheetError for bad result rows.
+    """
+    from standings import Standings
+    from state import EngineState, state_filename
+    from storage import parse_sheet_name
+    from streams import read_results
+    from workbook import append_sheets, load_sheet, load_tournament
+
+    state = EngineState.load(state_filename(excel_filename))
+    if not excel and (state is None or results_file is None):
+        raise SystemExit(f"Without the workbook both a results file and the saved state "
+                         f"'{state_filename(excel_filename)}' (see init) are needed.")
+    rebuild = state is None or (excel and not state.matches_workbook(read_sheet_names(excel_filename)))
+    if not rebuild:
+        state.restore_rng()
+        _add_aliases(state.standings.players, aliases)
+        kind, last_round_played = parse_sheet_name(state.pending_sheet)
+        if results_file is not None:
+            latest_round = read_results(results_file, state.pending_sheet)
+        else:
+            latest_round = load_sheet(excel_filename, state.pending_sheet)
+        columns = [latest_round.column(header) for header in RESULT_COLUMNS]
+        if last_round_played in state.round_kinds:
+            if not state.results_changed(last_round_played, *columns):
+                print(f"\nRound {last_round_played}'s results were already applied.")
+                return state, last_round_played
+            print(f"\nRound {last_round_played}'s results were corrected since they were applied.")
+            if excel:
+                rebuild = True
+            else:
+                # No workbook to rebuild from: swap the round's results for the corrected ones
+                state.undo_round(last_round_played)
+        if not rebuild:
+            print("\nFile exists. Resuming from saved state and reading only the last round...")
+            state.apply_round(last_round_played, kind, *columns)
+    if rebuild:
         print("\nFile exists. Reading last round results and updating standings...")
-        # This function needs to be implemented to read the last round results and update standings.
-        # Assuming it returns the updated standings and the round number of the last round played.
-        standings, last_round_played = read_last_round_and_update_standings(excel_filename, standings)
+        # No usable snapshot: parse the whole workbook once and rebuild the state from it
+        tournament = load_tournament(excel_filename)
+        if results_file is not None:
+            # The streamed results stand in for the latest sheet
+            latest_name = tournament.sheet_names[-1]
+            tournament.sheets[latest_name] = read_results(results_file, latest_name)
+        initial_standings = Standings(participants)
+        _add_aliases(initial_standings.players, aliases)
+        standings, last_round_played = read_last_round_and_update_standings(tournament, initial_standings)
+        state = EngineState.from_tournament(tournament, standings)
+
+    if excel and write_rankings and state.pending_sheet.startswith('Swiss'):
+        import pandas as pd
+
+        combined_data = pd.concat([state.round_results(state.pending_sheet), rankings_frame(state.standings)], axis=1)
+        append_sheets(excel_filename, {state.pending_sheet: combined_data}, column_width=25)
+    elif excel and results_file is not None and state.pending_sheet.startswith('DE'):
+        # Streamed DE results are copied into the workbook (Swiss sheets get them with the rankings)
+        append_sheets(excel_filename, {state.pending_sheet: state.round_results(state.pending_sheet)}, column_width=25)
+    state.capture_rng()
+    state.save(state_filename(excel_filename))
+    return state, last_round_played
+
+
+@traced()
+def next_round(excel_filename=EXCEL_FILENAME, participants=PARTICIPANTS, results_file=None, pairings_file=None,
+               standings_file=None, excel=True, aliases=None):
+    """Applies the latest results if that has not happened yet and exports the next round's pairings.
+
+    results_file, pairings_file and standings_file read the results from and
+    write the pairings and standings to CSV/JSON Lines; without excel they
+    are the only input and output and no DataFrame is built for the pairings.
+    Returns the new round's sheet name.
+    """
+    from state import state_filename
+
+    state, last_round_played = apply_results(excel_filename, participants, results_file=results_file, excel=excel,
+                                             aliases=aliases)
 
+    if excel:
         # Export next round's pairings to Excel
         # This function needs to append the new round's pairings to the existing Excel file.
-        export_next_round_to_excel(excel_filename, standings, last_round_played + 1)
-        print(f"Round {last_round_played}'s pairings have been added to 'tournament_results.xlsx'.")
+        sheet, df_next_round = export_next_round_to_excel(excel_filename, state.standings, last_round_played + 1,
+                                                          state)
+        print(f"Round {last_round_played}'s pairings have been added to '{excel_filename}'.")
+        pairings = df_next_round.itertuples(index=False)
+    else:
+        sheet, pairings = next_round_pairings(state.standings, last_round_played + 1, state)
+    pairings = list(_stream_rows(pairings))
+    state.sheet_names.append(sheet)
+    if sheet.startswith('DE'):
+        state.bracket = [(state.standings.ids[row[0]], state.standings.ids[row[1]]) for row in pairings]
+
+    if pairings_file is not None or standings_file is not None:
+        from streams import write_pairings, write_standings
+
+        if pairings_file is not None:
+            write_pairings(pairings_file, pairings)
+            print(f"{sheet}'s pairings have been written to '{pairings_file}'.")
+        if standings_file is not None:
+            write_standings(standings_file, rankings_rows(state.standings))
+            print(f"Standings after round {last_round_played} have been written to '{standings_file}'.")
+
+    # Snapshot for the next run
+    state.capture_rng()
+    state.save(state_filename(excel_filename))
+    return sheet
+
+
+def report(excel_filename=EXCEL_FILENAME, top=None):
+    """Prints the latest rankings block of the workbook (standard library only)."""
+    names = read_sheet_names(excel_filename)
+    for name in reversed(names):
+        rows = read_sheet_rows(excel_filename, name)
+        headers = rows[0] if rows else []
+        if 'Standings' not in headers:
+            continue
+        columns = [column for column in headers[headers.index('Standings'):] if column is not None]
+        start = headers.index('Standings')
+        ranked = [row[start:start + len(columns)] for row in rows[1:] if len(row) > start and row[start] is not None]
+        widths = [max(len(str(column)), 6) + 2 for column in columns[1:]]
+        print(f"Standings after {name}:")
+        print(f"{'#':>4}  {'Participant':<24}" + ''.join(f"{str(column):>{width}}"
+                                                         for column, width in zip(columns[1:], widths)))
+        for rank, row in enumerate(ranked[:top] if top else ranked, start=1):
+            values = list(row[1:]) + [None] * (len(columns) - len(row))
+            print(f"{rank:>4}  {str(row[0]):<24}" + ''.join(f"{'' if value is None else value:>{width}}"
+                                                             for value, width in zip(values, widths)))
+        return
+    print(f"No standings in '{excel_filename}' yet; they are written after the first round's results.")
+
+
+def _print_de_odds(state, rows, player=None):
+    """Prints every DE entrant's exact chances of going further (bracket.first_vs_last_odds).
+
+    The entrants are the pending DE round's bracket, or the winners of the
+    latest round once it is applied. rows are the pending round's results
+    (RESULT_COLUMNS); the ones already typed in count as decided.
+    """
+    from bracket import first_vs_last_odds
+    from storage import parse_sheet_name
+
+    standings = state.standings
+    before = state.pending_sheet
+    if state.bracket and parse_sheet_name(state.pending_sheet)[1] not in state.round_kinds:
+        entrants = [p1 for p1, _ in state.bracket] + [p2 for _, p2 in reversed(state.bracket)]
+        tables = {p1: table for table, (p1, _) in enumerate(state.bracket)}
     else:
-        print("\nGenerating Initial Swiss Stage...")
-        # Create initial pairings
-        pairings = create_initial_pairings(participants)
-        export_to_excel(pairings)
+        entrants, tables = state.latest_winners(), {}
+        before = 'the next DE round'
+    decided = {}
+    for participant, _, result, _ in rows:
+        table = tables.get(standings.ids.get(participant)) if participant is not None else None
+        if table is not None and str(result).strip().lower() in ('win', 'loss'):
+            decided[table] = str(result).strip().lower() == 'win'
+    if len(entrants) == 1:
+        print(f"The DE stage is over; the champion is {standings.names[entrants[0]]}.")
+        return
+    try:
+        odds = first_vs_last_odds(entrants, decided=decided)
+    except ValueError as error:
+        raise SystemExit(f"No exact DE odds for this bracket: {error}")
+    shown = range(len(entrants))
+    if player is not None:
+        if player not in standings.ids:
+            raise SystemExit(f"No player named {player!r}.")
+        if standings.ids[player] not in entrants:
+            print(f"{player} is out of the DE stage.")
+            return
+        shown = [entrants.index(standings.ids[player])]
+
+    print(f"Chances in the DE bracket before {before}, exact (every match a coin flip):")
+    print(f"{'#':>4}  {'Participant':<24}" + ''.join(f"{f'win {r}':>9}" for r in range(1, odds.shape[1] - 1))
+          + f"{'title':>9}")
+    for slot in shown:
+        print(f"{slot + 1:>4}  {standings.names[entrants[slot]]:<24}"
+              + ''.join(f'{value * 100:>8.1f}%' for value in odds[slot, 1:]))
+
+
+def whatif(excel_filename=EXCEL_FILENAME, player=None, participants=PARTICIPANTS, samples=None, results_file=None,
+           excel=True, aliases=None):
+    """Prints everyone's chances of making the DE cut before the pending round (see whatif.py).
+
+    Once the DE stage has started it prints everyone's exact chances in the
+    bracket instead (see _print_de_odds).
+
+    Results already typed into the pending sheet (or in results_file, the
+    only source of the pending pairings without excel) count as decided. The
+    answers are cached next to the workbook until the standings or the
+    pending round change.
+    """
+    from standings import BYE_ID, Standings
+    from state import EngineState, state_filename
+    from storage import parse_sheet_name
+    from streams import read_rows
+    from whatif import DEFAULT_SAMPLES, explore, whatif_filename
+
+    state = EngineState.load(state_filename(excel_filename))
+    if not excel and (state is None or results_file is None):
+        raise SystemExit(f"Without the workbook both a results file and the saved state "
+                         f"'{state_filename(excel_filename)}' (see init) are needed.")
+    sheet_names = read_sheet_names(excel_filename) if excel else state.sheet_names
+    if state is None and len(sheet_names) == 1:
+        state = EngineState(Standings(participants), sheet_names=sheet_names)
+    elif state is None or not state.matches_workbook(sheet_names):
+        raise SystemExit(f"No saved state matches '{excel_filename}'; run `python dynamic.py apply-results` first.")
+    standings = state.standings
+    _add_aliases(standings.players, aliases)
+
+    kind, round_number = parse_sheet_name(state.pending_sheet)
+    applied = round_number in state.round_kinds
+
+    def pending_rows():
+        if results_file is not None:
+            return read_rows(results_file, RESULT_COLUMNS)
+        sheet_rows = read_sheet_rows(excel_filename, state.pending_sheet)
+        columns = [sheet_rows[0].index(column) for column in RESULT_COLUMNS]
+        return ([row[column] if column < len(row) else None for column in columns] for row in sheet_rows[1:])
+
+    if kind == 'DE':
+        return _print_de_odds(state, [] if applied else pending_rows(), player)
+
+    pairs, decided, decided_points = None, {}, {}
+    if applied:
+        # The pending round is applied already: the next one is paired the way next-round would
+        round_number += 1
+    else:
+        pairs = []
+        for participant, opponent, result, points_left in pending_rows():
+            if participant is None:
+                continue
+            is_bye = str(opponent).strip().lower() == 'bye'
+            if participant not in standings.ids or (not is_bye and opponent not in standings.ids):
+                raise SystemExit(f"Unknown player in '{state.pending_sheet}': {participant!r} vs {opponent!r}")
+            if not is_bye and str(result).strip().lower() in ('win', 'loss'):
+                decided[len(pairs)] = str(result).strip().lower() == 'win'
+                try:
+                    decided_points[len(pairs)] = max(int(float(points_left)), 0)
+                except (TypeError, ValueError):  # empty cell
+                    pass
+            pairs.append((standings.ids[participant], BYE_ID if is_bye else standings.ids[opponent]))
+
+    exploration = explore(standings, round_number, DE_THRESHOLD, pairs, decided, samples=samples or DEFAULT_SAMPLES,
+                          cache_file=whatif_filename(excel_filename), decided_points=decided_points)
+    how = 'exact' if exploration.exact else f'{exploration.samples} sampled tournaments'
+    print(f"Chances of a DE spot (top {exploration.top_n} after Swiss Round {DE_THRESHOLD}) before round "
+          f"{round_number}, {how}:")
+
+    def percent(value):
+        # None: that outcome can't happen (a bye, or the match is decided)
+        return '' if value is None else f'{value * 100:.1f}%'
+
+    print(f"{'#':>4}  {'Participant':<24}{'W-L':>6}{'now':>9}{'if win':>9}{'if loss':>9}  condition")
+    ranking = standings.ranking()
+    order = standings.ranking_order().tolist()
+    if player is not None:
+        if player not in standings.ids:
+            raise SystemExit(f"No player named {player!r}.")
+        order = [standings.ids[player]]
+    for player_id in order:
+        answer = exploration.query(standings.names[player_id])
+        record = f"{standings.wins[player_id]}-{standings.losses[player_id]}"
+        print(f"{ranking.rank_of(player_id):>4}  {answer['name']:<24}{record:>6}"
+              f"{percent(answer['probability']):>9}{percent(answer['if_win']):>9}{percent(answer['if_lose']):>9}"
+              f"  {answer['condition']}")
+
+
+@traced()
+def main(database=None, serve=False, host='127.0.0.1', port=8080, excel_filename=EXCEL_FILENAME, aliases=None):
+    participants = PARTICIPANTS
+
+    if serve:
+        # Long-running service: tables submit results over HTTP, pairings are published live
+        from server import serve as serve_tournament
+        serve_tournament(excel_filename, participants, host, port)
+        return
+
+    if database is not None:
+        # SQLite holds the tournament state, the workbook is only the report and result form
+        run_with_database(database, excel_filename, participants)
+        return
+
+    if not os.path.exists(excel_filename):
+        init(excel_filename, participants)
+        return
+
+    from results import ResultSheetError
+    try:
+        next_round(excel_filename, participants, aliases=aliases)
+    except ResultSheetError as error:
+        print(f"Fix the result sheet and run again.\n{error}")
+
+
+def run_command(args):
+    """Dispatches a parsed command line; heavy modules load only inside the chosen command."""
+    from registry import parse_aliases
+
+    try:
+        aliases = parse_aliases(args.alias)
+    except ValueError as error:
+        raise SystemExit(f"--alias: {error}")
+    if args.command == 'run':
+        main(database=args.database, excel_filename=args.file, aliases=aliases)
+    elif args.command == 'serve':
+        main(serve=True, host=args.host, port=args.port, excel_filename=args.file)
+    elif args.command == 'init':
+        if os.path.exists(args.file):
+            raise SystemExit(f"'{args.file}' already exists; remove it to start a new tournament.")
+        init(args.file, pairings_file=args.pairings, excel=not args.no_excel)
+    elif args.command == 'report':
+        report(args.file, args.top)
+    elif args.command == 'whatif':
+        whatif(args.file, args.player, samples=args.samples, results_file=args.results, excel=not args.no_excel,
+               aliases=aliases)
+    elif args.command == 'batch':
+        import batch
+
+        if args.events is None:
+            raise SystemExit("'batch' needs --events (a directory of workbooks or a JSON manifest).")
+        batch.main(args.events, args.workers or batch.DEFAULT_WORKERS, args.verbose)
+    else:
+        from results import ResultSheetError
+        try:
+            if args.command == 'apply-results':
+                apply_results(args.file, write_rankings=True, results_file=args.results, excel=not args.no_excel,
+                              aliases=aliases)
+            else:
+                next_round(args.file, results_file=args.results, pairings_file=args.pairings,
+                           standings_file=args.standings, excel=not args.no_excel, aliases=aliases)
+        except ResultSheetError as error:
+            print(f"Fix the result sheet and run again.\n{error}")
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the next round of a Swiss + DE tournament.")
+    parser.add_argument('command', nargs='?', default='run',
+                        choices=['run', 'init', 'apply-results', 'next-round', 'report', 'whatif', 'serve',
+                                 'batch'],
+                        help="'run' (default) starts a tournament or applies the latest results and pairs the "
+                             "next round; 'init' only writes round 1; 'apply-results' only updates the standings; "
+                             "'next-round' applies (if needed) and pairs; 'report' prints the latest standings; "
+                             "'whatif' shows who can still make the DE cut; 'serve' starts the live server; "
+                             "'batch' advances every event in --events by a round")
+    parser.add_argument('--file', default=EXCEL_FILENAME, help=f"tournament workbook (default: {EXCEL_FILENAME})")
+    parser.add_argument('--database', help="keep the tournament in this SQLite database ('run' only)")
+    parser.add_argument('--top', type=int, help="'report' only shows the first TOP rows")
+    parser.add_argument('--results', metavar='FILE',
+                        help="read the latest round's results from a .csv/.jsonl file ('-' = JSON Lines on stdin) "
+                             "instead of the workbook")
+    parser.add_argument('--pairings', metavar='FILE', help="also write the new pairings to a .csv/.jsonl file")
+    parser.add_argument('--standings', metavar='FILE', help="'next-round' also writes the standings to a .csv/.jsonl file")
+    parser.add_argument('--no-excel', action='store_true',
+                        help="keep the tournament in the saved state only; results and pairings go through "
+                             "--results/--pairings (the state file is named after --file)")
+    parser.add_argument('--alias', action='append', metavar='SPELLING=NAME',
+                        help="treat SPELLING in result sheets as the player NAME (repeatable; kept in the saved state)")
+    parser.add_argument('--player', help="'whatif' only answers for this player")
+    parser.add_argument('--samples', type=int, help="'whatif': sampled tournaments when more than one round is left")
+    parser.add_argument('--events', metavar='PATH',
+                        help="'batch': a directory of workbooks (and .txt player lists) or a JSON manifest")
+    parser.add_argument('--workers', type=int, help="'batch': events advanced at the same time (default: up to 4)")
+    parser.add_argument('--verbose', action='store_true', help="'batch': also print each event's output")
+    parser.add_argument('--host', default='127.0.0.1', help="address for 'serve' (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port for 'serve' (default: 8080)")
+    add_instrument_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(args, run_command, args)
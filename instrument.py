@@ -0,0 +1,188 @@
+"""Opt-in instrumentation for the round pipeline.
+
+Functions on the hot path are wrapped with @traced and inner steps with
+`with span(...)`; count() bumps named counters (rows parsed, sheets
+rewritten, bytes written). While no recorder is active, every call costs one
+global lookup, so the hooks can stay in place permanently.
+
+    from instrument import recording
+    with recording() as recorder:
+        dynamic.main()
+    print(recorder.summary())
+    recorder.write_chrome_trace('round.trace.json')   # open in chrome://tracing or Perfetto
+
+dynamic.py and simulate.py expose this as --trace, --summary, --profile and
+--tracemalloc.
+"""
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+_recorder = None
+_DISABLED = nullcontext()
+
+
+class Recorder:
+    """Collects spans (name, start, end, thread) and counters for one run."""
+
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self.started = time.perf_counter_ns()
+        self.memory_peak = None
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter_ns(), threading.get_ident()))
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def totals(self):
+        """{name: (calls, total_ns, max_ns)} over all recorded spans."""
+        totals = {}
+        for name, start, end, _ in self.spans:
+            calls, total, longest = totals.get(name, (0, 0, 0))
+            totals[name] = (calls + 1, total + end - start, max(longest, end - start))
+        return totals
+
+    def summary(self):
+        """A plain-text table of span timings (slowest first) followed by the counters."""
+        lines = [f"{'span':<44} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, (calls, total, longest) in sorted(self.totals().items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<44} {calls:>6} {total / 1e6:>10.2f} {total / calls / 1e6:>9.2f} "
+                         f"{longest / 1e6:>9.2f}")
+        if self.counters:
+            lines.append('')
+            lines.append(f"{'counter':<44} {'value':>10}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<44} {value:>10}")
+        if self.memory_peak is not None:
+            lines.append('')
+            lines.append(f"peak traced memory: {self.memory_peak / 1024:.1f} KiB")
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """The run in Chrome trace event format (complete events plus one counter event)."""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for name, start, end, thread in self.spans:
+            events.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid,
+                           'tid': threads.setdefault(thread, len(threads)),
+                           'ts': (start - self.started) / 1000, 'dur': (end - start) / 1000})
+        end = max((span[2] for span in self.spans), default=self.started)
+        if self.counters:
+            events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+                           'ts': (end - self.started) / 1000, 'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': dict(self.counters)}}
+
+    def write_chrome_trace(self, filename):
+        with open(filename, 'w', encoding='utf-8') as handle:
+            json.dump(self.chrome_trace(), handle)
+
+
+def span(name):
+    """Context manager timing a block; a shared no-op while recording is off."""
+    if _recorder is None:
+        return _DISABLED
+    return _recorder.span(name)
+
+
+def count(name, amount=1):
+    """Adds amount to a named counter while recording is on."""
+    if _recorder is not None:
+        _recorder.count(name, amount)
+
+
+def traced(name=None):
+    """Decorator recording every call of the function as a span (module.function by default)."""
+    def decorate(func):
+        module = func.__module__
+        if module == '__main__':
+            # Scripts run directly still get their file name, e.g. dynamic.main
+            module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+        label = name or f'{module}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _recorder.span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable():
+    """Starts recording into a new Recorder and returns it."""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable():
+    """Stops recording and returns the Recorder that was active (or None)."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+@contextmanager
+def recording(profile=None, trace_memory=False):
+    """Records spans and counters for the block.
+
+    profile is a filename for cProfile stats (read with pstats or snakeviz);
+    trace_memory runs tracemalloc and stores the peak on the recorder.
+    """
+    recorder = enable()
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield recorder
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if trace_memory:
+            recorder.memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        disable()
+
+
+def add_arguments(parser):
+    """Adds the shared --trace/--summary/--profile/--tracemalloc flags to an argparse parser."""
+    parser.add_argument('--trace', metavar='FILE', help="write a Chrome trace (JSON) of the run")
+    parser.add_argument('--summary', action='store_true', help="print span timings and counters after the run")
+    parser.add_argument('--profile', metavar='FILE', help="write cProfile stats of the run")
+    parser.add_argument('--tracemalloc', action='store_true', help="report peak traced memory (implies --summary)")
+
+
+def run_instrumented(args, func, *func_args, **func_kwargs):
+    """Runs func with recording turned on if any of the add_arguments flags were given."""
+    if not (args.trace or args.summary or args.profile or args.tracemalloc):
+        return func(*func_args, **func_kwargs)
+    with recording(args.profile, args.tracemalloc) as recorder:
+        result = func(*func_args, **func_kwargs)
+    if args.summary or args.tracemalloc:
+        print()
+        print(recorder.summary())
+    if args.trace:
+        recorder.write_chrome_trace(args.trace)
+        print(f"Trace written to '{args.trace}'.")
+    if args.profile:
+        print(f"Profile written to '{args.profile}'.")
+    return result
@@ -0,0 +1,230 @@
+"""Vectorized Monte Carlo engine for full Swiss + DE tournaments.
+
+Instead of playing one tournament at a time, standings for a whole batch of
+tournaments are kept as NumPy arrays of shape (tournaments, players), so each
+round is a few array operations no matter how many tournaments are in flight.
+
+Swiss rounds are paired the way pairing.pair_round pairs a round without
+rematches to avoid: Dutch-style within score groups (top half against
+bottom half), an odd player floating down into the next group, and the bye
+for the lowest ranked player with the fewest byes. Rematches are allowed,
+though: pair_standings repairs them, which has no cheap array form, so the
+odds here approximate the tournament simulate.py plays rather than replay
+it. Win counts per player, qualification (top_n by wins) and the DE bracket
+are the same.
+
+Matches are coin flips unless a win-probability matrix from outcomes.py is
+passed as win_prob, in which case win_prob[i, j] is P(i beats j).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from instrument import count, traced
+
+
+DEFAULT_BATCH_SIZE = 100_000
+
+
+def _swiss_order(wins):
+    """Ranks every tournament's players: most wins first, ties keep entry order."""
+    # Every player plays once per round (byes count as wins) so sorting by wins
+    # alone gives the same order as the (-wins, losses) key used in simulate.py.
+    # The keys are unique within a row, so the faster unstable sort keeps entry order.
+    num_players = wins.shape[1]
+    return np.argsort(np.arange(num_players, dtype=np.int32) - wins.astype(np.int32) * num_players, axis=1)
+
+
+def _take(values, index):
+    """values[t, index[t, k]] for every tournament t; a flat take beats 2-D fancy indexing."""
+    offsets = (np.arange(values.shape[0]) * values.shape[1])[:, None]
+    return values.ravel().take(index + offsets)
+
+
+def _pair_round(wins, byes):
+    """Pairs one round in every tournament; returns (p1, p2, bye), bye is None for an even field.
+
+    Same pairs as pairing.pair_round when no rematch has to be avoided.
+    """
+    n_tournaments, num_players = wins.shape
+    rows = np.arange(n_tournaments)
+    order = _swiss_order(wins)
+    bye = None
+    if num_players % 2:
+        # The lowest ranked of the players with the fewest byes (pairing.choose_bye)
+        ranked_byes = _take(byes, order)
+        fewest = ranked_byes == ranked_byes.min(axis=1, keepdims=True)
+        position = num_players - 1 - np.argmax(fewest[:, ::-1], axis=1)
+        bye = order[rows, position]
+        keep = np.ones(order.shape, dtype=bool)
+        keep[rows, position] = False
+        order = order[keep].reshape(n_tournaments, num_players - 1)
+
+    # A score group with an odd count floats its last player into the next one, so every
+    # pairing group is a run of slots, each slot being ranking positions 2j and 2j+1
+    slots = order.shape[1] // 2
+    scores = _take(wins, order)
+    new_group = scores[:, 1:] != scores[:, :-1]
+    first = np.ones((n_tournaments, slots), dtype=bool)
+    first[:, 1:] = new_group[:, 1::2] | new_group[:, 2::2]
+    slot = np.arange(slots)
+    start = np.maximum.accumulate(np.where(first, slot, 0), axis=1)
+    end = np.full((n_tournaments, slots), slots)
+    end[:, :-1] = np.minimum.accumulate(np.where(first, slot, slots)[:, :0:-1], axis=1)[:, ::-1]
+    # Dutch pairing inside each group: its top half against its bottom half
+    p1 = slot + start
+    p2 = p1 + end - start
+    return _take(order, p1), _take(order, p2), bye
+
+
+def _p1_wins(rng, p1, p2, win_prob):
+    if win_prob is None:
+        return rng.random(p1.shape) < 0.5
+    return rng.random(p1.shape) < win_prob[p1, p2]
+
+
+@traced()
+def simulate_batch(num_players, n_tournaments, rounds=4, top_n=16, rng=None, win_prob=None):
+    """Simulates n_tournaments independent tournaments and returns their raw outcome arrays.
+
+    Returns (final_order, champions) where final_order[t] is the Swiss ranking
+    of tournament t (player indices, best first) and champions[t] the DE winner.
+    """
+    rng = np.random.default_rng(rng)
+    rows = np.arange(n_tournaments)[:, None]
+    wins = np.zeros((n_tournaments, num_players), dtype=np.int16)
+    byes = np.zeros((n_tournaments, num_players), dtype=np.int16)
+
+    for _ in range(rounds):
+        p1, p2, bye = _pair_round(wins, byes)
+        winners = np.where(_p1_wins(rng, p1, p2, win_prob), p1, p2)
+        # Each player appears at most once per row, so plain fancy indexing is safe
+        wins[rows, winners] += 1
+        if bye is not None:
+            wins[rows[:, 0], bye] += 1
+            byes[rows[:, 0], bye] += 1
+
+    final_order = _swiss_order(wins)
+
+    # DE stage: adjacent qualifiers meet, exactly like simulate_de
+    current = final_order[:, :min(top_n, num_players)]
+    while current.shape[1] > 1:
+        pairs = current.shape[1] // 2
+        p1 = current[:, 0:2 * pairs:2]
+        p2 = current[:, 1:2 * pairs:2]
+        current = np.where(_p1_wins(rng, p1, p2, win_prob), p1, p2)
+    champions = current[:, 0]
+
+    return final_order, champions
+
+
+def empty_totals(num_players):
+    """Returns zeroed aggregate counters for num_players players."""
+    return {
+        'tournaments': 0,
+        'qualified': np.zeros(num_players, dtype=np.int64),
+        'champion': np.zeros(num_players, dtype=np.int64),
+        'finish': np.zeros((num_players, num_players), dtype=np.int64),
+    }
+
+
+def accumulate(totals, final_order, champions, top_n=16):
+    """Adds one batch of outcomes to the aggregate counters in place."""
+    num_players = final_order.shape[1]
+    totals['tournaments'] += final_order.shape[0]
+    totals['qualified'] += np.bincount(final_order[:, :top_n].ravel(), minlength=num_players)
+    totals['champion'] += np.bincount(champions, minlength=num_players)
+    for position in range(num_players):
+        totals['finish'][:, position] += np.bincount(final_order[:, position], minlength=num_players)
+    return totals
+
+
+@traced()
+def simulate_tournaments(num_players, n_tournaments, rounds=4, top_n=16, seed=None,
+                         batch_size=DEFAULT_BATCH_SIZE, win_prob=None):
+    """Simulates n_tournaments tournaments in batches and returns aggregate counts.
+
+    Only the counters from empty_totals are kept between batches, so memory
+    stays bounded by batch_size regardless of n_tournaments.
+    """
+    rng = np.random.default_rng(seed)
+    totals = empty_totals(num_players)
+    remaining = n_tournaments
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        final_order, champions = simulate_batch(num_players, size, rounds, top_n, rng, win_prob)
+        accumulate(totals, final_order, champions, top_n)
+        count('montecarlo.tournaments', size)
+        remaining -= size
+    return totals
+
+
+def merge_totals(totals, partial):
+    """Adds the counters of partial into totals in place."""
+    totals['tournaments'] += partial['tournaments']
+    for key in ('qualified', 'champion', 'finish'):
+        totals[key] += partial[key]
+    return totals
+
+
+def _simulate_chunk(num_players, n_tournaments, rounds, top_n, seed_sequence, batch_size, win_prob):
+    # Runs in a worker process: one chunk with its own RNG stream, only counters go back
+    return simulate_tournaments(num_players, n_tournaments, rounds, top_n, np.random.default_rng(seed_sequence),
+                                batch_size, win_prob)
+
+
+@traced()
+def simulate_tournaments_parallel(num_players, n_tournaments, rounds=4, top_n=16, seed=None, workers=None,
+                                  batch_size=DEFAULT_BATCH_SIZE, win_prob=None):
+    """Spreads n_tournaments over a process pool and returns aggregate counts.
+
+    The runs are cut into fixed chunks of batch_size tournaments and chunk i
+    always gets the i-th child of SeedSequence(seed), whichever worker runs
+    it. Counters are summed as chunks finish, so the result is identical for
+    any number of workers and the parent never holds per-run results. The
+    numbers for a seed do depend on batch_size, and they differ from
+    simulate_tournaments(seed=...), which draws everything from one stream.
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = [min(batch_size, n_tournaments - start) for start in range(0, n_tournaments, batch_size)]
+    children = seed_sequence.spawn(len(sizes))
+    totals = empty_totals(num_players)
+
+    if workers == 1:
+        for size, child in zip(sizes, children):
+            merge_totals(totals, _simulate_chunk(num_players, size, rounds, top_n, child, batch_size, win_prob))
+        return totals
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_simulate_chunk, num_players, size, rounds, top_n, child, batch_size, win_prob)
+                   for size, child in zip(sizes, children)]
+        # Integer counters add up the same in any order, so merge whatever finishes first
+        for future in as_completed(pending):
+            chunk_totals = future.result()
+            merge_totals(totals, chunk_totals)
+            count('montecarlo.tournaments', chunk_totals['tournaments'])
+    return totals
+
+
+def summarize(participants, totals):
+    """Turns aggregate counts into per-player probabilities (a pandas DataFrame)."""
+    import pandas as pd
+
+    n = max(totals['tournaments'], 1)
+    finish = totals['finish'] / n
+    summary = pd.DataFrame({
+        'Participant': participants,
+        'P(Qualify for DE)': totals['qualified'] / n,
+        'P(Win Title)': totals['champion'] / n,
+        'Expected Finish': finish @ np.arange(1, len(participants) + 1),
+    })
+    return summary.sort_values('P(Qualify for DE)', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def finish_distribution(participants, totals):
+    """Returns P(player finishes the Swiss stage in each position) as a DataFrame."""
+    import pandas as pd
+
+    n = max(totals['tournaments'], 1)
+    columns = [f'#{position}' for position in range(1, len(participants) + 1)]
+    return pd.DataFrame(totals['finish'] / n, index=participants, columns=columns)
@@ -0,0 +1,138 @@
+"""Skill-based match outcome models.
+
+Every model turns per-player ratings into a dense player x player matrix
+where matrix[i, j] is the probability that player i beats player j. The
+matrix is built once (and again only after a rating update), so deciding a
+match is a table lookup and deciding a whole round is one vectorized draw.
+Player indices follow the order of the participants list, which is also the
+Standings ID order.
+"""
+import abc
+import math
+
+import numpy as np
+
+from registry import name_key
+
+
+class OutcomeModel(abc.ABC):
+    """Base class: subclasses fill in _compute_matrix."""
+
+    def __init__(self, participants):
+        self.participants = list(participants)
+        self.index = {name: i for i, name in enumerate(self.participants)}
+        self._keys = None
+        self._matrix = None
+
+    @abc.abstractmethod
+    def _compute_matrix(self):
+        """The player x player win-probability matrix (the diagonal is overwritten with 0.5)."""
+
+    @property
+    def matrix(self):
+        """The cached win-probability matrix."""
+        if self._matrix is None:
+            matrix = np.asarray(self._compute_matrix(), dtype=float)
+            np.fill_diagonal(matrix, 0.5)
+            self._matrix = matrix
+        return self._matrix
+
+    def invalidate(self):
+        """Call after changing ratings so the matrix is rebuilt on next use."""
+        self._matrix = None
+
+    def slots(self, names):
+        """Model indices of names, e.g. Standings.names (matched like registry.py matches names).
+
+        Raises ValueError for a name the model has no rating for.
+        """
+        if self._keys is None:
+            self._keys = {name_key(name): i for name, i in self.index.items()}
+        order = [self.index.get(name, self._keys.get(name_key(name))) for name in names]
+        if None in order:
+            raise ValueError(f"the outcome model has no rating for {names[order.index(None)]!r}")
+        return np.array(order, dtype=np.int64)
+
+    def matrix_for(self, names):
+        """The matrix with rows and columns in the order of names; raises ValueError for a name the model lacks."""
+        order = self.slots(names)
+        return self.matrix[np.ix_(order, order)]
+
+    def probability(self, player, opponent):
+        """P(player beats opponent), by name."""
+        return self.matrix[self.index[player], self.index[opponent]]
+
+    def sample(self, p1, p2, rng=None):
+        """Decides a whole round at once: True where p1[k] beats p2[k] (index arrays)."""
+        rng = np.random.default_rng(rng)
+        p1 = np.asarray(p1)
+        return rng.random(p1.shape) < self.matrix[p1, np.asarray(p2)]
+
+
+class CoinFlipModel(OutcomeModel):
+    """Every match is 50/50, the behaviour of the original simulations."""
+
+    def _compute_matrix(self):
+        n = len(self.participants)
+        return np.full((n, n), 0.5)
+
+
+class EloModel(OutcomeModel):
+    """Elo: P(i beats j) = 1 / (1 + 10 ** ((r_j - r_i) / scale))."""
+
+    def __init__(self, participants, ratings, scale=400, k_factor=32):
+        super().__init__(participants)
+        self.ratings = np.array([ratings[name] for name in self.participants], dtype=float)
+        self.scale = scale
+        self.k_factor = k_factor
+
+    def _compute_matrix(self):
+        difference = self.ratings[None, :] - self.ratings[:, None]
+        return 1.0 / (1.0 + 10.0 ** (difference / self.scale))
+
+    def update(self, winner, loser):
+        """Standard Elo update after winner beat loser (by name)."""
+        i, j = self.index[winner], self.index[loser]
+        expected = 1.0 / (1.0 + 10.0 ** ((self.ratings[j] - self.ratings[i]) / self.scale))
+        change = self.k_factor * (1.0 - expected)
+        self.ratings[i] += change
+        self.ratings[j] -= change
+        self.invalidate()
+
+
+class BradleyTerryModel(OutcomeModel):
+    """Bradley-Terry: P(i beats j) = s_i / (s_i + s_j) for positive strengths s."""
+
+    def __init__(self, participants, strengths):
+        super().__init__(participants)
+        self.strengths = np.array([strengths[name] for name in self.participants], dtype=float)
+        if (self.strengths <= 0).any():
+            raise ValueError("Bradley-Terry strengths must be positive")
+
+    def _compute_matrix(self):
+        return self.strengths[:, None] / (self.strengths[:, None] + self.strengths[None, :])
+
+
+class GlickoModel(OutcomeModel):
+    """Glicko-style ratings with uncertainty.
+
+    Each player has a rating and a rating deviation (RD). The rating gap is
+    shrunk by g(sqrt(RD_i^2 + RD_j^2)), so uncertain ratings give probabilities
+    closer to 50/50 than Elo would.
+    """
+
+    Q = math.log(10) / 400
+
+    def __init__(self, participants, ratings, deviations):
+        super().__init__(participants)
+        self.ratings = np.array([ratings[name] for name in self.participants], dtype=float)
+        self.deviations = np.array([deviations[name] for name in self.participants], dtype=float)
+
+    @classmethod
+    def g(cls, deviation):
+        return 1.0 / np.sqrt(1.0 + 3.0 * cls.Q ** 2 * deviation ** 2 / math.pi ** 2)
+
+    def _compute_matrix(self):
+        combined = np.sqrt(self.deviations[:, None] ** 2 + self.deviations[None, :] ** 2)
+        difference = self.ratings[:, None] - self.ratings[None, :]
+        return 1.0 / (1.0 + 10.0 ** (-self.g(combined) * difference / 400))
@@ -0,0 +1,201 @@
+"""Swiss pairing engine with rematch avoidance and bye balancing.
+
+Players come in score groups, best first (see RankingIndex.score_groups).
+Pairing is Dutch-style: each group is split into a top and a bottom half and
+the halves are paired against each other (1 v g/2+1, 2 v g/2+2, ...). An odd
+player out floats down into the next group.
+
+Each group goes through at most four steps, cheapest first:
+
+1. Fast path: the straight Dutch pairing has no rematch (the common case,
+   and always true in round one). O(g) for a group of g players.
+2. Repair: every pair that would be a rematch swaps its bottom-half player
+   with the nearest other pair for which both new pairs are fresh.
+   O(c * g) for c rematches in the group.
+3. Bounded search: groups of up to MAX_SEARCH_GROUP players that repair
+   could not fix get a depth-first search in Dutch preference order, capped
+   at MAX_BACKTRACK steps.
+4. Fallback: whoever is still unpaired is paired greedily and the players
+   with no fresh opponent left float down.
+
+If players are still unpaired after the last group, the two lowest groups are
+merged and the round is paired again, up to k times for k groups. Only when
+the whole field is one group and still has leftovers is a rematch accepted.
+
+A round costs O(n) on the fast path and O(n + sum(c * g) + groups *
+MAX_BACKTRACK) otherwise; the greedy fallback adds O(g^2) only for groups
+where everything else failed, and each bottom merge repeats that work once.
+"""
+from instrument import traced
+
+
+BYE = 'Bye'
+
+MAX_SEARCH_GROUP = 24
+MAX_BACKTRACK = 5000
+
+
+def choose_bye(ranked_players, byes_received):
+    """Picks the lowest ranked player who has had the fewest byes."""
+    fewest = min(byes_received.get(player, 0) for player in ranked_players)
+    for player in reversed(ranked_players):
+        if byes_received.get(player, 0) == fewest:
+            return player
+
+
+def _dutch_pairs(group):
+    half = len(group) // 2
+    return [(group[i], group[half + i]) for i in range(half)]
+
+
+def _fresh(played, player, opponent):
+    return opponent not in played.get(player, ())
+
+
+def _repair(pairs, played):
+    """Swaps bottom-half players between pairs to remove rematches in place.
+
+    Returns True if every pair ends up fresh.
+    """
+    for index in range(len(pairs)):
+        top, bottom = pairs[index]
+        if _fresh(played, top, bottom):
+            continue
+        # Look at the closest pairs first so the pairing stays as Dutch as possible
+        for distance in range(1, len(pairs)):
+            swapped = False
+            for other in (index + distance, index - distance):
+                if not 0 <= other < len(pairs):
+                    continue
+                other_top, other_bottom = pairs[other]
+                if _fresh(played, top, other_bottom) and _fresh(played, other_top, bottom):
+                    pairs[index] = (top, other_bottom)
+                    pairs[other] = (other_top, bottom)
+                    swapped = True
+                    break
+            if swapped:
+                break
+        else:
+            return False
+    return True
+
+
+def _search(group, played):
+    """Bounded depth-first search for a rematch-free pairing of a small, even group."""
+    half = len(group) // 2
+    budget = [MAX_BACKTRACK]
+
+    def preference(index):
+        # The Dutch opponent first, then working outwards from it
+        target = index + half if index < half else index - half
+        for distance in range(len(group)):
+            for candidate in (target + distance, target - distance) if distance else (target,):
+                if 0 <= candidate < len(group) and candidate != index:
+                    yield candidate
+
+    def backtrack(unpaired, pairs):
+        if not unpaired:
+            return pairs
+        first, rest = unpaired[0], unpaired[1:]
+        for candidate in preference(first):
+            if candidate not in rest or not _fresh(played, group[first], group[candidate]):
+                continue
+            budget[0] -= 1
+            if budget[0] < 0:
+                return None
+            remaining = [index for index in rest if index != candidate]
+            found = backtrack(remaining, pairs + [(group[first], group[candidate])])
+            if found is not None:
+                return found
+        return None
+
+    return backtrack(list(range(len(group))), [])
+
+
+def _greedy(group, played):
+    """Pairs each player with the first fresh opponent; returns (pairs, leftovers)."""
+    pairs = []
+    unpaired = list(group)
+    leftovers = []
+    while unpaired:
+        player = unpaired.pop(0)
+        for position, opponent in enumerate(unpaired):
+            if _fresh(played, player, opponent):
+                pairs.append((player, unpaired.pop(position)))
+                break
+        else:
+            leftovers.append(player)
+    return pairs, leftovers
+
+
+def _pair_group(group, played):
+    """Pairs an even-sized group; returns (pairs, players that must float down)."""
+    pairs = _dutch_pairs(group)
+    if all(_fresh(played, player, opponent) for player, opponent in pairs):
+        return pairs, []
+    if _repair(pairs, played):
+        return pairs, []
+    if len(group) <= MAX_SEARCH_GROUP:
+        found = _search(group, played)
+        if found is not None:
+            return found, []
+    return _greedy(group, played)
+
+
+@traced()
+def pair_standings(standings):
+    """Pairs the next round for a Standings store; returns (p1, p2) ID tuples with BYE_ID for the bye."""
+    from standings import BYE_ID
+
+    score_groups = [group for _, _, group in standings.ranking().score_groups()]
+    byes = standings.bye_counts()
+    pairs = pair_round(score_groups, standings.opponent_sets(),
+                       {player_id: int(count) for player_id, count in enumerate(byes) if count})
+    return [(player, BYE_ID if opponent == BYE else opponent) for player, opponent in pairs]
+
+
+@traced()
+def pair_round(score_groups, played=None, byes_received=None):
+    """Pairs one Swiss round.
+
+    score_groups is a list of player lists, best group first, each in ranking
+    order. played maps a player to the set of opponents already faced and
+    byes_received maps a player to their bye count. Returns a list of
+    (player, opponent) tuples with opponent BYE for the bye, if any.
+    """
+    played = played or {}
+    byes_received = byes_received or {}
+    groups = [list(group) for group in score_groups if group]
+    ranked = [player for group in groups for player in group]
+
+    bye_pairs = []
+    if len(ranked) % 2:
+        bye_player = choose_bye(ranked, byes_received)
+        groups = [[player for player in group if player != bye_player] for group in groups]
+        bye_pairs = [(bye_player, BYE)]
+
+    while True:
+        pairs, leftovers = _pair_groups(groups, played)
+        if not leftovers or len(groups) == 1:
+            break
+        # The bottom could not be paired cleanly: merge the two lowest groups and retry
+        groups = groups[:-2] + [groups[-2] + groups[-1]]
+
+    # Anything still left has played everyone available: rematches are forced
+    pairs.extend(_dutch_pairs(leftovers))
+    return pairs + bye_pairs
+
+
+def _pair_groups(groups, played):
+    """Pairs groups top to bottom, floating players down; returns (pairs, unpaired)."""
+    pairs = []
+    floaters = []
+    for group in groups:
+        group = floaters + group
+        floaters = []
+        if len(group) % 2:
+            floaters = [group.pop()]  # Lowest ranked player floats down
+        group_pairs, leftovers = _pair_group(group, played)
+        pairs.extend(group_pairs)
+        floaters = leftovers + floaters
+    return pairs, floaters
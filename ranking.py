@@ -0,0 +1,85 @@
+"""Incremental ranking index over a Standings store.
+
+Players are kept in score-group buckets keyed by (wins, losses). Inside a
+bucket they are ordered by points left, then by ID. After a round only the
+players whose totals changed are moved between buckets, so nothing is
+re-sorted from scratch. Ranking order is the same as Standings.ranking_order:
+most wins, then fewest losses, then fewest points left, ties by entry order.
+"""
+from bisect import bisect_left, insort
+
+
+class RankingIndex:
+    """Score-group buckets that are updated in place as results come in."""
+
+    def __init__(self, standings):
+        self.standings = standings
+        self._groups = {}     # (-wins, losses) -> sorted [(points_left, player_id)]
+        self._keys = []       # sorted group keys, best group first
+        self._entries = {}    # player_id -> ((-wins, losses), (points_left, player_id))
+        self.update(range(len(standings)))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entry(self, player_id):
+        standings = self.standings
+        return ((-int(standings.wins[player_id]), int(standings.losses[player_id])),
+                (int(standings.points_left[player_id]), player_id))
+
+    def _remove(self, player_id):
+        key, item = self._entries.pop(player_id)
+        group = self._groups[key]
+        del group[bisect_left(group, item)]
+        if not group:
+            del self._groups[key]
+            del self._keys[bisect_left(self._keys, key)]
+
+    def _insert(self, player_id):
+        key, item = self._entries[player_id] = self._entry(player_id)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = []
+            insort(self._keys, key)
+        insort(group, item)
+
+    def update(self, player_ids):
+        """Re-files the given players after their totals changed."""
+        for player_id in player_ids:
+            player_id = int(player_id)
+            if player_id in self._entries:
+                if self._entries[player_id] == self._entry(player_id):
+                    continue
+                self._remove(player_id)
+            self._insert(player_id)
+
+    def __iter__(self):
+        """Player IDs in ranking order."""
+        for key in self._keys:
+            for _, player_id in self._groups[key]:
+                yield player_id
+
+    def top_n(self, n):
+        """The best n player IDs, without walking the rest of the field."""
+        top = []
+        for key in self._keys:
+            for _, player_id in self._groups[key]:
+                if len(top) == n:
+                    return top
+                top.append(player_id)
+        return top
+
+    def rank_of(self, player_id):
+        """1-based rank of player_id."""
+        key, item = self._entries[player_id]
+        ahead = 0
+        for other in self._keys:
+            if other == key:
+                break
+            ahead += len(self._groups[other])
+        return ahead + bisect_left(self._groups[key], item) + 1
+
+    def score_groups(self):
+        """Yields (wins, losses, [player IDs]) for each score group, best first."""
+        for key in self._keys:
+            yield -key[0], key[1], [player_id for _, player_id in self._groups[key]]
@@ -0,0 +1,149 @@
+"""Player registry: dense integer IDs for player names.
+
+Every player gets an ID when first registered (0, 1, 2, ... in order) and
+keeps it for the whole tournament; the standings columns, the match history,
+pairing and the DE bracket all work on these IDs. Names only matter where
+they are read from or written to a workbook, a stream or the server.
+
+Names are matched by their normalized form: Unicode NFKC, surrounding and
+repeated whitespace removed, case folded. So 'Нати З.', ' нати  з. ' and
+'НАТИ З.' in a result cell are the same player, and a stray space no longer
+makes a new one. The display name stays the first spelling registered
+(with its whitespace cleaned up). Aliases map other spellings, e.g. a
+nickname, to a registered player.
+
+Standard library only, so the fast startup paths of dynamic.py can use it.
+"""
+import sys
+import unicodedata
+
+
+# ID returned by lookup() for unknown names and empty cells
+UNKNOWN = -1
+
+# The opponent cell of a bye; never a player name
+RESERVED = {'bye'}
+
+
+def clean_name(name):
+    """The display form of a name: NFKC, single spaces, no surrounding whitespace."""
+    name = str(name)
+    if not name.isascii():  # ASCII is already NFKC
+        name = unicodedata.normalize('NFKC', name)
+    return ' '.join(name.split())
+
+
+def name_key(name):
+    """The form names are matched by: clean_name() case folded."""
+    return clean_name(name).casefold()
+
+
+class PlayerRegistry:
+    """Dense, stable player IDs with normalized name matching and aliases."""
+
+    def __init__(self, names=(), aliases=None):
+        self.names = []
+        self._keys = {}  # name_key -> ID
+        self._exact = {}  # every spelling seen so far -> ID, to skip normalizing
+        self.aliases = {}  # cleaned alias -> display name of the player
+        for name in names:
+            self.add(name)
+        for alias, name in (aliases or {}).items():
+            self.alias(alias, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        player_id = self.get(name)
+        if player_id is None:
+            raise KeyError(name)
+        return player_id
+
+    def get(self, name, default=None):
+        """The ID of name (any spelling or alias), or default."""
+        player_id = self._exact.get(name)
+        if player_id is not None:
+            return player_id
+        if name is None or name != name:  # empty cell (None, or NaN from pandas)
+            return default
+        player_id = self._keys.get(name_key(name))
+        if player_id is None:
+            return default
+        if isinstance(name, str):
+            self._exact[name] = player_id
+        return player_id
+
+    def add(self, name):
+        """Registers a player and returns their ID (an existing player keeps theirs).
+
+        Raises ValueError for an empty name or one reserved for byes.
+        """
+        player_id = self._exact.get(name)
+        if player_id is not None:
+            return player_id
+        if name is None or name != name:
+            raise ValueError("an empty cell can't be a player name")
+        display = clean_name(name)
+        key = display.casefold()
+        player_id = self._keys.get(key)
+        if player_id is not None:
+            self._exact[name] = player_id
+            return player_id
+        if not key or key in RESERVED:
+            raise ValueError(f"{name!r} can't be a player name")
+        player_id = len(self.names)
+        # Interned, so every structure holding a name shares the one string
+        display = sys.intern(display)
+        self.names.append(display)
+        self._keys[key] = player_id
+        self._exact[display] = player_id
+        return player_id
+
+    def alias(self, alias, name):
+        """Makes alias another spelling of the registered player name.
+
+        Raises ValueError if name is not registered or alias already means
+        someone else.
+        """
+        player_id = self.get(name)
+        if player_id is None:
+            raise ValueError(f"{name!r} is not a registered player")
+        key = name_key(alias)
+        if self._keys.get(key, player_id) != player_id:
+            raise ValueError(f"{alias!r} is already {self.names[self._keys[key]]!r}")
+        if not key or key in RESERVED:
+            raise ValueError(f"{alias!r} can't be an alias")
+        self._keys[key] = player_id
+        if key != name_key(self.names[player_id]):
+            self.aliases[clean_name(alias)] = self.names[player_id]
+
+    def add_aliases(self, aliases):
+        """alias() for every spelling -> name pair of a mapping."""
+        for alias, name in aliases.items():
+            self.alias(alias, name)
+
+    def lookup(self, names):
+        """IDs for a sequence of names (UNKNOWN for unknown names and empty cells)."""
+        get = self.get
+        return [get(name, UNKNOWN) for name in names]
+
+    def name(self, player_id):
+        return self.names[player_id]
+
+
+def parse_aliases(values):
+    """{'spelling': 'name'} from 'SPELLING=NAME' strings; raises ValueError for anything else."""
+    aliases = {}
+    for value in values or ():
+        alias, separator, name = value.partition('=')
+        if not separator or not alias.strip() or not name.strip():
+            raise ValueError(f"expected SPELLING=NAME, got {value!r}")
+        aliases[alias] = name
+    return aliases
@@ -0,0 +1,110 @@
+"""Columnar application of result sheets to a Standings store.
+
+A result sheet (or several pods' sheets concatenated) is handled as four
+columns: Participant, Opponent, Result and Points Left. Names are mapped to
+player IDs in one go through the player registry (so case and stray spaces
+don't matter), every row is validated up front, and the totals are
+updated with a single batched Standings.record_matches call.
+"""
+import numpy as np
+import pandas as pd
+
+from instrument import count, traced
+from registry import PlayerRegistry
+from standings import BYE, BYE_ID, LOSS, WIN
+
+
+class ResultSheetError(ValueError):
+    """Raised when result rows are malformed; .errors lists every bad row."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} bad result row(s):\n" + "\n".join(errors))
+
+
+def _text(values):
+    """Lower-cased, stripped strings; empty cells become ''."""
+    return pd.Series(values, dtype=object).fillna('').astype(str).str.strip().str.lower().to_numpy()
+
+
+@traced()
+def parse_round_results(players, participants, opponents, results, points_left, first_row=2):
+    """Validates result columns and turns them into ID arrays.
+
+    players is the registry.PlayerRegistry of known players (a list of names,
+    index = player ID, works too). first_row is the
+    sheet row number of the first value, used in error messages. Returns
+    (p1, p2, result, points) arrays ready for Standings.record_matches, or
+    raises ResultSheetError listing every bad row at once.
+    """
+    participants = pd.Series(participants, dtype=object)
+    opponents = pd.Series(opponents, dtype=object)
+    raw_points = pd.Series(points_left, dtype=object)
+    points = pd.to_numeric(raw_points, errors='coerce').to_numpy(dtype=float)
+    opponent_text = _text(opponents)
+    result_text = _text(results)
+    points_text = _text(raw_points)
+
+    # Fully empty rows (e.g. trailing rows next to a rankings block) are not results
+    empty = participants.isna().to_numpy() & (opponent_text == '') & (result_text == '')
+    keep = ~empty
+    rows = np.arange(len(participants))[keep] + first_row
+    participants = participants[keep]
+    opponents = opponents[keep]
+    opponent_text = opponent_text[keep]
+    result_text = result_text[keep]
+    raw_points = raw_points[keep]
+    points_text = points_text[keep]
+    points = points[keep]
+
+    if not isinstance(players, PlayerRegistry):
+        players = PlayerRegistry(players)
+    p1 = np.array(players.lookup(participants.tolist()), dtype=np.int64)
+    is_bye = opponent_text == 'bye'
+    p2 = np.where(is_bye, BYE_ID, np.array(players.lookup(opponents.tolist()), dtype=np.int64))
+    is_win = result_text == 'win'
+    is_loss = result_text == 'loss'
+    bad_points = ((points_text != '') & np.isnan(points)) | (points < 0)
+
+    # Every player may appear only once per round
+    seen = np.concatenate([p1, p2[~is_bye]])
+    counts = np.bincount(seen[seen >= 0], minlength=len(players))
+    repeated = (p1 >= 0) & (counts[np.maximum(p1, 0)] > 1)
+    repeated |= ~is_bye & (p2 >= 0) & (counts[np.maximum(p2, 0)] > 1)
+
+    problems = [
+        (p1 < 0, lambda i: f"unknown participant {participants.iloc[i]!r}"),
+        (~is_bye & (p2 < 0), lambda i: f"unknown opponent {opponents.iloc[i]!r}"),
+        (~is_bye & ~is_win & ~is_loss, lambda i: f"result must be Win or Loss, got {result_text[i]!r}"),
+        (bad_points, lambda i: f"points left must be a non-negative number, got {raw_points.iloc[i]!r}"),
+        (repeated, lambda i: "player listed more than once this round"),
+    ]
+    errors = []
+    for mask, message in problems:
+        for i in np.flatnonzero(mask):
+            errors.append((rows[i], f"row {rows[i]}: {message(i)}"))
+    if errors:
+        raise ResultSheetError([message for _, message in sorted(errors)])
+
+    result = np.where(is_bye, BYE, np.where(is_win, WIN, LOSS))
+    points = np.where(is_bye | np.isnan(points), 0, points).astype(np.int32)
+    count('results.rows_parsed', len(p1))
+    return p1, p2, result, points
+
+
+def apply_round_results(standings, round_number, participants, opponents, results, points_left, first_row=2):
+    """Validates and applies one round of results to standings in a single batch."""
+    p1, p2, result, points = parse_round_results(standings.players, participants, opponents, results,
+                                                 points_left, first_row)
+    standings.record_matches(round_number, p1, p2, result, points)
+    standings.end_round(round_number)
+    return len(p1)
+
+
+def round_winners(participants, opponents, results):
+    """Winners of a DE round, in sheet order ('Win' keeps the participant, 'Loss' the opponent)."""
+    participants = np.asarray(participants, dtype=object)
+    opponents = np.asarray(opponents, dtype=object)
+    result_text = _text(results)
+    winners = np.where(result_text == 'win', participants, opponents)
+    return winners[(result_text == 'win') | (result_text == 'loss')].tolist()
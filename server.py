@@ -0,0 +1,335 @@
+"""Live tournament server: `python dynamic.py serve`.
+
+Keeps the standings and the pairing engine in memory and lets tables report
+results concurrently over a small local HTTP/JSON API instead of the TO
+typing them into the workbook and rerunning dynamic.py:
+
+    GET  /pairings   current round: {"round", "kind", "tables": [...]}
+    GET  /standings  current rankings: [{"rank", "name", "wins", "losses", "points_left", "buchholz", "omw"}]
+    GET  /status     round number, tables still missing a result, champion
+    GET  /whatif     everyone's chances of making the DE cut given the results so far
+                     (see whatif.py); ?player=NAME answers for one player
+    POST /results    {"round": 3, "table": 12, "result": "Win", "points_left": 4}
+                     (or a list of such objects, accepted all or nothing); a table can
+                     resubmit to correct itself
+
+Results are from the participant's side, like the Result column of the sheet.
+When the last result of a round arrives the round is applied and the next
+pairings are computed at once (off the event loop, in a worker thread). Then
+/pairings and /standings are swapped for new pre-serialized responses, so
+reads never wait on a computation. Afterwards the workbook report and the
+state snapshot are written in the background, in the same format
+dynamic.py uses, so the batch script can take over at any point.
+"""
+import asyncio
+import json
+import logging
+import os
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from dynamic import DE_THRESHOLD, create_initial_pairings, export_to_excel, next_round_sheets
+from results import ResultSheetError
+from standings import BYE_ID, Standings
+from state import EngineState, state_filename
+from storage import parse_sheet_name
+from workbook import append_sheets, load_sheet, read_sheet_names
+
+
+MAX_BODY = 1 << 20
+STATUS_TEXT = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+log = logging.getLogger(__name__)
+
+
+class SubmissionError(ValueError):
+    """A rejected result submission; .status is the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(message)
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class TournamentServer:
+    """The in-memory tournament: current pairings, collected results and cached responses."""
+
+    def __init__(self, state, pairings, excel_filename):
+        self.state = state
+        self.excel_filename = excel_filename
+        self.lock = asyncio.Lock()  # one round transition or background write at a time
+        self.closing = False
+        self.champion = None
+        self.writes = set()
+        self.start_round(pairings)
+
+    def start_round(self, pairings):
+        """Opens the pending round for submissions; byes are already decided."""
+        self.kind, self.round_number = parse_sheet_name(self.state.pending_sheet)
+        self.pairings = [(participant, opponent) for participant, opponent in pairings]
+        self.results = [('Win', 0) if str(opponent).lower() == 'bye' else None for _, opponent in self.pairings]
+        self.outstanding = {table for table, result in enumerate(self.results) if result is None}
+        if not self.pairings and self.kind == 'DE':
+            winners = self.state.latest_winners()
+            self.champion = self.state.standings.names[winners[0]] if winners else None
+        self.publish()
+
+    def publish(self):
+        """Serializes /pairings and /standings once per round."""
+        tables = [{'table': table + 1, 'participant': participant, 'opponent': opponent}
+                  for table, (participant, opponent) in enumerate(self.pairings)]
+        self.pairings_body = _json({'round': self.round_number, 'kind': self.kind, 'tables': tables,
+                                    'champion': self.champion})
+        standings = self.state.standings
+        tiebreaks = standings.tiebreaks()
+        buchholz, omw = tiebreaks.buchholz.tolist(), tiebreaks.opponents_match_win().tolist()
+        self.standings_body = _json([
+            {'rank': rank, 'name': name, 'wins': wins, 'losses': losses, 'points_left': points_left,
+             'buchholz': buchholz[standings.ids[name]], 'omw': round(omw[standings.ids[name]], 4)}
+            for rank, (name, wins, losses, points_left) in enumerate(standings.rows(), start=1)])
+
+    def status(self):
+        return _json({'round': self.round_number, 'kind': self.kind, 'tables': len(self.pairings),
+                      'outstanding': sorted(table + 1 for table in self.outstanding),
+                      'champion': self.champion})
+
+    def validate(self, submission):
+        """Checks one submission; returns (table index, (result, points_left)) or raises SubmissionError."""
+        if not isinstance(submission, dict):
+            raise SubmissionError(400, "each submission must be a JSON object")
+        if self.closing or self.champion is not None:
+            raise SubmissionError(409, f"round {self.round_number} is closed")
+        if submission.get('round') != self.round_number:
+            raise SubmissionError(409, f"round {submission.get('round')!r} is not open, the current round is "
+                                       f"{self.round_number}")
+        table = submission.get('table')
+        if not isinstance(table, int) or not 1 <= table <= len(self.pairings):
+            raise SubmissionError(404, f"no table {table!r} in round {self.round_number}")
+        if str(self.pairings[table - 1][1]).lower() == 'bye':
+            raise SubmissionError(400, f"table {table} is a bye")
+        result = str(submission.get('result', '')).strip().capitalize()
+        if result not in ('Win', 'Loss'):
+            raise SubmissionError(400, f"result must be Win or Loss, got {submission.get('result')!r}")
+        points_left = submission.get('points_left', 0)
+        if not isinstance(points_left, int) or points_left < 0:
+            raise SubmissionError(400, f"points_left must be a non-negative integer, got {points_left!r}")
+        return table - 1, (result, points_left)
+
+    def complete_round(self):
+        """Applies the finished round and computes the next one (runs in a worker thread)."""
+        participants = [participant for participant, _ in self.pairings]
+        opponents = [opponent for _, opponent in self.pairings]
+        results = [result for result, _ in self.results]
+        points_left = [points for _, points in self.results]
+        finished = self.state.pending_sheet
+        self.state.apply_round(self.round_number, self.kind, participants, opponents, results, points_left)
+        sheet, df_next_round, new_sheets = next_round_sheets(self.state.standings, self.round_number + 1, self.state)
+        # Swiss sheets get their results along with the rankings; a finished DE round gets them here
+        if finished not in new_sheets:
+            new_sheets[finished] = self.state.round_results(finished)
+        self.state.sheet_names.append(sheet)
+        pairings = list(zip(df_next_round['Participant'], df_next_round['Opponent']))
+        if sheet.startswith('DE'):
+            ids = self.state.standings.ids
+            self.state.bracket = [(ids[participant], ids[opponent]) for participant, opponent in pairings]
+        return pairings, new_sheets
+
+    def write_report(self, new_sheets):
+        """Writes the new sheets into the workbook and saves the snapshot (runs in a worker thread)."""
+        append_sheets(self.excel_filename, new_sheets, column_width=25)
+        self.state.capture_rng()
+        self.state.save(state_filename(self.excel_filename))
+
+    async def submit(self, submissions):
+        """Records submissions; the one that completes the round also publishes the next pairings."""
+        if not isinstance(submissions, list):
+            submissions = [submissions]
+        # All or nothing: every submission is checked before any is stored
+        entries = [self.validate(submission) for submission in submissions]
+        for table, result in entries:
+            self.results[table] = result
+            self.outstanding.discard(table)
+        if self.outstanding or not self.pairings:
+            return {'round': self.round_number, 'accepted': len(submissions), 'outstanding': len(self.outstanding)}
+
+        # Last result is in: refuse corrections while the round is applied
+        self.closing = True
+        loop = asyncio.get_running_loop()
+        finished = self.round_number
+        try:
+            async with self.lock:
+                checkpoint = self.state.checkpoint()
+                try:
+                    pairings, new_sheets = await loop.run_in_executor(None, self.complete_round)
+                except Exception:
+                    # Back to the open round, so a corrected submission can complete it again
+                    self.state.rollback(checkpoint)
+                    raise
+        except ResultSheetError as error:
+            raise SubmissionError(400, str(error))
+        finally:
+            self.closing = False
+        self.start_round(pairings)
+
+        # The report and the snapshot are written after the new pairings are live
+        task = asyncio.create_task(self._write_in_background(new_sheets))
+        self.writes.add(task)
+        task.add_done_callback(self.writes.discard)
+        return {'round': finished, 'accepted': len(submissions), 'outstanding': 0,
+                'next_round': self.round_number}
+
+    async def whatif(self, player=None):
+        """DE cut chances for the open Swiss round, counting the results recorded so far."""
+        from whatif import explore
+
+        if self.kind != 'Swiss' or self.champion is not None:
+            raise SubmissionError(409, "the DE stage has started; the cut is final")
+        async with self.lock:
+            # A consistent snapshot: no round transition runs while it is taken
+            standings = self.state.standings.copy()
+            round_number = self.round_number
+            pairings, results = list(self.pairings), list(self.results)
+        # Explored without the lock, so submissions and round transitions go on meanwhile
+        ids = standings.ids
+        if player is not None and player not in ids:
+            raise SubmissionError(404, f"no player named {player!r}")
+        pairs = [(ids[participant], BYE_ID if str(opponent).lower() == 'bye' else ids[opponent])
+                 for participant, opponent in pairings]
+        decided = {table: result[0] == 'Win' for table, result in enumerate(results)
+                   if result is not None and pairs[table][1] != BYE_ID}
+        decided_points = {table: results[table][1] for table in decided}
+        exploration = await asyncio.get_running_loop().run_in_executor(
+            None, partial(explore, standings, round_number, DE_THRESHOLD, pairs, decided,
+                          decided_points=decided_points))
+        if player is not None:
+            return exploration.query(standings.names[ids[player]])
+        return {'round': round_number, 'exact': exploration.exact, 'samples': exploration.samples,
+                'players': exploration.table(standings.ranking_order().tolist())}
+
+    async def _write_in_background(self, new_sheets):
+        async with self.lock:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_report, new_sheets)
+
+    async def handle(self, method, path, body, query=None):
+        """Routes one request; returns (status, body bytes). An unexpected error is logged and answered with 500."""
+        try:
+            return await self._route(method, path, body, query)
+        except Exception as error:
+            log.exception("%s %s failed", method, path)
+            return 500, _json({'error': f"internal error: {type(error).__name__}"})
+
+    async def _route(self, method, path, body, query):
+        if path in ('/pairings', '/standings', '/status'):
+            if method != 'GET':
+                return 405, _json({'error': f"{path} only supports GET"})
+            if path == '/status':
+                return 200, self.status()
+            return 200, self.pairings_body if path == '/pairings' else self.standings_body
+        if path == '/results':
+            if method != 'POST':
+                return 405, _json({'error': "/results only supports POST"})
+            try:
+                return 202, _json(await self.submit(json.loads(body or b'null')))
+            except (json.JSONDecodeError, UnicodeDecodeError) as error:
+                return 400, _json({'error': f"invalid JSON: {error}"})
+            except SubmissionError as error:
+                return error.status, _json({'error': str(error)})
+        if path == '/whatif':
+            if method != 'GET':
+                return 405, _json({'error': "/whatif only supports GET"})
+            player = (query or {}).get('player', [None])[0]
+            try:
+                return 200, _json(await self.whatif(player))
+            except SubmissionError as error:
+                return error.status, _json({'error': str(error)})
+        return 404, _json({'error': f"no route for {path}"})
+
+    async def serve_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive; every response is JSON."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split(maxsplit=2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    status, response = 413, _json({'error': "request body too large"})
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    target = urlsplit(path)
+                    status, response = await self.handle(method.upper(), target.path, body, parse_qs(target.query))
+                    keep_alive = headers.get('connection', '').lower() != 'close' and 'HTTP/1.0' not in version
+                writer.write(f'HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n'
+                             f'Content-Type: application/json; charset=utf-8\r\n'
+                             f'Content-Length: {len(response)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1')
+                             + response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def load_server(excel_filename, participants):
+    """Builds the server from the saved state, or starts a new tournament."""
+    if not os.path.exists(excel_filename):
+        print("\nGenerating Initial Swiss Stage...")
+        standings = Standings(participants)  # one entry per player, however the list spells them
+        pairings = create_initial_pairings(list(standings.names))
+        export_to_excel(pairings, excel_filename)
+        state = EngineState(standings, sheet_names=['Swiss Round 1'])
+        state.capture_rng()
+        state.save(state_filename(excel_filename))
+        return TournamentServer(state, pairings, excel_filename)
+
+    sheet_names = read_sheet_names(excel_filename)
+    state = EngineState.load(state_filename(excel_filename))
+    if state is None and len(sheet_names) == 1:
+        # Round 1 as `dynamic.py init` wrote it (no snapshot yet): everyone on the sheet is a player
+        pairings = list(load_sheet(excel_filename, sheet_names[0]).rows('Participant', 'Opponent'))
+        field = list(participants) + [name for pair in pairings for name in pair
+                                         if name is not None and str(name).lower() != 'bye']
+        state = EngineState(Standings(field), sheet_names=sheet_names)
+        return TournamentServer(state, pairings, excel_filename)
+    if state is None or not state.matches_workbook(sheet_names):
+        raise SystemExit(f"No saved state matches '{excel_filename}'. Finish the current round with "
+                         f"`python dynamic.py` first, then start the server.")
+    state.restore_rng()
+    if state.pending_sheet.startswith('DE') and state.bracket:
+        # The saved bracket is the pending DE round; the sheet is not read
+        names = state.standings.names
+        return TournamentServer(state, [(names[p1], names[p2]) for p1, p2 in state.bracket], excel_filename)
+    pending = load_sheet(excel_filename, state.pending_sheet)
+    return TournamentServer(state, pending.rows('Participant', 'Opponent'), excel_filename)
+
+
+async def run_server(tournament, host='127.0.0.1', port=8080):
+    server = await asyncio.start_server(tournament.serve_connection, host, port)
+    print(f"Serving {tournament.kind} Round {tournament.round_number} on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def serve(excel_filename, participants, host='127.0.0.1', port=8080):
+    """Entry point for `python dynamic.py serve`."""
+    tournament = load_server(excel_filename, participants)
+    try:
+        asyncio.run(run_server(tournament, host, port))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
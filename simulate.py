@@ -1,90 +1,75 @@
+import argparse
 import random
+import numpy as np
 import pandas as pd
-import copy
-
-import random
-import copy
 
+import montecarlo
+from bracket import bracket_probabilities
+from instrument import add_arguments as add_instrument_arguments, run_instrumented, span, traced
+from pairing import pair_standings
+from standings import Standings, BYE, BYE_ID, WIN
 
-def generate_initial_pairings(participants):
-    """Generates pairings for a round in a Swiss-system tournament."""
-    # Shuffle only for the first round, subsequent rounds should be based on rankings
-    # random.shuffle(participants)  # No longer needed as sorting is done in simulate_swiss_round
-    # Pair participants, ensuring each is only paired once
-    return [participants[i:i + 2] for i in range(0, len(participants), 2)]
 
+def simulate_swiss_round(round_number, previous_rounds_results, model=None):
+    """Simulates a single Swiss round and returns (winner, loser, 'Win') tuples of player IDs"""
+    # Score-group pairing without rematches; previous_rounds_results is the Standings store
+    pairings = pair_standings(previous_rounds_results)
 
-def simulate_swiss_round(participants, round_number, previous_rounds_results):
-    """Simulates a single Swiss round and updates standings"""
-    pairings = generate_initial_pairings(participants)
+    # With an outcome model the whole round is decided by one vectorized draw
+    if model is not None:
+        games = [pair for pair in pairings if pair[1] != BYE_ID]
+        # Standings IDs -> the model's own player order
+        slots = model.slots(previous_rounds_results.names)
+        p1_wins = model.sample(slots[[pair[0] for pair in games]], slots[[pair[1] for pair in games]],
+                               np.random.default_rng(random.getrandbits(64)))
+        decided = {pair: pair[0] if won else pair[1] for pair, won in zip(games, p1_wins)}
 
     round_results = []
     for pair in pairings:
-        if len(pair) == 1:  # Handle bye if an odd number of participants
-            round_results.append((pair[0], 'Bye', 'Win'))
+        if pair[1] == BYE_ID:  # Handle bye if an odd number of participants
+            round_results.append((pair[0], BYE_ID, 'Win'))
         else:
-            winner = random.choice(pair)
+            winner = random.choice(pair) if model is None else decided[pair]
             loser = pair[1] if pair[0] == winner else pair[0]
             round_results.append((winner, loser, 'Win'))  # Only record winner's perspective
     return round_results
 
 
-def simulate_swiss_rounds(participants, rounds=5):
-    """Simulates all Swiss rounds and returns standings with detailed results."""
-    standings = {participant: {'wins': 0, 'losses': 0, 'matches': []} for participant in participants}
+@traced()
+def simulate_swiss_rounds(participants, rounds=5, model=None):
+    """Simulates all Swiss rounds and returns standings with per-round snapshot offsets."""
+    standings = Standings(participants)
     detailed_rounds_results = []
 
     for round_number in range(1, rounds + 1):
-        # Sort the participants before passing to the simulate_swiss_round
-        sorted_participants = sorted(standings.keys(), key=lambda x: (-standings[x]['wins'], standings[x]['losses']))
-        round_results = simulate_swiss_round(sorted_participants, round_number, standings)
-
-        # Track the participants who have already played in this round to avoid duplication
-        participants_played = set()
-
-        for match in round_results:
-            if match[1] == 'Bye':  # Handle bye
-                participant = match[0]
-                standings[participant]['wins'] += 1
-                standings[participant]['matches'].append((round_number, 'Bye', 'Win'))
-            else:
-                winner, loser, _ = match
-                # Only add the match if neither participant has played yet this round
-                if winner not in participants_played and loser not in participants_played:
-                    standings[winner]['wins'] += 1
-                    standings[loser]['losses'] += 1
-                    standings[winner]['matches'].append((round_number, loser, 'Win'))
-                    standings[loser]['matches'].append((round_number, winner, 'Loss'))
-                    participants_played.update([winner, loser])
-
-        detailed_rounds_results.append((round_number, copy.deepcopy(standings)))
+        with span('simulate.swiss_round'):
+            round_results = simulate_swiss_round(round_number, standings, model)
+
+            winners = [match[0] for match in round_results]
+            losers = [match[1] for match in round_results]
+            results = [BYE if loser == BYE_ID else WIN for loser in losers]
+            standings.record_matches(round_number, winners, losers, results, [0] * len(winners))
+
+        # The snapshot is just an offset into the match history, no copy needed
+        detailed_rounds_results.append((round_number, standings.end_round(round_number)))
 
     return standings, detailed_rounds_results
 
 
+@traced()
 def export_to_excel(standings, detailed_rounds_results, de_rounds, champion):
     with pd.ExcelWriter("tournament_results.xlsx", engine='openpyxl') as writer:
         # Iterate through each Swiss round's results and rankings
-        for round_number, round_standings in detailed_rounds_results:
-            round_data = []
-            # Track participants already added to avoid duplicating matches
-            participants_added = set()
-
-            for participant, info in round_standings.items():
-                for match in info['matches']:
-                    if match[0] == round_number and participant not in participants_added:  # Check the round and if we've already added this participant
-                        opponent, outcome = match[1], match[2]
-                        if outcome == 'Win':  # Only add the match if the participant won
-                            round_data.append([participant, opponent, outcome])
-                            participants_added.add(opponent)  # Add the opponent to the set so we don't add this match again
-                        elif outcome == 'Bye':  # Handle bye
-                            round_data.append([participant, 'Bye', 'Win'])
-
+        for round_number, _ in detailed_rounds_results:
+            # Matches are stored once, from the winner's perspective
+            round_data = [[standings.name(match['p1']), standings.name(match['p2']), 'Win']
+                          for match in standings.round_matches(round_number)]
             df_round = pd.DataFrame(round_data, columns=['Participant', 'Opponent', 'Result'])
 
-            # Prepare rankings data
-            rankings = [[participant, info['wins'], info['losses']] for participant, info in round_standings.items()]
-            rankings.sort(key=lambda x: (-x[1], x[2]))  # Sort by wins, then losses
+            # Prepare rankings data from the totals as they stood after this round
+            wins, losses, _ = standings.totals_at(round_number)
+            order = standings.ranking_order(wins, losses, np.zeros_like(wins))
+            rankings = [[standings.names[i], wins[i], losses[i]] for i in order]
             df_rankings = pd.DataFrame(rankings, columns=['Ranking Participant', 'Wins', 'Losses'])
 
             # Combine round results and rankings side by side
@@ -125,8 +110,12 @@ def qualify_for_de(sorted_standings, top_n=16):
     return sorted_standings[:top_n]
 
 
-def simulate_de(participants):
-    """Simulates the Direct Elimination (DE) stage and tracks the matchups and winners."""
+@traced()
+def simulate_de(participants, model=None):
+    """Simulates the Direct Elimination (DE) stage and tracks the matchups and winners.
+
+    'model' is an optional outcomes.OutcomeModel; without one every match is a coin flip.
+    """
     de_rounds = []
     current_participants = participants  # Assuming 'participants' is already a list of participant names
 
@@ -137,7 +126,10 @@ def simulate_de(participants):
             if i + 1 < len(current_participants):  # Ensure there is a pair to compete
                 p1 = current_participants[i]
                 p2 = current_participants[i + 1]
-                winner = random.choice([p1, p2])
+                if model is None:
+                    winner = random.choice([p1, p2])
+                else:
+                    winner = p1 if random.random() < model.probability(p1, p2) else p2
                 next_round_participants.append(winner)
                 round_matches.append((p1, p2, winner))
         if round_matches:  # Only add to de_rounds if there were matches
@@ -148,40 +140,142 @@ def simulate_de(participants):
     return champion, de_rounds
 
 
-def main():
+@traced()
+def exact_de_odds(qualifiers, model=None):
+    """Exact chance of each qualifier reaching every DE round, without sampling.
+
+    Uses the same bracket as simulate_de (adjacent qualifiers meet) and the
+    win probabilities of 'model', or coin flips when no model is given.
+    """
+    if model is None:
+        win_prob = np.full((len(qualifiers), len(qualifiers)), 0.5)
+        slots = np.arange(len(qualifiers))
+    else:
+        win_prob = model.matrix
+        slots = [model.index[participant] for participant in qualifiers]
+    reach = bracket_probabilities(slots, win_prob)
+    columns = [f'P(Win {r} Match{"es" if r > 1 else ""})' for r in range(1, reach.shape[1] - 1)] + ['P(Champion)']
+    odds = pd.DataFrame(reach[:, 1:], columns=columns)
+    odds.insert(0, 'Participant', qualifiers)
+    return odds
+
+
+@traced()
+def estimate_odds(participants, n_tournaments=1_000_000, rounds=4, top_n=16, seed=None, workers=1, model=None):
+    """Runs n_tournaments simulated tournaments and prints each participant's odds.
+
+    With the same seed the numbers are identical for any number of workers
+    (but not the same as before the process pool: see
+    montecarlo.simulate_tournaments_parallel).
+    The batch engine pairs the Swiss rounds like pair_standings but allows
+    rematches (see montecarlo.py), so the odds approximate the tournament
+    simulate_swiss_rounds plays. 'model' is an optional outcomes.OutcomeModel
+    over the same players, in any order.
+    """
+    win_prob = None if model is None else model.matrix_for(participants)
+    totals = montecarlo.simulate_tournaments_parallel(len(participants), n_tournaments, rounds=rounds, top_n=top_n,
+                                                      seed=seed, workers=workers, win_prob=win_prob)
+    summary = montecarlo.summarize(participants, totals)
+    print(f"\nApproximate odds over {n_tournaments} simulated tournaments (rematches allowed, see montecarlo.py):")
+    print(summary.to_string(index=False))
+    return summary, montecarlo.finish_distribution(participants, totals)
+
+
+def match_rows(standings, detailed_rounds_results, de_rounds):
+    """Yields every simulated match as a streams.MATCH_COLUMNS row, Swiss rounds first."""
+    for round_number, _ in detailed_rounds_results:
+        for match in standings.round_matches(round_number):
+            yield [f'Swiss Round {round_number}', standings.name(match['p1']), standings.name(match['p2']), 'Win', None]
+    for round_index, de_round in enumerate(de_rounds, start=1):
+        for p1, p2, winner in de_round:
+            yield [f'DE Round {round_index}', p1, p2, 'Win' if winner == p1 else 'Loss', None]
+
+
+def read_elo_model(filename, participants):
+    """An outcomes.EloModel from a .csv/.jsonl file with Participant and Rating columns.
+
+    Names match like registry.py matches them; every participant needs a rating.
+    """
+    from outcomes import EloModel
+    from registry import name_key
+    from streams import read_rows
+
+    ratings = {name_key(name): float(rating) for name, rating in read_rows(filename, ['Participant', 'Rating'])}
+    missing = [name for name in participants if name_key(name) not in ratings]
+    if missing:
+        raise SystemExit(f"{filename}: no rating for {', '.join(missing)}")
+    return EloModel(participants, {name: ratings[name_key(name)] for name in participants})
+
+
+@traced()
+def main(runs=None, workers=1, seed=None, model=None, matches_file=None, standings_file=None, excel=True,
+         ratings_file=None):
     # Predefined list of participants
     participants = ["Toni", "Stoyan", "Plamen", "Bobi", "Petyo", "Rosko", "Sasho", "Marto", "Nelly", "Nati", "Alexi",
                     "Tsveti", "Misho", "Pesho", "Alex", "Sasho M", "Reni", "Miro", "Gabi", "Geri", "Didi", "Kalata",
                     "Yavkata", "Ivo", "Marto S"]
+    if ratings_file is not None:
+        model = read_elo_model(ratings_file, participants)
+
+    if runs is not None:
+        # Many tournaments across worker processes, only the aggregated odds are reported
+        estimate_odds(participants, runs, rounds=4, top_n=16, seed=seed, workers=workers, model=model)
+        return
 
     print("\nSimulating Swiss Stage...")
-    standings, detailed_rounds_results = simulate_swiss_rounds(participants, rounds=4)
+    standings, detailed_rounds_results = simulate_swiss_rounds(participants, rounds=4, model=model)
 
     # Sort standings to determine top participants for DE
-    sorted_standings = sorted(standings.items(), key=lambda x: (x[1]['wins'],
-                                                                -x[1]['losses'],
-                                                                sum(1 for match in x[1]['matches'] if
-                                                                    match[2] == 'Win'),
-                                                                -sum(1 for match in x[1]['matches'] if
-                                                                     match[2] == 'Loss')),
-                              reverse=True)
+    sorted_standings = [standings.names[i] for i in standings.ranking_order()]
 
     # Qualifiers for DE Stage
     qualifiers = qualify_for_de(sorted_standings, top_n=16)
     print("\nQualifiers for DE Stage:")
-    for idx, (participant, _) in enumerate(qualifiers, 1):
+    for idx, participant in enumerate(qualifiers, 1):
         print(f"{idx}. {participant}")
 
+    if model is not None:
+        print("\nExact DE odds:")
+        print(exact_de_odds(qualifiers, model).to_string(index=False))
+
     # Simulating DE Stage
-    de_participants = [qualifier[0] for qualifier in qualifiers]
-    champion, de_rounds = simulate_de(de_participants)
+    de_participants = list(qualifiers)
+    champion, de_rounds = simulate_de(de_participants, model)
 
     print(f"\nChampion: {champion}")
 
-    # Export results to Excel
-    export_to_excel(standings, detailed_rounds_results, de_rounds, champion)
-    print("Tournament results have been exported to 'tournament_results.xlsx'.")
+    if matches_file is not None or standings_file is not None:
+        # Streamed one row at a time as CSV/JSON Lines, with the columns of the round sheets
+        from dynamic import rankings_rows
+        from streams import MATCH_COLUMNS, write_rows, write_standings
+
+        if matches_file is not None:
+            write_rows(matches_file, MATCH_COLUMNS, match_rows(standings, detailed_rounds_results, de_rounds))
+            print(f"Matches have been written to '{matches_file}'.")
+        if standings_file is not None:
+            write_standings(standings_file, rankings_rows(standings))
+            print(f"Swiss standings have been written to '{standings_file}'.")
+
+    if excel:
+        # Export results to Excel
+        export_to_excel(standings, detailed_rounds_results, de_rounds, champion)
+        print("Tournament results have been exported to 'tournament_results.xlsx'.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Simulate a Swiss + DE tournament.")
+    parser.add_argument('--runs', type=int,
+                        help="simulate this many tournaments and report approximate odds (the Swiss rounds "
+                             "allow rematches, see montecarlo.py)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for --runs (default: 1)")
+    parser.add_argument('--seed', type=int, help="master seed for --runs")
+    parser.add_argument('--matches', metavar='FILE', help="also write every match to a .csv/.jsonl file")
+    parser.add_argument('--standings', metavar='FILE', help="also write the Swiss standings to a .csv/.jsonl file")
+    parser.add_argument('--no-excel', action='store_true', help="skip tournament_results.xlsx")
+    parser.add_argument('--ratings', metavar='FILE',
+                        help="decide matches by Elo ratings from a .csv/.jsonl file (Participant, Rating) "
+                             "and print the exact DE odds")
+    add_instrument_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(args, main, runs=args.runs, workers=args.workers, seed=args.seed, matches_file=args.matches,
+                     standings_file=args.standings, excel=not args.no_excel, ratings_file=args.ratings)
@@ -0,0 +1,263 @@
+"""Array-backed standings shared by simulate.py and dynamic.py.
+
+Players are integer IDs from a registry.PlayerRegistry (their position in
+`names`). Wins, losses and points
+left are NumPy columns indexed by ID, and every match ever played goes into a
+single append-only structured array. A round snapshot is just the offset into
+that array where the round ended, so nothing is copied between rounds.
+"""
+import numpy as np
+
+from ranking import RankingIndex
+from registry import PlayerRegistry
+
+
+# Result codes, always from p1's point of view
+LOSS = 0
+WIN = 1
+BYE = 2
+
+# Opponent ID used for byes
+BYE_ID = -1
+
+MATCH_DTYPE = np.dtype([
+    ('round', np.int16),
+    ('p1', np.int32),
+    ('p2', np.int32),
+    ('result', np.int8),
+    ('points', np.int32),  # Points left of the losing player
+])
+
+RESULT_NAMES = {LOSS: 'Loss', WIN: 'Win', BYE: 'Win'}
+
+
+class Standings:
+    """Columnar standings plus an append-only match history."""
+
+    def __init__(self, participants, capacity=64):
+        # participants is a list of names or a registry (shared, so aliases added later apply here too)
+        self.players = participants if isinstance(participants, PlayerRegistry) else PlayerRegistry(participants)
+        # wins, losses and points_left are row views of one buffer with room to grow
+        self._columns = np.zeros((3, max(len(self.names), 1)), dtype=np.int32)
+        self._resize_players(len(self.names))
+        self._history = np.empty(max(capacity, 1), dtype=MATCH_DTYPE)
+        self._size = 0
+        self._round_ends = {}
+        self._ranking = None
+        self._tiebreaks = None
+
+    @property
+    def names(self):
+        """Display names indexed by player ID."""
+        return self.players.names
+
+    @property
+    def ids(self):
+        """Name -> ID lookups (the registry, so any spelling or alias of a name works)."""
+        return self.players
+
+    @classmethod
+    def from_totals(cls, names, wins, losses, points_left):
+        """Builds standings from already known totals (e.g. a rankings sheet), aligned with names."""
+        standings = cls(names)
+        standings.wins[:] = wins
+        standings.losses[:] = losses
+        standings.points_left[:] = points_left
+        return standings
+
+    def restore_history(self, history):
+        """Replaces the match history without touching the totals (used when loading saved state)."""
+        self._history = np.array(history, dtype=MATCH_DTYPE)
+        self._size = len(self._history)
+        self._round_ends = {}
+        for round_number in np.unique(self._history['round']).tolist():
+            self._round_ends[round_number] = int(np.flatnonzero(self._history['round'] == round_number)[-1]) + 1
+        self._reserve(1)
+        self._tiebreaks = None
+
+    def copy(self):
+        """Independent totals and history (the registry is shared), e.g. to read while rounds go on."""
+        copy = Standings.from_totals(self.players, self.wins, self.losses, self.points_left)
+        copy.restore_history(self.history)
+        return copy
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def add_player(self, name):
+        """Registers a new player and returns their ID (existing players keep theirs)."""
+        player_id = self.players.get(name)
+        if player_id is not None and player_id < len(self.wins):
+            return player_id
+        player_id = self.players.add(name)
+        # The registry may be shared and already hold players added elsewhere: cover all of them
+        known = len(self.wins)
+        self._resize_players(len(self.players))
+        if self._ranking is not None:
+            self._ranking.update(range(known, len(self.players)))
+        if self._tiebreaks is not None:
+            self._tiebreaks.update(self._history[:0])
+        return player_id
+
+    def name(self, player_id):
+        return 'Bye' if player_id == BYE_ID else self.names[player_id]
+
+    def _resize_players(self, count):
+        """Makes the columns count players long, doubling their buffer when it is full (amortized O(1) per player)."""
+        if count > self._columns.shape[1]:
+            grown = np.zeros((3, max(count, 2 * self._columns.shape[1])), dtype=np.int32)
+            grown[:, :len(self.wins)] = self._columns[:, :len(self.wins)]
+            self._columns = grown
+        self.wins, self.losses, self.points_left = self._columns[:, :count]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed > len(self._history):
+            grown = np.empty(max(needed, 2 * len(self._history)), dtype=MATCH_DTYPE)
+            grown[:self._size] = self._history[:self._size]
+            self._history = grown
+
+    def record_match(self, round_number, p1, p2, result, points=0):
+        """Records one match from p1's point of view and updates the totals."""
+        self.record_matches(round_number, [p1], [p2], [result], [points])
+
+    def record_matches(self, round_number, p1, p2, result, points):
+        """Records a batch of matches (parallel arrays) and updates the totals."""
+        p1 = np.asarray(p1, dtype=np.int32)
+        p2 = np.asarray(p2, dtype=np.int32)
+        result = np.asarray(result, dtype=np.int8)
+        points = np.asarray(points, dtype=np.int32)
+
+        self._reserve(len(p1))
+        rows = self._history[self._size:self._size + len(p1)]
+        rows['round'] = round_number
+        rows['p1'] = p1
+        rows['p2'] = p2
+        rows['result'] = result
+        rows['points'] = points
+        self._size += len(p1)
+        self._apply(rows)
+
+    def _apply(self, rows):
+        p1_won = rows['result'] != LOSS
+        played = rows['p2'] != BYE_ID
+        winners = np.where(p1_won, rows['p1'], rows['p2'])
+        losers = np.where(p1_won, rows['p2'], rows['p1'])[played]
+        # np.add.at because a player can show up more than once in a batch of rounds
+        np.add.at(self.wins, winners, 1)
+        np.add.at(self.losses, losers, 1)
+        np.add.at(self.points_left, losers, rows['points'][played])
+        if self._ranking is not None:
+            self._ranking.update(np.unique(np.concatenate([winners, losers])))
+        if self._tiebreaks is not None:
+            self._tiebreaks.update(rows)
+
+    def truncate(self, size):
+        """Undoes every match recorded after the first size ones (totals, round ends and indexes)."""
+        rows = self._history[size:self._size]
+        p1_won = rows['result'] != LOSS
+        played = rows['p2'] != BYE_ID
+        losers = np.where(p1_won, rows['p2'], rows['p1'])[played]
+        np.subtract.at(self.wins, np.where(p1_won, rows['p1'], rows['p2']), 1)
+        np.subtract.at(self.losses, losers, 1)
+        np.subtract.at(self.points_left, losers, rows['points'][played])
+        self._size = size
+        self._round_ends = {round_number: end for round_number, end in self._round_ends.items() if end <= size}
+        # Rebuilt on next use
+        self._ranking = None
+        self._tiebreaks = None
+
+    def end_round(self, round_number):
+        """Marks the end of a round and returns its snapshot offset."""
+        self._round_ends[round_number] = self._size
+        return self._size
+
+    @property
+    def history(self):
+        """All matches recorded so far (a view, not a copy)."""
+        return self._history[:self._size]
+
+    def history_until(self, round_number):
+        """Matches up to and including round_number (a view)."""
+        return self._history[:self._round_ends.get(round_number, self._size)]
+
+    def round_matches(self, round_number):
+        """Matches played in round_number (a view)."""
+        history = self.history_until(round_number)
+        return history[history['round'] == round_number]
+
+    def totals_at(self, round_number):
+        """Returns (wins, losses, points_left) as they stood after round_number.
+
+        Only matches recorded through record_match(es) are replayed, so for
+        standings built with from_totals this reflects the recorded rounds only.
+        """
+        history = self.history_until(round_number)
+        n = len(self.names)
+        p1_won = history['result'] != LOSS
+        played = history['p2'] != BYE_ID
+        winners = np.where(p1_won, history['p1'], history['p2'])
+        losers = np.where(p1_won, history['p2'], history['p1'])[played]
+        wins = np.bincount(winners, minlength=n)
+        losses = np.bincount(losers, minlength=n)
+        points_left = np.bincount(losers, weights=history['points'][played], minlength=n).astype(np.int64)
+        return wins, losses, points_left
+
+    def opponents(self, player_id):
+        """IDs of everyone player_id has played (byes excluded)."""
+        history = self.history
+        as_p1 = history['p2'][(history['p1'] == player_id) & (history['p2'] != BYE_ID)]
+        as_p2 = history['p1'][history['p2'] == player_id]
+        return np.concatenate([as_p1, as_p2])
+
+    def opponent_sets(self):
+        """Maps every player ID to the set of opponent IDs they have already played."""
+        played = {player_id: set() for player_id in range(len(self.names))}
+        history = self.history
+        games = history[history['p2'] != BYE_ID]
+        for p1, p2 in zip(games['p1'].tolist(), games['p2'].tolist()):
+            played[p1].add(p2)
+            played[p2].add(p1)
+        return played
+
+    def bye_counts(self):
+        """Number of byes each player ID has received, as an array."""
+        history = self.history
+        return np.bincount(history['p1'][history['p2'] == BYE_ID], minlength=len(self.names))
+
+    def ranking(self):
+        """The incremental RankingIndex for the current totals (built on first use)."""
+        if self._ranking is None:
+            self._ranking = RankingIndex(self)
+        return self._ranking
+
+    def tiebreaks(self):
+        """The incremental TiebreakIndex over the recorded matches (built on first use)."""
+        if self._tiebreaks is None:
+            from tiebreak import TiebreakIndex  # tiebreak imports the result codes from this module
+            self._tiebreaks = TiebreakIndex(self)
+        return self._tiebreaks
+
+    def ranking_order(self, wins=None, losses=None, points_left=None):
+        """Player IDs sorted by most wins, then fewest losses, then points left.
+
+        Ties keep entry order. Without arguments this reads the incremental
+        ranking index instead of sorting; pass totals (e.g. from totals_at)
+        to rank a past snapshot.
+        """
+        if wins is None and losses is None and points_left is None:
+            return np.fromiter(self.ranking(), dtype=np.int64, count=len(self.names))
+        wins = self.wins if wins is None else wins
+        losses = self.losses if losses is None else losses
+        points_left = self.points_left if points_left is None else points_left
+        return np.lexsort((points_left, losses, -np.asarray(wins)))
+
+    def rows(self, order=None):
+        """Yields (name, wins, losses, points_left) in ranking order."""
+        order = self.ranking_order() if order is None else order
+        for player_id in order:
+            yield (self.names[player_id], int(self.wins[player_id]), int(self.losses[player_id]),
+                   int(self.points_left[player_id]))
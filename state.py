@@ -0,0 +1,230 @@
+"""Persisted engine state for dynamic.py.
+
+After every round dynamic.py saves a compact snapshot next to the workbook:
+the standings arrays, the player names and aliases (in ID order), the full
+match history, which rounds were Swiss or DE, the current DE bracket (as
+player IDs), the state of the random module, the workbook's sheet list and
+a digest of the last applied round's results, under a version header. The
+next run loads it in milliseconds and only has to read the one sheet with
+the new results. If the snapshot is missing, has another version, its sheet
+list no longer matches the workbook, or the last applied results were
+corrected since, dynamic.py falls back to parsing the whole workbook.
+The saved DE bracket is the pending DE round: its results are checked
+against it, a restarted server serves it, and whatif computes the bracket
+odds from it.
+
+EngineState also offers the read interface of workbook.Tournament
+(round_results, match_history, latest_winners), so export_next_round_to_excel
+works on it directly. Loading a snapshot needs only NumPy; pandas is imported
+when results are parsed.
+"""
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+
+from instrument import count, traced
+from registry import PlayerRegistry
+from standings import BYE_ID, LOSS, MATCH_DTYPE, RESULT_NAMES, Standings
+
+
+STATE_VERSION = 3  # 2: player aliases, DE bracket as IDs; 3: digest of the last applied results
+
+
+def state_filename(excel_filename):
+    """Where the snapshot for a workbook lives, e.g. tournament_results.state.npz."""
+    return os.path.splitext(excel_filename)[0] + '.state.npz'
+
+
+def _round_rows(round_number, p1, p2, result, points):
+    rows = np.empty(len(p1), dtype=MATCH_DTYPE)
+    rows['round'], rows['p1'], rows['p2'], rows['result'], rows['points'] = round_number, p1, p2, result, points
+    return rows
+
+
+def results_digest(rows):
+    """Digest of a round's parsed results; the same however the cells were spelled or rewritten."""
+    return hashlib.sha1(np.ascontiguousarray(rows).tobytes()).hexdigest()
+
+
+class EngineState:
+    """Everything dynamic.py needs to continue a tournament without the workbook."""
+
+    def __init__(self, standings, round_kinds=None, sheet_names=None, bracket=None, rng_state=None,
+                 applied_digest=None):
+        self.standings = standings
+        self.round_kinds = dict(round_kinds or {})
+        self.sheet_names = list(sheet_names or [])
+        self.bracket = list(bracket or [])
+        self.rng_state = rng_state
+        self.applied_digest = applied_digest  # results_digest of the last applied round
+
+    @property
+    def pending_sheet(self):
+        """The sheet whose results have not been applied yet (the last one written)."""
+        return self.sheet_names[-1] if self.sheet_names else None
+
+    @classmethod
+    @traced()
+    def from_tournament(cls, tournament, standings):
+        """Builds state after a full workbook parse.
+
+        The totals come from standings (as read_last_round_and_update_standings
+        computed them); the history is rebuilt from every round sheet.
+        """
+        from results import parse_round_results
+
+        history = []
+        round_kinds = {}
+        digest = None
+        for name in tournament.sheet_names:
+            sheet = tournament[name]
+            kind, round_number = name.rpartition(' Round ')[0], sheet.round_number
+            if round_number == 0:
+                continue
+            round_kinds[round_number] = kind
+            p1, p2, result, points = parse_round_results(
+                standings.players, sheet.column('Participant'), sheet.column('Opponent'), sheet.column('Result'),
+                sheet.column('Points Left'))
+            rows = _round_rows(round_number, p1, p2, result, points)
+            history.append(rows)
+            digest = results_digest(rows)
+        restored = Standings.from_totals(standings.players, standings.wins, standings.losses, standings.points_left)
+        restored.restore_history(np.concatenate(history) if history else np.empty(0, dtype=MATCH_DTYPE))
+        return cls(restored, round_kinds, tournament.sheet_names, applied_digest=digest)
+
+    @traced()
+    def apply_round(self, round_number, kind, participants, opponents, results, points_left):
+        """Applies only the new round's results (validated in one batch).
+
+        A DE round must be played as the saved bracket paired it; raises
+        results.ResultSheetError otherwise.
+        """
+        from results import ResultSheetError, parse_round_results
+
+        p1, p2, result, points = parse_round_results(self.standings.players, participants, opponents, results,
+                                                     points_left)
+        if kind == 'DE' and self.bracket:
+            names = self.standings.names
+            played = {frozenset(pair) for pair in zip(p1.tolist(), p2.tolist())}
+            saved = {frozenset(pair) for pair in self.bracket}
+            if played != saved:
+                raise ResultSheetError(
+                    [f"{' vs '.join(names[player] for player in sorted(pair))} is not in the DE bracket"
+                     for pair in played - saved]
+                    + [f"{' vs '.join(names[player] for player in sorted(pair))} from the DE bracket has no result"
+                       for pair in saved - played])
+        self.standings.record_matches(round_number, p1, p2, result, points)
+        self.standings.end_round(round_number)
+        self.round_kinds[round_number] = kind
+        self.applied_digest = results_digest(_round_rows(round_number, p1, p2, result, points))
+        return round_number
+
+    def results_changed(self, round_number, participants, opponents, results, points_left):
+        """True if these result columns differ from the applied results of round_number (the last round)."""
+        from results import parse_round_results
+
+        rows = _round_rows(round_number, *parse_round_results(self.standings.players, participants, opponents,
+                                                              results, points_left))
+        return results_digest(rows) != self.applied_digest
+
+    def undo_round(self, round_number):
+        """Takes back the last applied round, so corrected results can be applied instead."""
+        self.standings.truncate(len(self.standings.history) - len(self.standings.round_matches(round_number)))
+        del self.round_kinds[round_number]
+
+    def checkpoint(self):
+        """What rollback() needs to undo a round transition that failed halfway."""
+        return len(self.standings.history), dict(self.round_kinds), list(self.sheet_names), list(self.bracket)
+
+    def rollback(self, checkpoint):
+        size, round_kinds, sheet_names, bracket = checkpoint
+        self.standings.truncate(size)
+        self.round_kinds, self.sheet_names, self.bracket = round_kinds, sheet_names, bracket
+
+    # Same read interface as workbook.Tournament
+
+    def round_results(self, sheet_name):
+        import pandas as pd
+
+        round_number = int(sheet_name.split()[-1])
+        standings = self.standings
+        rows = [[standings.name(match['p1']), standings.name(match['p2']), RESULT_NAMES[int(match['result'])],
+                 int(match['points'])] for match in standings.round_matches(round_number)]
+        return pd.DataFrame(rows, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
+
+    def match_history(self, players=None):
+        # The history is already in IDs of self.standings.players
+        history = self.standings.history
+        swiss = np.array([self.round_kinds.get(int(r)) == 'Swiss' for r in history['round']], dtype=bool)
+        played = {}
+        byes_received = {}
+        for p1, p2 in zip(history['p1'][swiss].tolist(), history['p2'][swiss].tolist()):
+            if p2 == BYE_ID:
+                byes_received[p1] = byes_received.get(p1, 0) + 1
+            else:
+                played.setdefault(p1, set()).add(p2)
+                played.setdefault(p2, set()).add(p1)
+        return played, byes_received
+
+    def latest_winners(self, players=None):
+        history = self.standings.history
+        if not len(history):
+            return []
+        latest = history[history['round'] == history['round'].max()]
+        return np.where(latest['result'] != LOSS, latest['p1'], latest['p2']).tolist()
+
+    @traced()
+    def save(self, filename):
+        """Writes the snapshot (atomically) as a NumPy .npz archive with a JSON header."""
+        header = {
+            'version': STATE_VERSION,
+            'names': self.standings.names,
+            'aliases': self.standings.players.aliases,
+            'round_kinds': {str(round_number): kind for round_number, kind in self.round_kinds.items()},
+            'sheet_names': self.sheet_names,
+            'bracket': self.bracket,
+            'rng_state': self.rng_state,
+            'applied_digest': self.applied_digest,
+        }
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as handle:
+            np.savez(handle, header=np.array(json.dumps(header, ensure_ascii=False)),
+                     wins=self.standings.wins, losses=self.standings.losses,
+                     points_left=self.standings.points_left, history=self.standings.history)
+        os.replace(temporary, filename)
+        count('state.bytes_written', os.path.getsize(filename))
+
+    @classmethod
+    @traced()
+    def load(cls, filename):
+        """Reads a snapshot; returns None if it is missing or was written by another version."""
+        if not os.path.exists(filename):
+            return None
+        with np.load(filename, allow_pickle=False) as archive:
+            header = json.loads(str(archive['header']))
+            if header.get('version') != STATE_VERSION:
+                return None
+            players = PlayerRegistry(header['names'], header['aliases'])
+            standings = Standings.from_totals(players, archive['wins'], archive['losses'], archive['points_left'])
+            standings.restore_history(archive['history'])
+        round_kinds = {int(round_number): kind for round_number, kind in header['round_kinds'].items()}
+        bracket = [tuple(pair) for pair in header['bracket']]
+        return cls(standings, round_kinds, header['sheet_names'], bracket, header['rng_state'],
+                   header['applied_digest'])
+
+    def matches_workbook(self, sheet_names):
+        """True if the workbook has exactly the sheets this snapshot was saved with."""
+        return list(sheet_names) == self.sheet_names
+
+    def capture_rng(self):
+        """Remembers the random module's state so the next run continues the same stream."""
+        version, internal, gauss = random.getstate()
+        self.rng_state = [version, list(internal), gauss]
+
+    def restore_rng(self):
+        if self.rng_state is not None:
+            version, internal, gauss = self.rng_state
+            random.setstate((version, tuple(internal), gauss))
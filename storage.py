@@ -0,0 +1,272 @@
+"""Storage backends for tournament state.
+
+SQLiteStorage keeps players, rounds, pairings, matches and running standings
+in indexed tables of an embedded SQLite database. Applying a round is one
+transaction that inserts that round's matches and updates only the standings
+rows of the players who played, so the cost does not grow with the number of
+rounds already stored. Loading reads the totals from the standings table;
+the match history is only replayed for the opponent sets. Player IDs are the
+explicit 0-based id column, the same IDs Standings and the match rows use.
+The Excel workbook becomes a report generated from it.
+
+It offers the same read methods as workbook.Tournament (round_results,
+match_history, latest_winners), so export_next_round_to_excel in dynamic.py
+works on either one. Bulk match history can be exported to Parquet with
+ParquetHistory.
+"""
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from registry import PlayerRegistry
+from results import parse_round_results
+from standings import BYE, BYE_ID, LOSS, MATCH_DTYPE, RESULT_NAMES, WIN, Standings
+
+
+# PRAGMA user_version of the schema; 1: 0-based player IDs (they were SQLite row IDs from 1 before)
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,  -- 0-based, assigned in registration order
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    number INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pairings (
+    round INTEGER NOT NULL REFERENCES rounds(number),
+    position INTEGER NOT NULL,
+    participant INTEGER NOT NULL,
+    opponent INTEGER NOT NULL,
+    PRIMARY KEY (round, position)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    round INTEGER NOT NULL REFERENCES rounds(number),
+    p1 INTEGER NOT NULL,
+    p2 INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    points INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_round ON matches(round);
+CREATE INDEX IF NOT EXISTS matches_p1 ON matches(p1);
+CREATE INDEX IF NOT EXISTS matches_p2 ON matches(p2);
+CREATE TABLE IF NOT EXISTS standings (
+    player_id INTEGER PRIMARY KEY REFERENCES players(id),
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    points_left INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def sheet_name(kind, round_number):
+    """Workbook sheet name for a round, e.g. 'Swiss Round 3' or 'DE Round 5'."""
+    return f'{kind} Round {round_number}'
+
+
+def parse_sheet_name(name):
+    """Inverse of sheet_name: returns (kind, round_number)."""
+    kind, _, number = name.rpartition(' Round ')
+    return kind, int(number)
+
+
+class SQLiteStorage:
+    """Tournament state in an embedded SQLite database."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.connection:
+            if version == 0 and self.connection.execute('SELECT MIN(id) FROM players').fetchone()[0] == 1:
+                # Row IDs from 1 -> 0-based IDs (ascending, so every new ID is already free)
+                self.connection.execute('UPDATE players SET id = id - 1')
+                self.connection.execute('UPDATE standings SET player_id = player_id - 1')
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_new(self):
+        return self.connection.execute('SELECT COUNT(*) FROM players').fetchone()[0] == 0
+
+    def add_players(self, names):
+        # Spellings of an already stored player (case, spaces) are not added again
+        players = self.players()
+        with self.connection:
+            for name in names:
+                if name in players:
+                    continue
+                player_id = players.add(name)
+                self.connection.execute('INSERT INTO players (id, name) VALUES (?, ?)',
+                                        (player_id, players.names[player_id]))
+                self.connection.execute('INSERT INTO standings (player_id) VALUES (?)', (player_id,))
+
+    def player_names(self):
+        """Names indexed by player ID."""
+        return [name for (name,) in self.connection.execute('SELECT name FROM players ORDER BY id')]
+
+    def players(self):
+        """The registry.PlayerRegistry of the stored players, with the same IDs."""
+        return PlayerRegistry(self.player_names())
+
+    def current_round(self):
+        """(round_number, kind, completed) of the latest paired round, or None."""
+        return self.connection.execute(
+            'SELECT number, kind, completed FROM rounds ORDER BY number DESC LIMIT 1').fetchone()
+
+    def save_pairings(self, round_number, kind, pairings):
+        """Stores a round's pairings, given as (participant, opponent) names with 'Bye' for the bye."""
+        ids = self.players()
+        rows = [(round_number, position, ids[participant], BYE_ID if str(opponent).lower() == 'bye' else ids[opponent])
+                for position, (participant, opponent) in enumerate(pairings)]
+        with self.connection:
+            self.connection.execute('INSERT INTO rounds (number, kind) VALUES (?, ?)', (round_number, kind))
+            self.connection.executemany('INSERT INTO pairings VALUES (?, ?, ?, ?)', rows)
+
+    def apply_results(self, round_number, participants, opponents, results, points_left, first_row=2):
+        """Validates and applies one round's results in a single transaction.
+
+        Only the new match rows are inserted and only the standings rows of
+        players in this round are updated. Raises results.ResultSheetError
+        for malformed rows and ValueError if the round was already applied.
+        """
+        players = self.players()
+        p1, p2, result, points = parse_round_results(players, participants, opponents, results, points_left,
+                                                     first_row)
+        p1_won = result != LOSS
+        played = p2 != BYE_ID
+        winners = np.where(p1_won, p1, p2)
+        losers = np.where(p1_won, p2, p1)[played]
+        n = len(players)
+        wins = np.bincount(winners, minlength=n)
+        losses = np.bincount(losers, minlength=n)
+        points_delta = np.bincount(losers, weights=points[played], minlength=n).astype(np.int64)
+        touched = np.flatnonzero(wins | losses)
+
+        with self.connection:
+            row = self.connection.execute('SELECT completed FROM rounds WHERE number = ?', (round_number,)).fetchone()
+            if row is not None and row[0]:
+                raise ValueError(f"Round {round_number} has already been applied")
+            self.connection.executemany(
+                'INSERT INTO matches VALUES (?, ?, ?, ?, ?)',
+                zip([round_number] * len(p1), p1.tolist(), p2.tolist(), result.tolist(), points.tolist()))
+            self.connection.executemany(
+                'UPDATE standings SET wins = wins + ?, losses = losses + ?, points_left = points_left + ? '
+                'WHERE player_id = ?',
+                [(int(wins[i]), int(losses[i]), int(points_delta[i]), int(i)) for i in touched])
+            self.connection.execute('UPDATE rounds SET completed = 1 WHERE number = ?', (round_number,))
+        return len(p1)
+
+    def history(self):
+        """Every match as a structured array with standings.MATCH_DTYPE, in play order."""
+        rows = self.connection.execute('SELECT round, p1, p2, result, points FROM matches ORDER BY rowid').fetchall()
+        return np.array(rows, dtype=MATCH_DTYPE) if rows else np.empty(0, dtype=MATCH_DTYPE)
+
+    def load_standings(self):
+        """Builds a Standings store from the database: totals from the standings table, the history for opponents.
+
+        Returns (standings, last_completed_round).
+        """
+        rows = self.connection.execute('SELECT wins, losses, points_left FROM standings ORDER BY player_id').fetchall()
+        totals = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        standings = Standings.from_totals(self.players(), totals[:, 0], totals[:, 1], totals[:, 2])
+        history = self.history()
+        standings.restore_history(history)
+        last_round = int(history['round'].max()) if len(history) else 0
+        return standings, last_round
+
+    # Same read interface as workbook.Tournament
+
+    def round_results(self, name):
+        """A round as the Participant/Opponent/Result/Points Left DataFrame the workbook uses."""
+        _, round_number = parse_sheet_name(name)
+        names = self.player_names()
+        rows = []
+        for p1, p2, result, points in self.connection.execute(
+                'SELECT p1, p2, result, points FROM matches WHERE round = ? ORDER BY rowid', (round_number,)):
+            opponent = 'Bye' if p2 == BYE_ID else names[p2]
+            rows.append([names[p1], opponent, RESULT_NAMES[result], points])
+        return pd.DataFrame(rows, columns=['Participant', 'Opponent', 'Result', 'Points Left'])
+
+    def _id_map(self, players):
+        # Stored ID -> ID in players (the same unless players was built elsewhere)
+        return players.lookup(self.player_names())
+
+    def match_history(self, players):
+        """(played, byes_received) by player ID of players over all Swiss rounds."""
+        ids = self._id_map(players)
+        played = {}
+        byes_received = {}
+        for p1, p2 in self.connection.execute(
+                "SELECT p1, p2 FROM matches JOIN rounds ON rounds.number = matches.round WHERE rounds.kind = 'Swiss'"):
+            if p2 == BYE_ID:
+                byes_received[ids[p1]] = byes_received.get(ids[p1], 0) + 1
+            else:
+                played.setdefault(ids[p1], set()).add(ids[p2])
+                played.setdefault(ids[p2], set()).add(ids[p1])
+        return played, byes_received
+
+    def latest_winners(self, players):
+        """IDs (in players) of the winners of the latest completed round, in pairing order."""
+        ids = self._id_map(players)
+        winners = []
+        for p1, p2, result in self.connection.execute(
+                'SELECT p1, p2, result FROM matches WHERE round = (SELECT MAX(round) FROM matches) ORDER BY rowid'):
+            winners.append(ids[p1] if result in (WIN, BYE) else ids[p2])
+        return winners
+
+
+class ParquetHistory:
+    """Append-only match history as one Parquet file per round.
+
+    Writing a round only creates that round's file; reading concatenates
+    them. Needs a Parquet engine for pandas (pyarrow or fastparquet).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, round_number):
+        return os.path.join(self.directory, f'round_{round_number:04d}.parquet')
+
+    def rounds(self):
+        return sorted(int(name[6:10]) for name in os.listdir(self.directory)
+                      if name.startswith('round_') and name.endswith('.parquet'))
+
+    def append_round(self, round_number, matches):
+        """Writes one round's matches (a MATCH_DTYPE array) unless it is already there."""
+        path = self._path(round_number)
+        if not os.path.exists(path):
+            pd.DataFrame(matches).to_parquet(path, index=False)
+
+    def sync(self, storage):
+        """Exports every stored round that has no Parquet file yet."""
+        exported = set(self.rounds())
+        history = storage.history()
+        for round_number in np.unique(history['round']).tolist():
+            if round_number not in exported:
+                self.append_round(round_number, history[history['round'] == round_number])
+
+    def read(self):
+        """The whole history as one DataFrame."""
+        frames = [pd.read_parquet(self._path(round_number)) for round_number in self.rounds()]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(np.empty(0, dtype=MATCH_DTYPE))
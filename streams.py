@@ -0,0 +1,145 @@
+"""Streaming CSV and JSON Lines I/O with the same columns as the round sheets.
+
+Results and pairings use the Participant/Opponent/Result/Points Left columns
+of a round sheet; standings use the rankings block (Standings, Wins, Losses,
+Points Left Standings and the tiebreaks). A file's format comes from its
+extension (.csv, .jsonl or .ndjson); '-' is stdin/stdout, JSON Lines unless
+fmt says otherwise.
+
+Rows go through generators one at a time, so reading and writing take
+constant memory and never build a DataFrame:
+
+    for participant, opponent, result, points_left in read_rows('round3.csv', RESULT_COLUMNS):
+        ...
+    write_rows('round4.jsonl', RESULT_COLUMNS, pairing_rows)
+
+A CSV file has a header row; extra columns are ignored and empty cells are
+None. A JSON Lines file has one object per line keyed by column name; blank
+lines are skipped and missing keys are None.
+"""
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+from instrument import count, traced
+from workbook import RESULT_COLUMNS, Sheet
+
+
+STANDINGS_COLUMNS = ['Standings', 'Wins', 'Losses', 'Points Left Standings', 'Buchholz', 'Median Buchholz',
+                     'OMW%', 'SOS']
+
+# Matches of several rounds in one stream carry the sheet name, e.g. 'Swiss Round 3'
+MATCH_COLUMNS = ['Round'] + RESULT_COLUMNS
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+def stream_format(filename, fmt=None):
+    """'csv' or 'jsonl' for a file name (fmt wins if given); raises ValueError for other extensions."""
+    if fmt is not None:
+        if fmt not in ('csv', 'jsonl'):
+            raise ValueError(f"unknown stream format {fmt!r}; use 'csv' or 'jsonl'")
+        return fmt
+    if filename == '-':
+        return 'jsonl'
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"can't tell the format of {filename!r}; use a .csv, .jsonl or .ndjson file")
+    return FORMATS[extension]
+
+
+def is_stream(filename):
+    """True for names read and written by this module rather than as a workbook."""
+    return filename == '-' or os.path.splitext(filename)[1].lower() in FORMATS
+
+
+@contextmanager
+def _open(filename, mode):
+    if filename == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    with open(filename, mode, encoding='utf-8', newline='') as handle:
+        yield handle
+
+
+def _plain(value):
+    # NumPy scalars (counts, tiebreaks) are not JSON serializable as such
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def read_rows(filename, columns, fmt=None):
+    """Yields one list per row with the values of `columns`, in that order.
+
+    Raises ValueError if a CSV header lacks one of the columns.
+    """
+    fmt = stream_format(filename, fmt)
+    with _open(filename, 'r') as handle:
+        if fmt == 'csv':
+            reader = csv.reader(handle)
+            header = next(reader, [])
+            missing = [column for column in columns if column not in header]
+            if missing:
+                raise ValueError(f"{filename}: missing column(s) {', '.join(missing)}")
+            positions = [header.index(column) for column in columns]
+            for row in reader:
+                if not any(row):
+                    continue
+                yield [row[position] if position < len(row) and row[position] != '' else None
+                       for position in positions]
+        else:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise ValueError(f"{filename}, line {line_number}: {error}") from None
+                if not isinstance(record, dict):
+                    raise ValueError(f"{filename}, line {line_number}: expected a JSON object")
+                yield [record.get(column) for column in columns]
+
+
+@traced()
+def write_rows(filename, columns, rows, fmt=None):
+    """Writes rows (sequences in `columns` order, short rows padded with None); returns the row count."""
+    fmt = stream_format(filename, fmt)
+    written = 0
+    with _open(filename, 'w') as handle:
+        if fmt == 'csv':
+            writer = csv.writer(handle)
+            writer.writerow(columns)
+        for row in rows:
+            values = list(row) + [None] * (len(columns) - len(row))
+            if fmt == 'csv':
+                writer.writerow(values)  # None becomes an empty cell
+            else:
+                handle.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False, default=_plain) + '\n')
+            written += 1
+    count('streams.rows_written', written)
+    return written
+
+
+@traced()
+def read_results(filename, sheet_name, fmt=None):
+    """One round's results as a workbook.Sheet, so they can stand in for the round's sheet.
+
+    The rows are streamed straight into the sheet's four columns; no other
+    copy of the file is held.
+    """
+    sheet = Sheet(sheet_name, RESULT_COLUMNS, read_rows(filename, RESULT_COLUMNS, fmt))
+    count('streams.rows_parsed', len(sheet))
+    return sheet
+
+
+def write_pairings(filename, pairings, fmt=None):
+    """Writes (participant, opponent[, result, points left]) pairings with the round sheet columns."""
+    return write_rows(filename, RESULT_COLUMNS, pairings, fmt)
+
+
+def write_standings(filename, rankings, fmt=None):
+    """Writes rankings rows (best first) with the rankings block columns."""
+    return write_rows(filename, STANDINGS_COLUMNS, rankings, fmt)
@@ -0,0 +1,29 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to dynamic.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fill_results():
+    """Types random results into the latest sheet of a workbook, as the TO would."""
+    from openpyxl import load_workbook
+
+    def fill(filename, seed=0):
+        rng = random.Random(seed)
+        book = load_workbook(filename)
+        for row in book.worksheets[-1].iter_rows(min_row=2):
+            if row[0].value is None:
+                continue
+            if str(row[1].value).lower() == 'bye':
+                row[2].value, row[3].value = 'Win', 0
+            else:
+                row[2].value, row[3].value = rng.choice(['Win', 'Loss']), rng.randint(0, 5)
+        book.save(filename)
+        return book
+
+    return fill
@@ -0,0 +1,99 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from bracket import bracket_probabilities, first_vs_last_odds, fold_seed_order
+from dynamic import de_generate_pairings_based_on_rankings
+
+
+def random_win_prob(size, seed):
+    rng = np.random.default_rng(seed)
+    win_prob = rng.random((size, size))
+    win_prob = np.triu(win_prob, 1) + np.tril(1 - win_prob.T, -1)
+    np.fill_diagonal(win_prob, 0.5)
+    return win_prob
+
+
+def play_dynamic(entrants, win_prob, decided=None):
+    """P(winning r matches) for every entrant, enumerating dynamic.py's DE rounds outcome by outcome."""
+    size = len(entrants)
+    rounds = size.bit_length() - 1
+    reach = {player: np.zeros(rounds + 1) for player in entrants}
+
+    def play(players, probability, round_index):
+        for player in players:
+            reach[player][round_index] += probability
+        if len(players) == 1:
+            return
+        tables = [(p1, p2) for p1, p2, _, _ in de_generate_pairings_based_on_rankings(players)]
+        for outcome in itertools.product((True, False), repeat=len(tables)):
+            chance = probability
+            for table, ((p1, p2), first_won) in enumerate(zip(tables, outcome)):
+                p = win_prob[p1, p2]
+                if round_index == 0 and decided and table in decided:
+                    p = float(decided[table])
+                chance *= p if first_won else 1 - p
+            if chance:
+                # Winners in pairing order, as latest_winners lists them
+                play([p1 if first_won else p2 for (p1, p2), first_won in zip(tables, outcome)], chance,
+                     round_index + 1)
+
+    play(list(entrants), 1.0, 0)
+    return np.array([reach[player] for player in entrants])
+
+
+@pytest.mark.parametrize('size', [2, 4, 8, 16, 32])
+def test_folded_order_matches_dynamic_pairing(size):
+    rng = np.random.default_rng(size)
+    entrants = list(rng.permutation(100)[:size])
+    slot_of = {player: slot for slot, player in enumerate(fold_seed_order(entrants))}
+    players, block = entrants, 1
+    while len(players) > 1:
+        winners = []
+        for p1, p2, _, _ in de_generate_pairings_based_on_rankings(players):
+            # Neighbouring sub-brackets of the folded order meet
+            assert slot_of[p1] // (2 * block) == slot_of[p2] // (2 * block)
+            assert slot_of[p1] // block != slot_of[p2] // block
+            winners.append(p1 if rng.random() < 0.5 else p2)
+        players, block = winners, block * 2
+
+
+def test_bracket_probabilities_match_enumeration():
+    size = 8
+    win_prob = random_win_prob(size, seed=3)
+    slots = [5, 2, 7, 0, 3, 6, 1, 4]
+    expected = np.zeros((size, 4))
+    expected[:, 0] = 1
+    for outcome in itertools.product((True, False), repeat=size - 1):
+        outcome = iter(outcome)
+        players, chance, won = list(slots), 1.0, {}
+        for round_index in range(1, 4):
+            winners = []
+            for left, right in zip(players[::2], players[1::2]):
+                left_won = next(outcome)
+                chance *= win_prob[left, right] if left_won else win_prob[right, left]
+                winners.append(left if left_won else right)
+            for player in winners:
+                won.setdefault(player, []).append(round_index)
+            players = winners
+        for player, rounds in won.items():
+            expected[slots.index(player), rounds] += chance
+
+    assert np.allclose(bracket_probabilities(slots, win_prob), expected)
+
+
+@pytest.mark.parametrize('decided', [None, {0: False, 2: True}])
+def test_first_vs_last_odds_match_dynamic_bracket(decided):
+    win_prob = random_win_prob(12, seed=5)
+    entrants = [9, 1, 4, 11, 0, 7, 3, 6]
+
+    odds = first_vs_last_odds(entrants, win_prob, decided)
+
+    assert np.allclose(odds, play_dynamic(entrants, win_prob, decided))
+    assert odds[:, -1].sum() == pytest.approx(1)
+
+
+def test_first_vs_last_odds_need_a_power_of_two():
+    with pytest.raises(ValueError):
+        first_vs_last_odds([0, 1, 2, 3, 4, 5])
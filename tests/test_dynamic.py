@@ -0,0 +1,74 @@
+import pytest
+from openpyxl import load_workbook
+
+import dynamic
+from results import ResultSheetError
+from standings import Standings
+from state import EngineState, state_filename
+from workbook import load_tournament
+
+PLAYERS = [f'P{i}' for i in range(24)]
+
+
+def flip_first_result(filename):
+    """Corrects the first result of the latest sheet; returns the loser's name."""
+    book = load_workbook(filename)
+    sheet = book.worksheets[-1]
+    sheet['C2'] = 'Loss' if sheet['C2'].value == 'Win' else 'Win'
+    book.save(filename)
+    return sheet['A2'].value if sheet['C2'].value == 'Loss' else sheet['B2'].value
+
+
+def test_corrected_first_round_is_counted_once(tmp_path, fill_results):
+    # apply-results --write-rankings, correct a result, next-round
+    filename = str(tmp_path / 'tournament.xlsx')
+    dynamic.init(filename, PLAYERS)
+    fill_results(filename, seed=1)
+    dynamic.apply_results(filename, PLAYERS, write_rankings=True)
+    loser = flip_first_result(filename)
+
+    dynamic.next_round(filename, PLAYERS)
+
+    standings = EngineState.load(state_filename(filename)).standings
+    matches = len(PLAYERS) // 2
+    assert standings.wins.sum() == matches
+    assert standings.losses.sum() == matches
+    assert (standings.wins + standings.losses).tolist() == [1] * len(PLAYERS)
+    assert standings.losses[standings.ids[loser]] == 1
+
+
+def test_snapshot_and_full_parse_agree(tmp_path, fill_results):
+    filename = str(tmp_path / 'tournament.xlsx')
+    dynamic.init(filename, PLAYERS)
+    for seed in range(3):
+        fill_results(filename, seed)
+        dynamic.next_round(filename, PLAYERS)
+    fill_results(filename, 3)
+    state, _ = dynamic.apply_results(filename, PLAYERS)
+
+    rebuilt, _ = dynamic.read_last_round_and_update_standings(load_tournament(filename), Standings(PLAYERS))
+    assert list(rebuilt.rows()) == list(state.standings.rows())
+
+
+def test_database_run_leaves_the_participant_list_alone(tmp_path):
+    participants = list(PLAYERS)
+    dynamic.run_with_database(str(tmp_path / 'tournament.db'), str(tmp_path / 'tournament.xlsx'), participants)
+    assert participants == PLAYERS
+
+
+def test_de_results_must_follow_the_saved_bracket(tmp_path, fill_results):
+    filename = str(tmp_path / 'tournament.xlsx')
+    dynamic.init(filename, PLAYERS)
+    for _ in range(4):
+        fill_results(filename)
+        dynamic.next_round(filename, PLAYERS)
+    fill_results(filename)
+    book = load_workbook(filename)
+    sheet = book.worksheets[-1]
+    assert sheet.title == 'DE Round 5'
+    # Two tables swap opponents
+    sheet['B2'], sheet['B3'] = sheet['B3'].value, sheet['B2'].value
+    book.save(filename)
+
+    with pytest.raises(ResultSheetError, match='not in the DE bracket'):
+        dynamic.apply_results(filename, PLAYERS)
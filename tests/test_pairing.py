@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from pairing import BYE as PAIRING_BYE, pair_round, pair_standings
+from standings import BYE, BYE_ID, LOSS, WIN, Standings
+
+
+def play_round(standings, round_number, rng):
+    """Pairs a round with pair_standings and records random results; returns the pairs."""
+    pairs = pair_standings(standings)
+    p1 = [player for player, _ in pairs]
+    p2 = [opponent for _, opponent in pairs]
+    results = [BYE if opponent == BYE_ID else int(rng.choice([WIN, LOSS])) for opponent in p2]
+    points = [0 if opponent == BYE_ID else int(rng.integers(0, 6)) for opponent in p2]
+    standings.record_matches(round_number, p1, p2, results, points)
+    standings.end_round(round_number)
+    return pairs
+
+
+@pytest.mark.parametrize('size', [16, 25, 31, 64, 101])
+@pytest.mark.parametrize('seed', range(5))
+def test_rounds_pair_everyone_once_without_rematches(size, seed):
+    rng = np.random.default_rng(seed)
+    standings = Standings([f'P{i}' for i in range(size)])
+    for round_number in range(1, 6):
+        played = standings.opponent_sets()
+        pairs = play_round(standings, round_number, rng)
+
+        seated = [player for pair in pairs for player in pair if player != BYE_ID]
+        assert sorted(seated) == list(range(size))
+        assert sum(opponent == BYE_ID for _, opponent in pairs) == size % 2
+        assert all(opponent == BYE_ID or opponent not in played[player] for player, opponent in pairs)
+
+
+@pytest.mark.parametrize('size', [5, 7, 15, 25])
+def test_bye_goes_to_the_lowest_ranked_of_those_with_fewest_byes(size):
+    rng = np.random.default_rng(size)
+    standings = Standings([f'P{i}' for i in range(size)])
+    for round_number in range(1, size + 1):
+        byes = standings.bye_counts()
+        order = standings.ranking_order().tolist()
+        pairs = play_round(standings, round_number, rng)
+
+        bye_player = next(player for player, opponent in pairs if opponent == BYE_ID)
+        assert byes[bye_player] == byes.min()
+        assert all(byes[player] > byes.min() for player in order[order.index(bye_player) + 1:])
+    # One bye each before anyone gets a second
+    assert standings.bye_counts().tolist() == [1] * size
+
+
+def test_first_round_pairs_the_top_half_against_the_bottom_half():
+    assert pair_round([list(range(8))]) == [(0, 4), (1, 5), (2, 6), (3, 7)]
+    assert pair_round([list(range(7))]) == [(0, 3), (1, 4), (2, 5), (6, PAIRING_BYE)]
+
+
+def test_rematch_is_repaired_inside_the_group():
+    played = {0: {2}, 2: {0}}
+    pairs = pair_round([[0, 1, 2, 3]], played)
+    assert sorted(player for pair in pairs for player in pair) == [0, 1, 2, 3]
+    assert (0, 2) not in pairs and (2, 0) not in pairs
+
+
+def test_odd_player_floats_down_to_the_next_group():
+    assert pair_round([[0, 1, 2], [3, 4, 5, 6, 7]]) == [(0, 1), (2, 5), (3, 6), (4, 7)]
+
+
+def test_exhausted_field_accepts_rematches():
+    # Four players after a full round robin: every pairing is a rematch
+    played = {player: {other for other in range(4) if other != player} for player in range(4)}
+    pairs = pair_round([[0, 1], [2, 3]], played)
+    assert sorted(player for pair in pairs for player in pair) == [0, 1, 2, 3]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import random
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import server
+
+PLAYERS = [f'P{i}' for i in range(16)]
+
+
+async def play(tournament, rounds, seed=0):
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        round_number = tournament.round_number
+        await tournament.submit([{'round': round_number, 'table': table + 1, 'result': rng.choice(['Win', 'Loss']),
+                                  'points_left': rng.randint(0, 5)}
+                                 for table, (_, opponent) in enumerate(tournament.pairings) if opponent != 'Bye'])
+        await asyncio.gather(*tournament.writes)
+
+
+def test_every_finished_round_reaches_the_workbook(tmp_path):
+    filename = str(tmp_path / 'tournament.xlsx')
+
+    async def run():
+        tournament = server.load_server(filename, PLAYERS)
+        await play(tournament, 7)
+        return tournament
+
+    tournament = asyncio.run(run())
+    assert tournament.champion is not None
+    sheets = pd.read_excel(filename, sheet_name=None)
+    for name in ['Swiss Round 1', 'Swiss Round 4', 'DE Round 5', 'DE Round 6', 'DE Round 7']:
+        results = sheets[name].dropna(subset=['Participant'])['Result']
+        assert len(results) and results.isin(['Win', 'Loss']).all(), name
+
+
+def test_list_submissions_are_all_or_nothing(tmp_path):
+    async def run():
+        tournament = server.load_server(str(tmp_path / 'tournament.xlsx'), PLAYERS)
+        valid = {'round': 1, 'table': 1, 'result': 'Win'}
+        status, body = await tournament.handle('POST', '/results', json.dumps([valid, {'round': 1, 'table': 99}]))
+        return tournament, status
+
+    tournament, status = asyncio.run(run())
+    assert status == 404
+    assert len(tournament.outstanding) == len(PLAYERS) // 2
+
+
+def test_bad_bodies_and_unexpected_errors_get_an_answer(tmp_path, monkeypatch):
+    async def run():
+        tournament = server.load_server(str(tmp_path / 'tournament.xlsx'), PLAYERS)
+        bad_utf8 = await tournament.handle('POST', '/results', b'["\xff\xfe"]')
+
+        def broken(submission):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(tournament, 'validate', broken)
+        failing = await tournament.handle('POST', '/results', b'{"round": 1, "table": 1, "result": "Win"}')
+        return bad_utf8, failing
+
+    (bad_status, _), (failing_status, failing_body) = asyncio.run(run())
+    assert bad_status == 400
+    assert failing_status == 500
+    assert 'error' in json.loads(failing_body)
+
+
+def test_restarted_server_serves_the_saved_bracket(tmp_path):
+    filename = str(tmp_path / 'tournament.xlsx')
+
+    async def run():
+        tournament = server.load_server(filename, PLAYERS)
+        await play(tournament, 4)
+        return tournament
+
+    tournament = asyncio.run(run())
+    assert tournament.kind == 'DE'
+    # A stray edit to the pending DE sheet does not change the bracket
+    book = load_workbook(filename)
+    book['DE Round 5']['B2'] = 'P99'
+    book.save(filename)
+
+    restarted = server.load_server(filename, PLAYERS)
+
+    names = restarted.state.standings.names
+    assert restarted.pairings == tournament.pairings
+    assert restarted.pairings == [(names[p1], names[p2]) for p1, p2 in restarted.state.bracket]
@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+import pytest
+
+import simulate
+from outcomes import EloModel
+
+PLAYERS = [f'P{i}' for i in range(16)]
+# P0 is far stronger than everyone else
+RATINGS = {name: 3000 if name == 'P0' else 1000 for name in PLAYERS}
+
+
+@pytest.mark.parametrize('model_order', [PLAYERS, PLAYERS[::-1]], ids=['same order', 'reversed order'])
+def test_swiss_rounds_use_the_model_by_name(model_order):
+    model = EloModel(model_order, RATINGS)
+    random.seed(0)
+    wins = [simulate.simulate_swiss_rounds(PLAYERS, rounds=4, model=model)[0].wins[0] for _ in range(20)]
+    assert np.mean(wins) > 3.9
+
+
+def test_estimate_odds_follow_the_model_by_name():
+    model = EloModel(PLAYERS[::-1], RATINGS)
+    summary, _ = simulate.estimate_odds(PLAYERS, 2000, top_n=4, seed=1, model=model)
+    odds = dict(zip(summary['Participant'], summary['P(Win Title)']))
+    assert odds['P0'] > 0.95
+
+
+def test_estimate_odds_rejects_a_model_without_the_player():
+    with pytest.raises(ValueError):
+        simulate.estimate_odds(PLAYERS + ['Newcomer'], 10, model=EloModel(PLAYERS, RATINGS))
@@ -0,0 +1,124 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from pairing import pair_standings
+from standings import BYE, BYE_ID, LOSS, WIN, Standings
+from tiebreak import MIN_WIN_RATE
+
+
+def play_round(standings, round_number, rng):
+    pairs = pair_standings(standings)
+    p2 = [opponent for _, opponent in pairs]
+    results = [BYE if opponent == BYE_ID else int(rng.choice([WIN, LOSS])) for opponent in p2]
+    points = [0 if opponent == BYE_ID else int(rng.integers(0, 4)) for opponent in p2]
+    standings.record_matches(round_number, [player for player, _ in pairs], p2, results, points)
+    standings.end_round(round_number)
+
+
+def recount(standings):
+    """Every tiebreak recomputed from the match history, one player at a time."""
+    n = len(standings)
+    wins, losses = standings.wins.tolist(), standings.losses.tolist()
+    opponents = {player: [] for player in range(n)}
+    head_to_head = {}
+    for match in standings.history.tolist():
+        _, p1, p2, result, _ = match
+        if p2 == BYE_ID:
+            continue
+        opponents[p1].append(p2)
+        opponents[p2].append(p1)
+        winner = p1 if result != LOSS else p2
+        head_to_head[p1, p2] = head_to_head.get((p1, p2), 0) + (1 if winner == p1 else -1)
+        head_to_head[p2, p1] = head_to_head.get((p2, p1), 0) + (1 if winner == p2 else -1)
+
+    def rate(player):
+        played = wins[player] + losses[player]
+        return max(wins[player] / played if played else 0.0, MIN_WIN_RATE)
+
+    buchholz = [sum(wins[opponent] for opponent in opponents[player]) for player in range(n)]
+    median = [buchholz[player] - max(wins[o] for o in opponents[player]) - min(wins[o] for o in opponents[player])
+              if len(opponents[player]) >= 3 else buchholz[player] for player in range(n)]
+    omw = [sum(rate(o) for o in opponents[player]) / len(opponents[player]) if opponents[player] else 0.0
+           for player in range(n)]
+    sos = [sum(buchholz[opponent] for opponent in opponents[player]) for player in range(n)]
+    return buchholz, median, omw, sos, head_to_head
+
+
+def ranking_key(standings, player):
+    return (-int(standings.wins[player]), int(standings.losses[player]), int(standings.points_left[player]), player)
+
+
+@pytest.mark.parametrize('size', [9, 24, 33])
+def test_incremental_tiebreaks_match_a_recount(size):
+    rng = np.random.default_rng(size)
+    standings = Standings([f'P{i}' for i in range(size)])
+    tiebreaks = standings.tiebreaks()  # built up front, so every round goes through update()
+    for round_number in range(1, 7):
+        play_round(standings, round_number, rng)
+        buchholz, median, omw, sos, head_to_head = recount(standings)
+
+        assert standings.tiebreaks() is tiebreaks
+        assert tiebreaks.buchholz.tolist() == buchholz
+        assert tiebreaks.median_buchholz().tolist() == median
+        assert np.allclose(tiebreaks.opponents_match_win(), omw)
+        assert tiebreaks.strength_of_schedule().tolist() == sos
+        for p1, p2 in itertools.combinations(range(size), 2):
+            assert tiebreaks.head_to_head(p1, p2) == head_to_head.get((p1, p2), 0)
+
+
+def test_tiebreak_order_sorts_by_every_key():
+    rng = np.random.default_rng(7)
+    standings = Standings([f'P{i}' for i in range(20)])
+    for round_number in range(1, 5):
+        play_round(standings, round_number, rng)
+    buchholz, median, omw, _, head_to_head = recount(standings)
+
+    def key(player):
+        return (-int(standings.wins[player]), int(standings.losses[player]), -buchholz[player], -median[player],
+                -round(omw[player], 12), int(standings.points_left[player]))
+
+    order = standings.tiebreaks().ranking_order().tolist()
+    assert sorted(order) == list(range(20))
+    for above, below in zip(order, order[1:]):
+        assert key(above) <= key(below)
+        if key(above) == key(below):
+            # Level on every key: entry order, unless head-to-head swapped the two
+            assert above < below or head_to_head.get((above, below), 0) > 0
+
+
+@pytest.mark.parametrize('size', [8, 25, 40])
+def test_ranking_index_matches_a_full_sort(size):
+    rng = np.random.default_rng(size)
+    standings = Standings([f'P{i}' for i in range(size)])
+    ranking = standings.ranking()  # updated in place from here on
+    for round_number in range(1, 6):
+        play_round(standings, round_number, rng)
+        expected = sorted(range(size), key=lambda player: ranking_key(standings, player))
+
+        assert standings.ranking() is ranking
+        assert list(ranking) == expected
+        assert standings.ranking_order().tolist() == expected
+        assert standings.ranking_order(standings.wins, standings.losses, standings.points_left).tolist() == expected
+        assert ranking.top_n(5) == expected[:5]
+        assert [ranking.rank_of(player) for player in expected] == list(range(1, size + 1))
+        groups = [group for _, _, group in ranking.score_groups()]
+        assert [player for group in groups for player in group] == expected
+        for wins, losses, group in ranking.score_groups():
+            assert {(int(standings.wins[p]), int(standings.losses[p])) for p in group} == {(wins, losses)}
+
+
+def test_indexes_follow_an_undone_round():
+    rng = np.random.default_rng(3)
+    standings = Standings([f'P{i}' for i in range(16)])
+    for round_number in range(1, 4):
+        play_round(standings, round_number, rng)
+    size = len(standings.history)
+    play_round(standings, 4, rng)
+    standings.ranking(), standings.tiebreaks()
+
+    standings.truncate(size)
+
+    assert list(standings.ranking()) == sorted(range(16), key=lambda player: ranking_key(standings, player))
+    assert standings.tiebreaks().buchholz.tolist() == recount(standings)[0]
@@ -0,0 +1,139 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import whatif
+from pairing import pair_standings
+from standings import BYE, BYE_ID, LOSS, WIN, Standings
+from whatif import explore, score_bounds
+
+
+def play_round(standings, round_number, rng):
+    pairs = pair_standings(standings)
+    p2 = [opponent for _, opponent in pairs]
+    results = [BYE if opponent == BYE_ID else int(rng.choice([WIN, LOSS])) for opponent in p2]
+    points = [0 if opponent == BYE_ID else int(rng.integers(0, 4)) for opponent in p2]
+    standings.record_matches(round_number, [player for player, _ in pairs], p2, results, points)
+    standings.end_round(round_number)
+
+
+def tournament(size, rounds, seed):
+    rng = np.random.default_rng(seed)
+    standings = Standings([f'P{i}' for i in range(size)])
+    for round_number in range(1, rounds + 1):
+        play_round(standings, round_number, rng)
+    win_prob = rng.random((size, size))
+    win_prob = np.triu(win_prob, 1) + np.tril(1 - win_prob.T, -1)
+    return standings, pair_standings(standings), win_prob
+
+
+def brute_force(standings, pairs, decided, decided_points, win_prob, top_n):
+    """(P(qualify), P(qualify | win), P(qualify | loss)) over every outcome of the open tables."""
+    n = len(standings)
+    wins, losses = standings.wins.astype(int), standings.losses.astype(int)
+    points_left = standings.points_left.astype(int)
+    p_win = np.full(n, np.nan)
+    open_tables = []
+    for table, (p1, p2) in enumerate(pairs):
+        if p2 == BYE_ID:
+            wins[p1] += 1
+        elif table in decided:
+            winner, loser = (p1, p2) if decided[table] else (p2, p1)
+            wins[winner] += 1
+            losses[loser] += 1
+            points_left[loser] += decided_points.get(table, 0)
+        else:
+            open_tables.append((p1, p2))
+            p_win[p1], p_win[p2] = win_prob[p1, p2], win_prob[p2, p1]
+
+    q, q_and_win = np.zeros(n), np.zeros(n)
+    for outcome in itertools.product((True, False), repeat=len(open_tables)):
+        final_wins, final_losses, chance = wins.copy(), losses.copy(), 1.0
+        won = np.zeros(n, dtype=bool)
+        for (p1, p2), first_won in zip(open_tables, outcome):
+            winner, loser = (p1, p2) if first_won else (p2, p1)
+            final_wins[winner] += 1
+            final_losses[loser] += 1
+            won[winner] = True
+            chance *= win_prob[winner, loser]
+        ranked = sorted(range(n), key=lambda player: (-final_wins[player], final_losses[player],
+                                                      points_left[player], player))
+        qualified = np.zeros(n, dtype=bool)
+        qualified[ranked[:top_n]] = True
+        q[qualified] += chance
+        q_and_win[qualified & won] += chance
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return q, q_and_win / p_win, (q - q_and_win) / (1 - p_win)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('decided', [{}, {0: True, 2: False}])
+def test_last_round_is_exact(seed, decided):
+    whatif.clear_cache()
+    standings, pairs, win_prob = tournament(17, 3, seed)
+    decided_points = {table: 2 for table in decided}
+
+    exploration = explore(standings, 4, 4, pairs, decided, top_n=6, win_prob=win_prob,
+                          decided_points=decided_points)
+    q, if_win, if_lose = brute_force(standings, pairs, decided, decided_points, win_prob, top_n=6)
+
+    assert exploration.exact
+    assert np.allclose(exploration.probability, q)
+    open_players = [player for table, pair in enumerate(pairs) if table not in decided and pair[1] != BYE_ID
+                    for player in pair]
+    assert np.allclose(exploration.if_win[open_players], if_win[open_players])
+    assert np.allclose(exploration.if_lose[open_players], if_lose[open_players])
+
+    # Every condition agrees with the enumeration
+    for player in range(len(standings)):
+        condition = exploration.condition(player)
+        if condition == 'clinched':
+            assert q[player] == pytest.approx(1)
+        elif condition == 'eliminated':
+            assert q[player] == pytest.approx(0)
+        elif condition == 'safe':
+            assert if_lose[player] == pytest.approx(1)
+        if condition in ('win and in', 'in with a win'):
+            assert if_win[player] == pytest.approx(1)
+        if condition in ('win and in', 'must win'):
+            assert if_lose[player] == pytest.approx(0)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_record_bounds_hold_in_every_sampled_tournament(seed):
+    whatif.clear_cache()
+    standings, pairs, win_prob = tournament(20, 3, seed)
+
+    exploration = explore(standings, 4, 5, pairs, top_n=8, samples=400, win_prob=win_prob)
+
+    assert not exploration.exact
+    clinched, eliminated = exploration.bounds['clinched'], exploration.bounds['eliminated']
+    assert (exploration.probability[clinched] == 1).all()
+    assert (exploration.probability[eliminated] == 0).all()
+    win_clinches = exploration.bounds['win_clinches'] & exploration.playing
+    loss_eliminates = exploration.bounds['loss_eliminates'] & exploration.playing
+    assert np.allclose(np.nan_to_num(exploration.if_win[win_clinches], nan=1), 1)
+    assert np.allclose(np.nan_to_num(exploration.if_lose[loss_eliminates], nan=0), 0)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_score_bounds_match_every_possible_record(seed):
+    rng = np.random.default_rng(seed)
+    n, top_n = 5, 2
+    wins_low, losses_low = rng.integers(0, 3, n), rng.integers(0, 3, n)
+    wins_high, losses_high = wins_low + rng.integers(0, 2, n), losses_low + rng.integers(0, 2, n)
+
+    clinched, eliminated = score_bounds(wins_low, wins_high, losses_low, losses_high, top_n)
+
+    records = [[(wins, -losses) for wins in range(wins_low[player], wins_high[player] + 1)
+                for losses in range(losses_low[player], losses_high[player] + 1)] for player in range(n)]
+    always_in, always_out = np.ones(n, dtype=bool), np.ones(n, dtype=bool)
+    for final in itertools.product(*records):
+        for player in range(n):
+            level_or_ahead = sum(final[other] >= final[player] for other in range(n) if other != player)
+            ahead = sum(final[other] > final[player] for other in range(n))
+            always_in[player] &= level_or_ahead < top_n
+            always_out[player] &= ahead >= top_n
+    assert clinched.tolist() == always_in.tolist()
+    assert eliminated.tolist() == always_out.tolist()
@@ -0,0 +1,149 @@
+"""Opponent-based tiebreakers, maintained incrementally over a Standings store.
+
+The opponent graph is kept as a sparse adjacency: two parallel edge arrays
+(player, opponent), one entry per direction of every match, byes excluded.
+Buchholz and the opponents' match-win sum are running totals. When a round
+comes in, only edges whose opponent changed score are adjusted, and the new
+matches are appended as new edges. No pass over the history and no loops over
+players are needed. Median-Buchholz, strength of schedule and the final
+order are derived from those totals in a few array operations.
+
+Score is match wins (byes count as wins, as in Standings). Definitions:
+
+- Buchholz: sum of the opponents' scores.
+- Median-Buchholz: Buchholz without the best and worst opponent (3+ opponents).
+- OMW%: mean of the opponents' match-win rates, each floored at 1/3.
+- SOS (strength of schedule): sum of the opponents' Buchholz.
+- Head-to-head: net wins of one player against another.
+"""
+import numpy as np
+
+from standings import BYE_ID, LOSS
+
+
+MIN_WIN_RATE = 1 / 3
+
+
+def match_win_rates(wins, losses):
+    """Match-win rate per player, floored at MIN_WIN_RATE (players without matches get the floor)."""
+    wins = np.asarray(wins, dtype=float)
+    played = wins + np.asarray(losses, dtype=float)
+    rates = np.divide(wins, played, out=np.zeros_like(wins), where=played > 0)
+    return np.maximum(rates, MIN_WIN_RATE)
+
+
+class TiebreakIndex:
+    """Tiebreak totals that are updated in place as results come in."""
+
+    def __init__(self, standings):
+        self.standings = standings
+        self._players = np.empty(0, dtype=np.int32)    # edge source
+        self._opponents = np.empty(0, dtype=np.int32)  # edge target
+        self._wins = np.zeros(0, dtype=np.int64)       # scores the totals were last updated with
+        self._losses = np.zeros(0, dtype=np.int64)
+        self._rates = np.zeros(0)
+        self.buchholz = np.zeros(0, dtype=np.int64)
+        self.opponent_count = np.zeros(0, dtype=np.int64)
+        self._rate_sum = np.zeros(0)
+        self._head_to_head = {}  # (low ID, high ID) -> wins of low ID minus wins of high ID
+        self.update(standings.history)
+
+    def _grow(self, n):
+        extra = n - len(self._wins)
+        if extra > 0:
+            self._wins = np.append(self._wins, np.zeros(extra, dtype=np.int64))
+            self._losses = np.append(self._losses, np.zeros(extra, dtype=np.int64))
+            self._rates = np.append(self._rates, np.zeros(extra))
+            self.buchholz = np.append(self.buchholz, np.zeros(extra, dtype=np.int64))
+            self.opponent_count = np.append(self.opponent_count, np.zeros(extra, dtype=np.int64))
+            self._rate_sum = np.append(self._rate_sum, np.zeros(extra))
+
+    def update(self, rows):
+        """Takes in newly recorded matches (MATCH_DTYPE rows) after the Standings totals changed."""
+        standings = self.standings
+        self._grow(len(standings))
+        wins = standings.wins.astype(np.int64)
+        losses = standings.losses.astype(np.int64)
+        rates = match_win_rates(wins, losses)
+
+        # Existing edges: shift by how much each opponent's score moved
+        changed = (wins != self._wins) | (losses != self._losses)
+        if len(self._players) and changed.any():
+            touched = changed[self._opponents]
+            players, opponents = self._players[touched], self._opponents[touched]
+            np.add.at(self.buchholz, players, (wins - self._wins)[opponents])
+            np.add.at(self._rate_sum, players, (rates - self._rates)[opponents])
+
+        # New edges: add each new opponent at their current score
+        games = rows[rows['p2'] != BYE_ID]
+        if len(games):
+            players = np.concatenate([games['p1'], games['p2']]).astype(np.int32)
+            opponents = np.concatenate([games['p2'], games['p1']]).astype(np.int32)
+            np.add.at(self.buchholz, players, wins[opponents])
+            np.add.at(self._rate_sum, players, rates[opponents])
+            np.add.at(self.opponent_count, players, 1)
+            self._players = np.concatenate([self._players, players])
+            self._opponents = np.concatenate([self._opponents, opponents])
+
+            winners = np.where(games['result'] != LOSS, games['p1'], games['p2'])
+            for p1, p2, winner in zip(games['p1'].tolist(), games['p2'].tolist(), winners.tolist()):
+                key = (min(p1, p2), max(p1, p2))
+                self._head_to_head[key] = self._head_to_head.get(key, 0) + (1 if winner == key[0] else -1)
+
+        self._wins, self._losses, self._rates = wins, losses, rates
+
+    def median_buchholz(self):
+        """Buchholz without the highest and lowest opponent score (plain Buchholz below 3 opponents)."""
+        n = len(self.buchholz)
+        scores = self._wins[self._opponents]
+        highest = np.zeros(n, dtype=np.int64)
+        lowest = np.full(n, np.iinfo(np.int64).max)
+        np.maximum.at(highest, self._players, scores)
+        np.minimum.at(lowest, self._players, scores)
+        return np.where(self.opponent_count >= 3, self.buchholz - highest - lowest, self.buchholz)
+
+    def opponents_match_win(self):
+        """OMW%: mean floored match-win rate of each player's opponents, as a fraction."""
+        return np.divide(self._rate_sum, self.opponent_count, out=np.zeros_like(self._rate_sum),
+                         where=self.opponent_count > 0)
+
+    def strength_of_schedule(self):
+        """Sum of the opponents' Buchholz."""
+        return np.bincount(self._players, weights=self.buchholz[self._opponents],
+                           minlength=len(self.buchholz)).astype(np.int64)
+
+    def head_to_head(self, player_id, opponent_id):
+        """Net wins of player_id against opponent_id (0 if they never met or split their matches)."""
+        key = (min(player_id, opponent_id), max(player_id, opponent_id))
+        net = self._head_to_head.get(key, 0)
+        return net if player_id == key[0] else -net
+
+    def ranking_order(self):
+        """Player IDs by wins, losses, Buchholz, median-Buchholz, OMW%, points left, then head-to-head.
+
+        Head-to-head only decides between two players who are still level on
+        every other key; ties after that keep entry order.
+        """
+        standings = self.standings
+        keys = [standings.points_left, -self.opponents_match_win(), -self.median_buchholz(), -self.buchholz,
+                standings.losses, -standings.wins.astype(np.int64)]
+        order = np.lexsort(keys)
+        # Runs of players equal on every key
+        level = np.ones(len(order) - 1, dtype=bool) if len(order) else np.zeros(0, dtype=bool)
+        for key in keys:
+            key = np.asarray(key)[order]
+            level &= key[1:] == key[:-1]
+        for i in np.flatnonzero(level).tolist():
+            two_way = (i == 0 or not level[i - 1]) and (i + 1 == len(level) or not level[i + 1])
+            if two_way and self.head_to_head(int(order[i + 1]), int(order[i])) > 0:
+                order[i], order[i + 1] = order[i + 1], order[i]
+        return order
+
+    def table(self):
+        """Every tiebreak as a column, indexed by player ID."""
+        return {
+            'Buchholz': self.buchholz.copy(),
+            'Median Buchholz': self.median_buchholz(),
+            'OMW%': self.opponents_match_win(),
+            'SOS': self.strength_of_schedule(),
+        }
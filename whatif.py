@@ -0,0 +1,432 @@
+"""What-if queries for the Swiss stage: who can still make the DE cut.
+
+explore() takes the current standings and the pending round's pairings and
+works out, for every player, the chance of finishing in the top `top_n`
+after the last Swiss round, the same chance given a win or a loss in the
+pending round, and a plain condition ('clinched', 'must win', 'in with a
+win', ...).
+
+- When the pending round is the last Swiss round, its open matches are
+  enumerated exactly (up to MAX_EXACT_MATCHES of them). Otherwise the
+  remaining rounds are sampled, pairing each later round with the real
+  pairing engine (score groups, no rematches, bye balancing).
+- Score bounds prune the search: a player whose worst possible record
+  still beats all but fewer than top_n others has clinched, and one whose
+  best possible record is beaten for sure by top_n others is out. When
+  every player is settled that way, the rest of the subtree is counted in
+  one step instead of being enumerated.
+- Results are memoized by (round, standings hash), so asking again during
+  the same round, for the same or another player, costs a dictionary
+  lookup. With cache_file the answers are also kept on disk for the next
+  `python dynamic.py whatif` of the same round.
+
+Matches are coin flips unless win_prob (an outcomes.py matrix in Standings
+ID order) is given. Ties on wins and losses are broken as in the rankings:
+points left, then entry order. Points left from losses already reported in
+the pending round count; those from future losses are unknown and counted
+as 0. The conditions rely on wins and losses only, so they do
+not depend on that assumption.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from instrument import count, traced
+from pairing import BYE as PAIRING_BYE, pair_round
+from standings import BYE_ID
+
+
+DEFAULT_TOP_N = 8  # dynamic.qualify_for_de takes the top 8
+MAX_EXACT_MATCHES = 16
+DEFAULT_SAMPLES = 2000
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+
+
+def score_bounds(wins_low, wins_high, losses_low, losses_high, top_n):
+    """Returns (clinched, eliminated) masks from the possible final records alone.
+
+    Records compare by wins, then fewer losses. Anyone who could draw level
+    with a player counts as possibly ahead, so both masks hold whatever the
+    tie-breaks turn out to be.
+    """
+    scale = int(np.max(losses_high, initial=0)) + 1
+    worst = wins_low.astype(np.int64) * scale - losses_high
+    best = wins_high.astype(np.int64) * scale - losses_low
+    n = len(worst)
+    # Players whose worst finish beats X's best finish are ahead of X whatever happens
+    surely_ahead = n - np.searchsorted(np.sort(worst), best, side='right')
+    # Players whose best finish reaches X's worst one may end up ahead (X itself excluded)
+    maybe_ahead = n - np.searchsorted(np.sort(best), worst, side='left') - 1
+    return maybe_ahead < top_n, surely_ahead >= top_n
+
+
+def _cut(wins, losses, points_left, top_n):
+    qualified = np.zeros(len(wins), dtype=bool)
+    qualified[np.lexsort((points_left, losses, -wins))[:top_n]] = True
+    return qualified
+
+
+def _score_groups(wins, losses, points_left):
+    order = np.lexsort((points_left, losses, -wins)).tolist()
+    groups = []
+    for player_id in order:
+        if groups and wins[groups[-1][0]] == wins[player_id] and losses[groups[-1][0]] == losses[player_id]:
+            groups[-1].append(player_id)
+        else:
+            groups.append([player_id])
+    return groups
+
+
+class Exploration:
+    """The answers for one round's standings; arrays are indexed by player ID."""
+
+    def __init__(self, names, round_number, rounds_left, top_n, probability, if_win, if_lose, playing, bounds,
+                 exact, samples=0, explored=0):
+        self.names = names
+        self.ids = {name: player_id for player_id, name in enumerate(names)}
+        self.round_number = round_number
+        self.rounds_left = rounds_left
+        self.top_n = top_n
+        self.probability = probability
+        self.if_win = if_win
+        self.if_lose = if_lose
+        self.playing = playing
+        self.bounds = bounds
+        self.exact = exact
+        self.samples = samples
+        self.explored = explored
+
+    def condition(self, player_id):
+        """'clinched', 'eliminated', 'win and in', 'must win', 'in with a win', 'safe' or 'open'."""
+        if self.bounds['clinched'][player_id]:
+            return 'clinched'
+        if self.bounds['eliminated'][player_id]:
+            return 'eliminated'
+        if self.exact and self.probability[player_id] <= 1e-12:
+            return 'eliminated'  # out on tie-breaks whatever happens
+        if self.exact and self.probability[player_id] >= 1 - 1e-12:
+            return 'clinched'
+        if not self.playing[player_id]:
+            return 'open'
+        win_in, lose_out = self.bounds['win_clinches'][player_id], self.bounds['loss_eliminates'][player_id]
+        if self.exact:
+            # Exact answers also settle what the record bounds leave open (e.g. lost tie-breaks)
+            win_in = win_in or self.if_win[player_id] >= 1 - 1e-12
+            lose_out = lose_out or self.if_lose[player_id] <= 1e-12
+            if self.if_lose[player_id] >= 1 - 1e-12:
+                return 'safe'
+        if win_in and lose_out:
+            return 'win and in'
+        if lose_out:
+            return 'must win'
+        if win_in:
+            return 'in with a win'
+        return 'open'
+
+    def query(self, name):
+        """The answers for one player as a dict; raises KeyError for an unknown name."""
+        player_id = self.ids[name]
+        played = bool(self.playing[player_id])
+
+        def conditional(values):
+            # NaN: the outcome can't happen any more (the match is decided)
+            value = float(values[player_id])
+            return round(value, 4) if played and value == value else None
+
+        return {
+            'name': name,
+            'round': self.round_number,
+            'probability': round(float(self.probability[player_id]), 4),
+            'if_win': conditional(self.if_win),
+            'if_lose': conditional(self.if_lose),
+            'condition': self.condition(player_id),
+        }
+
+    def table(self, order=None):
+        """query() for every player, in the given order (ID order by default)."""
+        order = range(len(self.names)) if order is None else order
+        return [self.query(self.names[player_id]) for player_id in order]
+
+    def save(self, filename, key):
+        """Writes the answers for `key` as a NumPy .npz archive with a JSON header."""
+        header = {'key': key, 'names': self.names, 'round_number': self.round_number,
+                  'rounds_left': self.rounds_left, 'top_n': self.top_n, 'exact': self.exact,
+                  'samples': self.samples, 'explored': self.explored}
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as handle:
+            np.savez(handle, header=np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+                     probability=self.probability, if_win=self.if_win, if_lose=self.if_lose, playing=self.playing,
+                     **{f'bound_{name}': mask for name, mask in self.bounds.items()})
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename, key):
+        """The saved answers if they were computed for `key`, else None."""
+        try:
+            with np.load(filename) as archive:
+                header = json.loads(archive['header'].tobytes().decode('utf-8'))
+                if header['key'] != key:
+                    return None
+                bounds = {name[len('bound_'):]: archive[name] for name in archive.files if name.startswith('bound_')}
+                return cls(header['names'], header['round_number'], header['rounds_left'], header['top_n'],
+                           archive['probability'], archive['if_win'], archive['if_lose'], archive['playing'],
+                           bounds, header['exact'], header['samples'], header['explored'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+@traced()
+def _enumerate(wins, losses, points_left, matches, p_next, top_n):
+    """Exact qualification odds over every outcome of the open matches; returns (q, q_and_win, nodes).
+
+    A match between two players the score bounds have already settled
+    (clinched or out) cannot change who qualifies, so it is never branched
+    on; when no other match is left the subtree is counted at once.
+    """
+    n = len(wins)
+    first = np.array([match[0] for match in matches], dtype=np.int64)
+    second = np.array([match[1] for match in matches], dtype=np.int64)
+    odds = np.array([match[2] for match in matches], dtype=float)
+    q = np.zeros(n)
+    q_and_win = np.zeros(n)
+    nodes = [0]
+
+    def visit(remaining, wins, losses, weight, p_node):
+        nodes[0] += 1
+        undecided = np.zeros(n, dtype=np.int64)
+        undecided[first[remaining]] = 1
+        undecided[second[remaining]] = 1
+        clinched, eliminated = score_bounds(wins, wins + undecided, losses, losses + undecided, top_n)
+        settled = clinched | eliminated
+        relevant = [k for k in remaining if not (settled[first[k]] and settled[second[k]])]
+        if relevant:
+            match, rest = relevant[0], [k for k in remaining if k != relevant[0]]
+            for first_wins, chance in ((True, odds[match]), (False, 1 - odds[match])):
+                if chance <= 0:
+                    continue
+                winner, loser = (first[match], second[match]) if first_wins else (second[match], first[match])
+                next_wins, next_losses, next_p = wins.copy(), losses.copy(), p_node.copy()
+                next_wins[winner] += 1
+                next_losses[loser] += 1
+                next_p[winner], next_p[loser] = 1.0, 0.0
+                visit(rest, next_wins, next_losses, weight * chance, next_p)
+            return
+        # Only irrelevant matches are left: any outcome of them gives the same qualifiers
+        final_wins, final_losses = wins.copy(), losses.copy()
+        final_wins[first[remaining]] += 1
+        final_losses[second[remaining]] += 1
+        qualified = _cut(final_wins, final_losses, points_left, top_n)
+        q[qualified] += weight
+        q_and_win[qualified] += weight * p_node[qualified]
+
+    visit(list(range(len(matches))), wins, losses, 1.0, p_next)
+    return q, q_and_win, nodes[0]
+
+
+@traced()
+def _sample(standings, wins, losses, points_left, pending, matches, rounds_after, top_n, samples, rng, win_prob):
+    """Sampled qualification odds: the open matches, then rounds_after paired rounds.
+
+    Returns (q, q_and_win, won): won is how often each player won the pending
+    round in the samples, so q_and_win / won stays a proper conditional.
+    """
+    n = len(wins)
+    first = np.array([match[0] for match in matches], dtype=np.int64)
+    second = np.array([match[1] for match in matches], dtype=np.int64)
+    outcomes = rng.random((samples, len(matches))) < np.array([match[2] for match in matches], dtype=float)
+    won_fixed = np.zeros(n, dtype=bool)
+    won_fixed[[winner for winner, _, _ in pending['decided']] + pending['byes']] = True
+
+    played_before = standings.opponent_sets() if rounds_after else {}
+    for p1, p2 in pending['pairs']:
+        if p2 != BYE_ID:
+            played_before.setdefault(p1, set()).add(p2)
+            played_before.setdefault(p2, set()).add(p1)
+    byes_before = {player_id: int(byes) for player_id, byes in enumerate(standings.bye_counts()) if byes}
+    for player_id in pending['byes']:
+        byes_before[player_id] = byes_before.get(player_id, 0) + 1
+
+    q = np.zeros(n)
+    q_and_win = np.zeros(n)
+    won = np.zeros(n)
+    for sample in range(samples):
+        sample_wins, sample_losses = wins.copy(), losses.copy()
+        winners = np.where(outcomes[sample], first, second)
+        sample_wins[winners] += 1
+        sample_losses[np.where(outcomes[sample], second, first)] += 1
+        won_next = won_fixed.copy()
+        won_next[winners] = True
+
+        if rounds_after:
+            played = {player_id: set(opponents) for player_id, opponents in played_before.items()}
+            byes = dict(byes_before)
+            for _ in range(rounds_after):
+                pairs = pair_round(_score_groups(sample_wins, sample_losses, points_left), played, byes)
+                draws = rng.random(len(pairs))
+                for (p1, p2), draw in zip(pairs, draws.tolist()):
+                    if p2 == PAIRING_BYE:
+                        sample_wins[p1] += 1
+                        byes[p1] = byes.get(p1, 0) + 1
+                        continue
+                    p1_wins = draw < (0.5 if win_prob is None else win_prob[p1, p2])
+                    sample_wins[p1 if p1_wins else p2] += 1
+                    sample_losses[p2 if p1_wins else p1] += 1
+                    played.setdefault(p1, set()).add(p2)
+                    played.setdefault(p2, set()).add(p1)
+
+        qualified = _cut(sample_wins, sample_losses, points_left, top_n)
+        q += qualified
+        q_and_win += qualified & won_next
+        won += won_next
+    return q / samples, q_and_win / samples, won / samples
+
+
+def standings_key(standings, pairs, decided, decided_points=None):
+    """Hash of everything an exploration depends on: totals, match history and the pending round."""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (standings.wins, standings.losses, standings.points_left, standings.history):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    digest.update(repr((len(standings.names), sorted(pairs), sorted(decided.items()),
+                        sorted((decided_points or {}).items()))).encode())
+    return digest.hexdigest()
+
+
+def _pending_round(standings, pairs, decided, decided_points, win_prob):
+    """Splits the pending round into byes, decided (winner, loser, points) results and open (p1, p2, P(p1 wins)) matches."""
+    pending = {'pairs': pairs, 'byes': [], 'decided': [], 'open': []}
+    for table, (p1, p2) in enumerate(pairs):
+        if p2 == BYE_ID:
+            pending['byes'].append(p1)
+        elif table in decided:
+            winner, loser = (p1, p2) if decided[table] else (p2, p1)
+            pending['decided'].append((winner, loser, decided_points.get(table, 0)))
+        else:
+            pending['open'].append((p1, p2, 0.5 if win_prob is None else float(win_prob[p1, p2])))
+    return pending
+
+
+def whatif_filename(excel_filename):
+    """Where `python dynamic.py whatif` keeps its answers, e.g. tournament_results.whatif.npz."""
+    return os.path.splitext(excel_filename)[0] + '.whatif.npz'
+
+
+@traced()
+def explore(standings, round_number, last_swiss_round, pairs=None, decided=None, top_n=DEFAULT_TOP_N,
+            samples=DEFAULT_SAMPLES, seed=0, win_prob=None, cache_file=None, decided_points=None):
+    """Qualification odds and conditions for every player before `round_number` is played.
+
+    pairs are the pending round's (p1, p2) player IDs with BYE_ID for the
+    bye; by default they are computed with pair_standings, as dynamic.py
+    would. decided maps a table index to True (p1 won) or False for results
+    already known, and decided_points maps such a table to the loser's
+    points left (0 if missing). Returns a memoized Exploration.
+    """
+    from pairing import pair_standings
+
+    if pairs is None:
+        pairs = pair_standings(standings) if round_number <= last_swiss_round else []
+    pairs = [(int(p1), int(p2)) for p1, p2 in pairs]
+    decided = dict(decided or {})
+    decided_points = dict(decided_points or {})
+    key = (round_number, standings_key(standings, pairs, decided, decided_points), last_swiss_round, top_n, samples, seed,
+           None if win_prob is None else hashlib.blake2b(np.ascontiguousarray(win_prob).tobytes()).hexdigest())
+    if key in _cache:
+        _cache.move_to_end(key)
+        count('whatif.cache_hits')
+        return _cache[key]
+    if cache_file is not None:
+        exploration = Exploration.load(cache_file, repr(key))
+        if exploration is not None:
+            count('whatif.cache_hits')
+            _remember(key, exploration)
+            return exploration
+
+    n = len(standings.names)
+    wins = standings.wins.astype(np.int64)
+    losses = standings.losses.astype(np.int64)
+    points_left = standings.points_left.astype(np.int64)
+    rounds_left = max(last_swiss_round - round_number + 1, 0)
+    if not rounds_left:
+        pairs, decided = [], {}
+    pending = _pending_round(standings, pairs, decided, decided_points, win_prob)
+
+    # The pending round's known results count right away
+    p_next = np.full(n, np.nan)
+    playing = np.zeros(n, dtype=bool)
+    for player_id in pending['byes']:
+        wins[player_id] += 1
+        p_next[player_id], playing[player_id] = 1.0, True
+    for winner, loser, points in pending['decided']:
+        wins[winner] += 1
+        losses[loser] += 1
+        points_left[loser] += points
+        p_next[winner], p_next[loser] = 1.0, 0.0
+        playing[[winner, loser]] = True
+    for p1, p2, chance in pending['open']:
+        p_next[p1], p_next[p2] = chance, 1 - chance
+        playing[[p1, p2]] = True
+
+    bounds = _condition_bounds(wins, losses, pending['open'], max(rounds_left - 1, 0), top_n)
+    exact = rounds_left <= 1 and len(pending['open']) <= MAX_EXACT_MATCHES
+    explored = 0
+    p_win = np.nan_to_num(p_next)
+    if exact:
+        q, q_and_win, explored = _enumerate(wins, losses, points_left, pending['open'], p_win, top_n)
+        samples = 0
+    else:
+        q, q_and_win, p_win = _sample(standings, wins, losses, points_left, pending, pending['open'],
+                                      rounds_left - 1, top_n, samples, np.random.default_rng(seed), win_prob)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if_win = np.where(p_win > 0, q_and_win / p_win, np.nan)
+        if_lose = np.where(p_win < 1, (q - q_and_win) / (1 - p_win), np.nan)
+    exploration = Exploration(list(standings.names), round_number, rounds_left, top_n, q, if_win, if_lose, playing,
+                              bounds, exact, samples, explored)
+    _remember(key, exploration)
+    if cache_file is not None:
+        exploration.save(cache_file, repr(key))
+    return exploration
+
+
+def _remember(key, exploration):
+    _cache[key] = exploration
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _condition_bounds(wins, losses, open_matches, rounds_after, top_n):
+    """Score-bound verdicts overall and for each open player given a win or a loss in the pending round."""
+    n = len(wins)
+    undecided = np.zeros(n, dtype=np.int64)
+    for p1, p2, _ in open_matches:
+        undecided[[p1, p2]] = 1
+    clinched, eliminated = score_bounds(wins, wins + undecided + rounds_after, losses,
+                                        losses + undecided + rounds_after, top_n)
+    win_clinches = clinched.copy()
+    loss_eliminates = eliminated.copy()
+    for p1, p2, _ in open_matches:
+        for player, opponent in ((p1, p2), (p2, p1)):
+            for player_wins in (True, False):
+                wins_low, losses_low = wins.copy(), losses.copy()
+                spread = undecided.copy()
+                spread[[player, opponent]] = 0
+                winner, loser = (player, opponent) if player_wins else (opponent, player)
+                wins_low[winner] += 1
+                losses_low[loser] += 1
+                clinched_if, eliminated_if = score_bounds(wins_low, wins_low + spread + rounds_after, losses_low,
+                                                          losses_low + spread + rounds_after, top_n)
+                if player_wins:
+                    win_clinches[player] = clinched_if[player]
+                else:
+                    loss_eliminates[player] = eliminated_if[player]
+    return {'clinched': clinched, 'eliminated': eliminated, 'win_clinches': win_clinches,
+            'loss_eliminates': loss_eliminates}
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,469 @@
+"""Single-pass loader and incremental writer for the tournament workbook.
+
+The whole .xlsx is streamed once with openpyxl in read-only mode into an
+in-memory Tournament model. dynamic.py reads standings, the latest results
+and the opponent history from that model instead of re-opening the file for
+every sheet it needs.
+
+Writing goes through append_sheets, which edits the .xlsx package directly:
+only the sheets being added or replaced are serialized, everything else is
+copied over unchanged instead of being loaded and re-saved by openpyxl.
+new_workbook creates the first workbook the same way.
+
+Importing this module only loads the standard library. openpyxl and pandas
+are imported by the functions that read sheets or build DataFrames, so
+`dynamic.py init` never loads them.
+"""
+import math
+import numbers
+import os
+import posixpath
+import re
+import sys
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from instrument import count, traced
+
+
+def _escape(text, entities=None):
+    """XML-escapes &, < and > plus any extra entities.
+
+    Same as xml.sax.saxutils.escape, which is not imported because it pulls
+    in urllib and http.client and would double this module's import time.
+    """
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    for key, value in (entities or {}).items():
+        text = text.replace(key, value)
+    return text
+
+
+RESULT_COLUMNS = ['Participant', 'Opponent', 'Result', 'Points Left']
+
+
+class Sheet:
+    """One worksheet held as columns: header -> list of cell values."""
+
+    def __init__(self, name, headers, rows):
+        self.name = name
+        self.headers = headers
+        self.columns = {header: [] for header in headers if header is not None}
+        for row in rows:
+            for header, value in zip(headers, row):
+                if header is not None:
+                    self.columns[header].append(value)
+            # Short rows (read-only mode trims trailing empty cells)
+            for header in headers[len(row):]:
+                if header is not None:
+                    self.columns[header].append(None)
+
+    def __contains__(self, header):
+        return header in self.columns
+
+    def __len__(self):
+        """Number of data rows (below the header)."""
+        return max((len(values) for values in self.columns.values()), default=0)
+
+    def column(self, header):
+        return self.columns.get(header, [])
+
+    def rows(self, *headers):
+        """Yields tuples of the given columns, skipping rows where the first one is empty."""
+        for values in zip(*(self.column(header) for header in headers)):
+            if values[0] is not None:
+                yield values
+
+    @property
+    def round_number(self):
+        """The round number at the end of the sheet name, or 0 if there is none."""
+        try:
+            return int(self.name.split()[-1])
+        except ValueError:
+            return 0
+
+
+class Tournament:
+    """Every sheet of a tournament workbook, in workbook order."""
+
+    def __init__(self, filename, sheets, sheet_states=None):
+        self.filename = filename
+        self.sheets = sheets
+        self.sheet_states = sheet_states or {}
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def __getitem__(self, sheet_name):
+        return self.sheets[sheet_name]
+
+    def __contains__(self, sheet_name):
+        return sheet_name in self.sheets
+
+    @property
+    def latest(self):
+        return self.sheets[self.sheet_names[-1]]
+
+    @property
+    def previous(self):
+        """The sheet before the latest one, or None if there is only one."""
+        names = self.sheet_names
+        return self.sheets[names[-2]] if len(names) > 1 else None
+
+    def swiss_sheets(self):
+        return [sheet for name, sheet in self.sheets.items() if name.startswith('Swiss Round')]
+
+    # The three methods below are the read interface dynamic.py uses; storage.SQLiteStorage has the same ones
+
+    def round_results(self, sheet_name):
+        """The Participant/Opponent/Result/Points Left block of a round as a DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(list(self.sheets[sheet_name].rows(*RESULT_COLUMNS)), columns=RESULT_COLUMNS)
+
+    def match_history(self, players):
+        """Returns (played, byes_received): opponent IDs faced and bye counts per player ID, from every Swiss sheet.
+
+        players is the registry.PlayerRegistry the names in the sheets are resolved with.
+        """
+        played = {}
+        byes_received = {}
+        for sheet in self.swiss_sheets():
+            for participant, opponent in sheet.rows('Participant', 'Opponent'):
+                if not isinstance(opponent, str) or participant not in players:
+                    continue
+                participant = players[participant]
+                if opponent.strip().lower() == 'bye':
+                    byes_received[participant] = byes_received.get(participant, 0) + 1
+                elif opponent in players:
+                    opponent = players[opponent]
+                    played.setdefault(participant, set()).add(opponent)
+                    played.setdefault(opponent, set()).add(participant)
+        return played, byes_received
+
+    def latest_winners(self, players):
+        """IDs of the winners of the latest round sheet, in sheet order."""
+        from results import round_winners
+
+        latest = self.latest
+        winners = round_winners(latest.column('Participant'), latest.column('Opponent'), latest.column('Result'))
+        return [players[winner] for winner in winners]
+
+
+@traced()
+def load_sheet(filename, sheet_name):
+    """Parses a single sheet; in read-only mode the other sheets are never read."""
+    from openpyxl import load_workbook
+
+    book = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = book[sheet_name].iter_rows(values_only=True)
+        sheet = Sheet(sheet_name, list(next(rows, ())), rows)
+        count('workbook.sheets_parsed')
+        count('workbook.rows_parsed', len(sheet))
+        return sheet
+    finally:
+        book.close()
+
+
+@traced()
+def read_sheet_names(filename):
+    """Sheet names in workbook order, read from the package manifest without parsing any sheet."""
+    with zipfile.ZipFile(filename) as package:
+        root = ElementTree.fromstring(package.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in root.iter(f'{{{MAIN_NS}}}sheet')]
+
+
+@traced()
+def load_tournament(filename):
+    """Parses the workbook once (read-only, streaming) into a Tournament."""
+    from openpyxl import load_workbook
+
+    book = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        sheet_states = {}
+        for worksheet in book.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            headers = list(next(rows, ()))
+            sheets[worksheet.title] = Sheet(worksheet.title, headers, rows)
+            sheet_states[worksheet.title] = worksheet.sheet_state
+            count('workbook.sheets_parsed')
+            count('workbook.rows_parsed', len(sheets[worksheet.title]))
+    finally:
+        book.close()
+    return Tournament(filename, sheets, sheet_states)
+
+
+WORKSHEET_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+WORKSHEET_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+WORKBOOK_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml'
+OFFICE_DOCUMENT_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _bool_types():
+    # NumPy is never imported here; if it is not loaded yet there are no np.bool_ values either
+    numpy = sys.modules.get('numpy')
+    return (bool,) if numpy is None else (bool, numpy.bool_)
+
+
+def _cell_xml(reference, value, bool_types=(bool,)):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, bool_types):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Number):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    text = _escape(str(value))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def sheet_xml(headers, rows, column_width=25):
+    """Serializes one sheet (header row plus data rows) with a fixed column width.
+
+    Strings are written inline so the sheet does not depend on the
+    workbook's shared string table, and the width is one <cols> entry
+    instead of a setting on every column.
+    """
+    letters = [_column_letter(index) for index in range(len(headers))]
+    bool_types = _bool_types()
+    parts = [f'<worksheet xmlns="{MAIN_NS}">']
+    if headers:
+        parts.append(f'<cols><col min="1" max="{len(headers)}" width="{column_width}" customWidth="1"/></cols>')
+    parts.append('<sheetData>')
+    for row_number, row in enumerate([headers] + [list(row) for row in rows], start=1):
+        cells = ''.join(_cell_xml(f'{letter}{row_number}', value, bool_types) for letter, value in zip(letters, row))
+        parts.append(f'<row r="{row_number}">{cells}</row>')
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts).encode('utf-8')
+
+
+def frame_sheet_xml(df, column_width=25):
+    """sheet_xml for a pandas DataFrame (index is not written)."""
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    return sheet_xml([str(column) for column in df.columns], rows, column_width)
+
+
+@traced()
+def new_workbook(filename, sheets, column_width=25):
+    """Writes a new .xlsx with only the standard library.
+
+    sheets maps sheet name -> (headers, rows). The package holds just the
+    parts Excel, openpyxl and append_sheets need, and is written atomically.
+    """
+    sheet_entries, rel_entries, type_entries, parts = [], [], [], {}
+    for number, (sheet_name, (headers, rows)) in enumerate(sheets.items(), start=1):
+        sheet_entries.append(f'<sheet name="{_escape(sheet_name, {chr(34): "&quot;"})}" sheetId="{number}" '
+                             f'r:id="rId{number}"/>')
+        rel_entries.append(f'<Relationship Id="rId{number}" Type="{WORKSHEET_REL_TYPE}" '
+                           f'Target="worksheets/sheet{number}.xml"/>')
+        type_entries.append(f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+                            f'ContentType="{WORKSHEET_CONTENT_TYPE}"/>')
+        parts[f'xl/worksheets/sheet{number}.xml'] = sheet_xml(list(headers), rows, column_width)
+
+    parts['[Content_Types].xml'] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Override PartName="/xl/workbook.xml" ContentType="{WORKBOOK_CONTENT_TYPE}"/>'
+        + ''.join(type_entries) + '</Types>').encode('utf-8')
+    parts['_rels/.rels'] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<Relationships xmlns="{PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{OFFICE_DOCUMENT_REL_TYPE}" Target="xl/workbook.xml"/>'
+        '</Relationships>').encode('utf-8')
+    parts['xl/workbook.xml'] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>' + ''.join(sheet_entries)
+        + '</sheets></workbook>').encode('utf-8')
+    parts['xl/_rels/workbook.xml.rels'] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<Relationships xmlns="{PACKAGE_REL_NS}">' + ''.join(rel_entries) + '</Relationships>').encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temporary = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+    os.close(handle)
+    try:
+        with zipfile.ZipFile(temporary, 'w', zipfile.ZIP_DEFLATED) as target:
+            for part, data in parts.items():
+                target.writestr(part, data)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    os.replace(temporary, filename)
+    count('workbook.sheets_written', len(sheets))
+    count('workbook.bytes_written', os.path.getsize(filename))
+
+
+def _part_name(target):
+    """Turns a workbook relationship target into a zip member name."""
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _column_index(reference):
+    """0-based column of a cell reference such as 'AB12'."""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _text_of(element):
+    # Rich text runs are joined; phonetic hints (rPh) are not part of the value
+    phonetic = set(element.iterfind(f'{{{MAIN_NS}}}rPh/{{{MAIN_NS}}}t'))
+    return ''.join(node.text or '' for node in element.iter(f'{{{MAIN_NS}}}t') if node not in phonetic)
+
+
+def _cell_value(cell, shared_strings):
+    kind = cell.get('t', 'n')
+    if kind == 'inlineStr':
+        inline = cell.find(f'{{{MAIN_NS}}}is')
+        return _text_of(inline) if inline is not None else None
+    value = cell.find(f'{{{MAIN_NS}}}v')
+    if value is None or value.text is None:
+        return None
+    if kind == 's':
+        return shared_strings[int(value.text)]
+    if kind == 'b':
+        return value.text == '1'
+    if kind in ('str', 'e'):
+        return value.text
+    try:
+        return int(value.text)
+    except ValueError:
+        return float(value.text)
+
+
+@traced()
+def read_sheet_rows(filename, sheet_name):
+    """One sheet's values as a list of rows (header row first), using only the standard library.
+
+    Reads shared and inline strings, numbers and booleans (formulas give
+    their cached value), which is all the tournament sheets contain. Meant
+    for small reads such as `dynamic.py report`, where importing openpyxl
+    would take longer than the read itself.
+    """
+    with zipfile.ZipFile(filename) as package:
+        workbook_root = ElementTree.fromstring(package.read('xl/workbook.xml'))
+        rels_root = ElementTree.fromstring(package.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels_root.iter(f'{{{PACKAGE_REL_NS}}}Relationship')}
+        parts = {sheet.get('name'): _part_name(targets[sheet.get(f'{{{REL_NS}}}id')])
+                 for sheet in workbook_root.iter(f'{{{MAIN_NS}}}sheet')}
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in package.namelist():
+            strings_root = ElementTree.fromstring(package.read('xl/sharedStrings.xml'))
+            shared_strings = [_text_of(item) for item in strings_root.iter(f'{{{MAIN_NS}}}si')]
+        sheet_root = ElementTree.fromstring(package.read(parts[sheet_name]))
+
+    rows = []
+    for row in sheet_root.iter(f'{{{MAIN_NS}}}row'):
+        # Rows and cells may be skipped when empty, so place them by reference
+        row_number = int(row.get('r', len(rows) + 1))
+        rows.extend([] for _ in range(row_number - 1 - len(rows)))
+        values = []
+        for cell in row.iter(f'{{{MAIN_NS}}}c'):
+            column = _column_index(cell.get('r')) if cell.get('r') else len(values)
+            values.extend([None] * (column - len(values)))
+            values.append(_cell_value(cell, shared_strings))
+        rows.append(values)
+    count('workbook.sheets_parsed')
+    count('workbook.rows_parsed', max(len(rows) - 1, 0))
+    return rows
+
+
+@traced()
+def append_sheets(filename, sheets, column_width=25):
+    """Adds or replaces sheets in an existing .xlsx without re-serializing the rest.
+
+    sheets maps sheet name -> pandas DataFrame. Sheets that already exist get
+    their XML part replaced in place; new ones are added at the end. Every
+    other part of the file is copied over as-is, so no existing cell is
+    parsed or rewritten and the Python-level work per round only depends on
+    the sheets being written. The file is replaced atomically.
+    """
+    with zipfile.ZipFile(filename) as source:
+        workbook_xml = source.read('xl/workbook.xml').decode('utf-8')
+        rels_xml = source.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        types_xml = source.read('[Content_Types].xml').decode('utf-8')
+
+        workbook_root = ElementTree.fromstring(workbook_xml)
+        rels_root = ElementTree.fromstring(rels_xml)
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels_root.iter(f'{{{PACKAGE_REL_NS}}}Relationship')}
+        existing = {sheet.get('name'): _part_name(targets[sheet.get(f'{{{REL_NS}}}id')])
+                    for sheet in workbook_root.iter(f'{{{MAIN_NS}}}sheet')}
+        sheet_ids = [int(sheet.get('sheetId')) for sheet in workbook_root.iter(f'{{{MAIN_NS}}}sheet')]
+        rel_numbers = [int(match) for match in re.findall(r'Id="rId(\d+)"', rels_xml)]
+        names = set(source.namelist())
+
+        replaced = {}
+        next_sheet_id = max(sheet_ids, default=0) + 1
+        next_rel = max(rel_numbers, default=0) + 1
+        next_part = 1
+        new_sheets, new_rels, new_types = [], [], []
+        for sheet_name, df in sheets.items():
+            data = frame_sheet_xml(df, column_width)
+            if sheet_name in existing:
+                replaced[existing[sheet_name]] = data
+                continue
+            while f'xl/worksheets/sheet{next_part}.xml' in names:
+                next_part += 1
+            part = f'xl/worksheets/sheet{next_part}.xml'
+            names.add(part)
+            replaced[part] = data
+            new_sheets.append(f'<sheet xmlns:r="{REL_NS}" name="{_escape(sheet_name, {chr(34): "&quot;"})}" '
+                              f'sheetId="{next_sheet_id}" r:id="rId{next_rel}"/>')
+            new_rels.append(f'<Relationship Id="rId{next_rel}" Type="{WORKSHEET_REL_TYPE}" Target="/{part}"/>')
+            new_types.append(f'<Override PartName="/{part}" ContentType="{WORKSHEET_CONTENT_TYPE}"/>')
+            next_sheet_id += 1
+            next_rel += 1
+
+        visible = [sheet.get('state', 'visible') == 'visible' for sheet in workbook_root.iter(f'{{{MAIN_NS}}}sheet')]
+        if visible and not any(visible) and not new_sheets:
+            # Ensure there's at least one visible sheet: drop the first sheet's state attribute
+            replaced['xl/workbook.xml'] = re.sub(r'(<(?:\w+:)?sheet\b[^>]*?)\s+state="\w+"', r'\1', workbook_xml,
+                                                 count=1).encode('utf-8')
+        if new_sheets:
+            replaced['xl/workbook.xml'] = _insert_before(workbook_xml, 'sheets', ''.join(new_sheets))
+            replaced['xl/_rels/workbook.xml.rels'] = _insert_before(rels_xml, 'Relationships', ''.join(new_rels))
+            replaced['[Content_Types].xml'] = _insert_before(types_xml, 'Types', ''.join(new_types))
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        handle, temporary = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(temporary, 'w', zipfile.ZIP_DEFLATED) as target:
+                for info in source.infolist():
+                    if info.filename in replaced:
+                        target.writestr(info, replaced.pop(info.filename))
+                    else:
+                        target.writestr(info, source.read(info))
+                for part, data in replaced.items():
+                    target.writestr(part, data)
+        except BaseException:
+            os.remove(temporary)
+            raise
+    os.replace(temporary, filename)
+    count('workbook.sheets_written', len(sheets))
+    count('workbook.bytes_written', os.path.getsize(filename))
+
+
+def _insert_before(xml, tag, fragment):
+    """Inserts fragment right before the closing tag (with or without a namespace prefix)."""
+    match = list(re.finditer(rf'</(?:\w+:)?{tag}>', xml))[-1]
+    return (xml[:match.start()] + fragment + xml[match.start():]).encode('utf-8')